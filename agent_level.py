@@ -1,22 +1,36 @@
+import asyncio
 import os
+import threading
+import time
 import uuid
-from typing import TypedDict, List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict, List, Dict, Any, Callable, Iterable, Tuple
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.sqlite import SqliteSaver
 import chromadb
+from chromadb.utils import embedding_functions
 from text_extrtaction import DocumentProcessor
-from groq import Groq
+from document_registry import DocumentRegistry
+from response_filter import clean_response, StreamingResponseFilter
+from response_cache import ResponseCache
+from chunking import Chunker, get_chunker
+from checkpoint_pool import SqliteConnectionPool, PooledSqliteSaver
+from retrieval import LexicalIndexStore, CrossEncoderReranker, reciprocal_rank_fusion
+from context_assembly import ContextAssembler
+from conversation_memory import ConversationMemory, source_refs
+from table_index import TableIndexStore, collect_tables
+from collection_lifecycle import ChromaStorage, path_bytes
+import metrics
+import httpx
+from groq import Groq, AsyncGroq, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
-import sqlite3
-import re
 
 load_dotenv()
 groq_api_key = os.getenv("GROQ_API_KEY") 
 
 class AgentState(TypedDict):
     file_path: str
-    extracted_text: str
     collection_name: str
+    collection_names: List[str]
     query: str
     response: str
     sources: List[Dict[str, Any]]
@@ -24,16 +38,127 @@ class AgentState(TypedDict):
     status: str
     error: str
     mode: str
+    job_id: str
+    batch_timings: List[Dict[str, Any]]
+    file_hash: str
+    page_hashes: Dict[int, str]
+    pages: List[int]
+    ingest_stats: Dict[str, Any]
+    retrieval: Dict[str, Any]
+    timings: Dict[str, float]
+    usage: Dict[str, Any]
+    memory: Dict[str, Any]
+
+def make_state(**values) -> AgentState:
+    """Build an AgentState with empty defaults for every field not given"""
+    state = AgentState(
+        file_path="",
+        collection_name="",
+        collection_names=[],
+        query="",
+        response="",
+        sources=[],
+        context="",
+        status="starting",
+        error="",
+        mode="",
+        job_id="",
+        batch_timings=[],
+        file_hash="",
+        page_hashes={},
+        pages=[],
+        ingest_stats={},
+        retrieval={},
+        timings={},
+        usage={},
+        memory={}
+    )
+    state.update(values)
+    return state
 
 class DocumentAgent:
-    def __init__(self, groq_api_key: str, db_path: str = "./chroma_db", checkpoint_path: str = "./checkpoints.db"):
-        self.client = chromadb.PersistentClient(path=db_path)
+    def __init__(self, groq_api_key: str, db_path: str = "./chroma_db", checkpoint_path: str = "./checkpoints.db",
+                 extract_workers: int = 1, embedding_function=None, embed_batch_size: int = 64,
+                 pipeline_embeddings: bool = True, response_cache: ResponseCache = None,
+                 chunker: Chunker = None, top_k: int = 3, candidate_k: int = 20,
+                 reranker: CrossEncoderReranker = None, fanout_top_k: int = 6, collection_quota: int = 2,
+                 retrieval_workers: int = 8, checkpoint_pool_size: int = 8, llm_concurrency: int = 64,
+                 ocr_cache_dir: str = "./ocr_cache", context_assembler: ContextAssembler = None,
+                 memory: ConversationMemory = None, checkpoint_keep: int = 1, table_lookup: bool = True,
+                 table_rows: int = 20):
+        # Chroma is opened and the graphs compiled on first use or by warm_up(), not at construction
+        self.db_path = db_path
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.embedding_function = embedding_function or embedding_functions.DefaultEmbeddingFunction()
+        self.embed_batch_size = embed_batch_size
+        self.pipeline_embeddings = pipeline_embeddings
+        self.groq_api_key = groq_api_key
         self.groq_client = Groq(api_key=groq_api_key)
-        conn = sqlite3.connect(checkpoint_path, check_same_thread=False)
-        self.checkpointer = SqliteSaver(conn)
-        self.graph = self._build_graph()
+        # The async client and its semaphore bind to the serving event loop, so they are made on first use
+        self.async_groq = None
+        self.llm_semaphore = None
+        self.llm_concurrency = llm_concurrency
+        self.checkpoint_pool = SqliteConnectionPool(checkpoint_path, size=checkpoint_pool_size)
+        self.checkpointer = PooledSqliteSaver(self.checkpoint_pool)
+        # Checkpoints kept per chat thread; each turn writes one and prunes the rest
+        self.checkpoint_keep = checkpoint_keep
+        self.memory = memory or ConversationMemory()
+        self.registry = DocumentRegistry(checkpoint_path)
+        self.response_cache = response_cache
+        self.chunker = chunker or get_chunker("fixed")
+        self.lexical_index = LexicalIndexStore(db_path)
+        self.table_index = TableIndexStore(db_path, max_rows=table_rows)
+        self.table_lookup = table_lookup
+        self.top_k = top_k
+        self.candidate_k = candidate_k
+        self.reranker = reranker
+        self.fanout_top_k = fanout_top_k
+        self.collection_quota = collection_quota
+        self.context_assembler = context_assembler or ContextAssembler()
+        self.retrieval_pool = ThreadPoolExecutor(max_workers=retrieval_workers, thread_name_prefix="retrieve")
+        self.graph = None
         self.chat_graph = None
         self.current_collection = None  
+        self.extract_workers = extract_workers
+        self.ocr_cache_dir = ocr_cache_dir
+        self.progress_callbacks: Dict[str, Callable[..., None]] = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = chromadb.PersistentClient(path=self.db_path)
+        return self._client
+
+    def warm_up(self) -> Dict[str, float]:
+        """Pay the one-off costs of the first request up front: open Chroma and the checkpoint
+        tables, load the embedding (and reranker) model and compile both graphs.
+
+        Returns milliseconds per step, also observed as 'warmup.<step>' stage metrics.
+        """
+        def open_checkpoints():
+            with self.checkpointer.cursor():
+                pass
+
+        steps = [
+            ("chroma", lambda: self.client.heartbeat()),
+            ("checkpoints", open_checkpoints),
+            ("embedding_model", lambda: self.embedding_function(["warm up"])),
+            ("ingest_graph", self.get_graph),
+            ("chat_graph", self.get_chat_graph)
+        ]
+        if self.reranker:
+            steps.append(("reranker", self.reranker.load))
+
+        timings = {}
+        for name, step in steps:
+            started = time.perf_counter()
+            step()
+            timings[f"{name}_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        metrics.observe_stages("warmup", timings)
+        return timings
 
     def generate_collection_name(self, file_path: str) -> str:
         """Generate unique collection name based on file"""
@@ -43,53 +168,226 @@ class DocumentAgent:
         timestamp = str(uuid.uuid4().hex[:8])
         return f"{safe_name}_{timestamp}".lower()
 
+    def report_progress(self, state: AgentState, stage: str, **progress):
+        """Forward stage progress to the callback registered for this job"""
+        callback = self.progress_callbacks.get(state.get('job_id'))
+        if callback:
+            callback(stage, **progress)
+
+    def make_processor(self, state: AgentState, file_path: str) -> DocumentProcessor:
+        return DocumentProcessor(
+            file_path,
+            progress_callback=lambda done, total: self.report_progress(
+                state, "extract", pages_done=done, pages_total=total
+            ),
+            ocr_cache_dir=self.ocr_cache_dir
+        )
+
+    def summarize_stages(self, processor: DocumentProcessor) -> Dict[str, Dict[str, Any]]:
+        """Export a processor's stage timings as metrics and summarize them per stage"""
+        summary = {}
+        for stage, timings in processor.stage_timings.items():
+            for seconds in timings:
+                metrics.STAGE_SECONDS.observe(seconds, stage=f"extract.{stage}")
+            summary[stage] = {'calls': len(timings), 'total_ms': round(sum(timings) * 1000, 2)}
+        return summary
+
+    @metrics.timed_node("extract")
     def extract_text(self, state: AgentState) -> AgentState:
-        """Extract text from document"""
+        """Prepare extraction: check the document can be read and pick the pages to extract.
+
+        Page text itself is streamed by store_in_db, so the document is never held in the state.
+        """
         try:
             print(f"Extracting text from {state['file_path']}")
-            processor = DocumentProcessor(state['file_path'])
-            text = processor.process_file(use_table_aware=True)
-            print(f"extracted text:{text}")
-            
-            if not text:
+            processor = self.make_processor(state, state['file_path'])
+            if not processor.prepare():
                 state['status'] = "failed"
-                state['error'] = "No text extracted"
+                state['error'] = "Unsupported file format or unreadable DOCX"
                 return state
-                
-            state['extracted_text'] = text
+
+            # Only pages whose content hash changed since the last ingestion are re-extracted
+            state['page_hashes'] = processor.page_hashes()
+            known_pages = self.registry.get_pages(state['collection_name'], os.path.basename(state['file_path']))
+            state['pages'] = [
+                page_num for page_num, page_hash in state['page_hashes'].items()
+                if known_pages.get(page_num, {}).get('page_hash') != page_hash
+            ]
+            if known_pages:
+                print(f"{len(state['pages'])} of {len(state['page_hashes'])} pages changed since last ingestion")
+            state['ingest_stats'] = {'stages': self.summarize_stages(processor)}
             state['status'] = 'extracted'
-            print(f"Extracted {len(text)} characters")
             return state
         except Exception as e:
             state['status'] = "failed"
             state['error'] = str(e)
             return state
 
+    def get_collection(self, collection_name: str, create: bool = False):
+        """Open a collection bound to the agent's embedding function"""
+        if create:
+            return self.client.get_or_create_collection(collection_name, embedding_function=self.embedding_function)
+        return self.client.get_collection(collection_name, embedding_function=self.embedding_function)
+
+    def get_batch_size(self) -> int:
+        """Largest batch both the embedding function and Chroma accept"""
+        limits = [self.embed_batch_size, self.client.get_max_batch_size()]
+        embedder_limit = getattr(self.embedding_function, 'max_batch_size', None)
+        if embedder_limit:
+            limits.append(embedder_limit)
+        return max(1, min(limits))
+
+    def write_batches(self, collection, batches: Iterable[Tuple[List[str], List[Dict[str, Any]], List[str]]],
+                      on_batch: Callable[[int, Tuple], None] = None) -> List[Dict[str, Any]]:
+        """Embed and add (documents, metadatas, ids) batches as they are produced.
+
+        The next batch is pulled from the iterator while the current one embeds, and embedded
+        while the current one is written, so at most a few batches are in memory at once.
+        """
+        def embed(documents):
+            started = time.perf_counter()
+            embeddings = self.embedding_function(documents)
+            return embeddings, time.perf_counter() - started
+
+        timings = []
+        written_total = 0
+        batches = iter(batches)
+        batch = next(batches, None)
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed") as embedder:
+            pending = embedder.submit(embed, batch[0]) if batch else None
+            n = 0
+            while batch is not None:
+                next_batch = next(batches, None)
+                waited = time.perf_counter()
+                embeddings, embed_seconds = pending.result()
+                wait_seconds = time.perf_counter() - waited
+                if next_batch is not None and self.pipeline_embeddings:
+                    pending = embedder.submit(embed, next_batch[0])
+
+                documents, metadatas, ids = batch
+                written = time.perf_counter()
+                collection.add(documents=documents, embeddings=embeddings, metadatas=metadatas, ids=ids)
+                write_seconds = time.perf_counter() - written
+
+                if next_batch is not None and not self.pipeline_embeddings:
+                    pending = embedder.submit(embed, next_batch[0])
+
+                written_total += len(ids)
+                timings.append({
+                    'batch': n,
+                    'size': len(ids),
+                    'embed_ms': round(embed_seconds * 1000, 2),
+                    'wait_ms': round(wait_seconds * 1000, 2),
+                    'write_ms': round(write_seconds * 1000, 2)
+                })
+                if on_batch:
+                    on_batch(written_total, batch)
+                batch = next_batch
+                n += 1
+        return timings
+
+    @metrics.timed_node("store")
     def store_in_db(self, state: AgentState) -> AgentState:
-        """Store text chunks in chromadb with overlapping chunks"""
+        """Stream the selected pages through chunking and embedding into chromadb"""
         try:
             print(f"Storing in chromadb collection: {state['collection_name']}")
-            collection = self.client.get_or_create_collection(state['collection_name'])
-
-            text = state['extracted_text']
-            chunk_size = 1000
-            chunk_overlap = 200
-
-            chunks = []
-            for i in range(0, len(text), chunk_size - chunk_overlap):
-                chunk = text[i:i + chunk_size]
-                if chunk:
-                    chunks.append(chunk)
-
-            for i, chunk in enumerate(chunks):
-                collection.add(
-                    documents=[chunk],
-                    ids=[f"{os.path.basename(state['file_path'])}_{uuid.uuid4().hex[:8]}_{i}"],
-                    metadatas=[{"source": state['file_path'], "chunk": i}]
-                )
+            collection = self.get_collection(state['collection_name'], create=True)
+            source_name = os.path.basename(state['file_path'])
+
+            # Drop chunks of pages that changed or no longer exist before adding new ones
+            known_pages = self.registry.get_pages(state['collection_name'], source_name)
+            removed_pages = [page_num for page_num in known_pages if page_num not in state['page_hashes']]
+            stale_ids = [
+                chunk_id
+                for page_num in state['pages'] + removed_pages if page_num in known_pages
+                for chunk_id in known_pages[page_num]['chunk_ids']
+            ]
+            if stale_ids:
+                collection.delete(ids=stale_ids)
 
+            # Pages stream from the extractor into chunk windows that are embedded and written as
+            # they fill; chunks never cross a page boundary so each page owns its chunk ids
+            processor = self.make_processor(state, state['file_path'])
+            tables = []
+            pages = collect_tables(
+                processor.stream_pages(use_table_aware=True, workers=self.extract_workers, pages=state['pages']),
+                tables
+            )
+            page_chunk_ids = {page_num: [] for page_num in state['pages']}
+            batch_size = self.get_batch_size()
+            counts = {'chunks': 0, 'chars': 0}
+
+            def windows():
+                documents, metadatas, ids = [], [], []
+                for chunk in self.chunker.chunk_stream(pages):
+                    chunk_id = f"{source_name}_{uuid.uuid4().hex[:8]}_{counts['chunks']}"
+                    documents.append(chunk['text'])
+                    metadatas.append({
+                        "source": state['file_path'],
+                        "chunk": counts['chunks'],
+                        "page": chunk['page'],
+                        "kind": chunk['kind']
+                    })
+                    ids.append(chunk_id)
+                    page_chunk_ids.setdefault(chunk['page'], []).append(chunk_id)
+                    counts['chunks'] += 1
+                    counts['chars'] += len(chunk['text'])
+                    if len(ids) == batch_size:
+                        yield documents, metadatas, ids
+                        documents, metadatas, ids = [], [], []
+                if ids:
+                    yield documents, metadatas, ids
+
+            def on_batch(done, batch):
+                documents, _, ids = batch
+                self.lexical_index.update(state['collection_name'], ids, documents, collection=collection, save=False)
+                self.report_progress(state, "store", chunks_embedded=done, chunks_total=None)
+
+            self.lexical_index.update(state['collection_name'], [], [], stale_ids, collection=collection, save=False)
+            self.report_progress(state, "store", chunks_embedded=0, chunks_total=None)
+            try:
+                state['batch_timings'] = self.write_batches(collection, windows(), on_batch=on_batch)
+                if state['pages'] and not counts['chunks']:
+                    raise ValueError("No text extracted")
+            except Exception:
+                # Don't leave a half-written document behind
+                written_ids = [chunk_id for chunk_ids in page_chunk_ids.values() for chunk_id in chunk_ids]
+                if written_ids:
+                    collection.delete(ids=written_ids)
+                self.lexical_index.update(state['collection_name'], [], [], written_ids, save=False)
+                raise
+            finally:
+                self.lexical_index.save(state['collection_name'])
+            stages = {**state['ingest_stats'].get('stages', {}), **self.summarize_stages(processor)}
+            for batch_timing in state['batch_timings']:
+                metrics.observe_stages("store", batch_timing)
+            self.report_progress(state, "store", chunks_embedded=counts['chunks'], chunks_total=counts['chunks'])
+            print(f"Extracted {counts['chars']} characters from {len(state['pages'])} pages")
+
+            self.registry.record_pages(state['collection_name'], source_name, {
+                page_num: {'page_hash': state['page_hashes'][page_num], 'chunk_ids': chunk_ids}
+                for page_num, chunk_ids in page_chunk_ids.items()
+            })
+            self.registry.delete_pages(state['collection_name'], source_name, removed_pages)
+            self.table_index.update(state['collection_name'], source_name, state['file_path'], tables,
+                                    pages=state['pages'] + removed_pages if known_pages else None)
+            self.registry.record_document(
+                source_name, state['file_hash'], state['collection_name'], len(state['page_hashes'])
+            )
+
+            state['ingest_stats'] = {
+                'stages': stages,
+                'ocr': processor.ocr_stats,
+                'mode': 'incremental' if known_pages else 'full',
+                'pages_total': len(state['page_hashes']),
+                'pages_extracted': len(state['pages']),
+                'pages_removed': len(removed_pages),
+                'chunks_deleted': len(stale_ids),
+                'chunks_added': counts['chunks'],
+                'tables': len(tables)
+            }
             state['status'] = 'completed'
-            print(f"Stored {len(chunks)} chunks with overlap")
+            print(f"Stored {counts['chunks']} {self.chunker.name} chunks in {len(state['batch_timings'])} batches")
             return state
 
         except Exception as e:
@@ -97,27 +395,176 @@ class DocumentAgent:
             state['error'] = str(e)
             return state
 
+    def search_collection(self, collection_name: str, query: str, query_embedding, limit: int) -> Dict[str, Any]:
+        """Vector and BM25 candidates from one collection, fused by RRF and optionally reranked"""
+        timings = {}
+        collection = self.get_collection(collection_name)
+        self.registry.touch_collection(collection_name)
+
+        stage_start = time.perf_counter()
+        results = collection.query(query_embeddings=[query_embedding], n_results=self.candidate_k)
+        candidates = {}
+        if results['documents'] and results['documents'][0]:
+            for chunk_id, doc, metadata in zip(results['ids'][0], results['documents'][0],
+                                               results['metadatas'][0]):
+                candidates[chunk_id] = {'text': doc, 'metadata': metadata}
+        vector_ranking = list(candidates)
+        timings['vector_ms'] = round((time.perf_counter() - stage_start) * 1000, 2)
+
+        stage_start = time.perf_counter()
+        bm25_ranking = [
+            chunk_id for chunk_id, _ in self.lexical_index.search(
+                collection_name, query, self.candidate_k, collection=collection
+            )
+        ]
+        timings['bm25_ms'] = round((time.perf_counter() - stage_start) * 1000, 2)
+
+        stage_start = time.perf_counter()
+        fused = reciprocal_rank_fusion([vector_ranking, bm25_ranking])[:self.candidate_k]
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in candidates]
+        if missing:
+            fetched = collection.get(ids=missing, include=["documents", "metadatas"])
+            for chunk_id, doc, metadata in zip(fetched['ids'], fetched['documents'], fetched['metadatas']):
+                candidates[chunk_id] = {'text': doc, 'metadata': metadata}
+        ranked = [
+            (chunk_id, {'rrf': round(score, 6)}) for chunk_id, score in fused if chunk_id in candidates
+        ]
+        timings['fusion_ms'] = round((time.perf_counter() - stage_start) * 1000, 2)
+
+        if self.reranker is not None and ranked:
+            stage_start = time.perf_counter()
+            rerank_scores = self.reranker.score(query, [candidates[chunk_id]['text'] for chunk_id, _ in ranked])
+            for (_, scores), rerank_score in zip(ranked, rerank_scores):
+                scores['rerank'] = round(rerank_score, 4)
+            ranked.sort(key=lambda item: item[1]['rerank'], reverse=True)
+            timings['rerank_ms'] = round((time.perf_counter() - stage_start) * 1000, 2)
+
+        sources = []
+        for chunk_id, scores in ranked[:limit]:
+            scores['vector_rank'] = vector_ranking.index(chunk_id) + 1 if chunk_id in vector_ranking else None
+            scores['bm25_rank'] = bm25_ranking.index(chunk_id) + 1 if chunk_id in bm25_ranking else None
+            sources.append({
+                'chunk_id': chunk_id,
+                'collection': collection_name,
+                'text': candidates[chunk_id]['text'],
+                'metadata': candidates[chunk_id]['metadata'],
+                'scores': scores
+            })
+        metrics.observe_stages("retrieve", timings)
+        return {
+            'sources': sources,
+            'timings': timings,
+            'vector_candidates': len(vector_ranking),
+            'bm25_candidates': len(bm25_ranking)
+        }
+
+    @metrics.timed_node("retrieve")
     def retrieve_context(self, state: AgentState) -> AgentState:
-        """Retrieve relevant context from text"""
+        """Retrieve relevant context from one collection, or fan out across several"""
         try:
-            print(f"Retrieving context from collection: {state['collection_name']}")
-            collection = self.client.get_collection(state['collection_name'])
-            results = collection.query(query_texts=[state['query']], n_results=3)
-            
-            sources = []
-            context_text = ""
-
-            if results['documents'] and results['documents'][0]:
-                for i, (doc, metadata) in enumerate(zip(results['documents'][0], results['metadatas'][0])):
-                    sources.append({
-                        'chunk_id': results['ids'][0][i],
-                        'text': doc,
-                        'metadata': metadata
-                    })
-                    context_text += f"\n{doc}\n"
+            collection_names = state['collection_names'] or [state['collection_name']]
+            print(f"Retrieving context from collections: {', '.join(collection_names)}")
+            started = time.perf_counter()
 
+            table_lookup = None
+            if self.table_lookup:
+                table_lookup = self.table_index.lookup(collection_names, state['query'],
+                                                       open_collection=self.get_collection)
+                table_lookup['ms'] = round((time.perf_counter() - started) * 1000, 2)
+                metrics.TABLE_LOOKUPS.inc(outcome=table_lookup['kind'] or "miss")
+                metrics.observe_stages("retrieve", {'table_ms': table_lookup['ms']})
+                if table_lookup['kind'] in ('answer', 'filter'):
+                    # Exact and filtered lookups are answered from the table index: no embedding, no LLM call
+                    state['response'] = table_lookup.pop('answer')
+                    state['sources'] = table_lookup.pop('sources')
+                    state['retrieval'] = {'tables': table_lookup, 'timings': {'table_ms': table_lookup['ms']}}
+                    state['status'] = 'completed'
+                    return state
+
+            # Every collection shares the agent's embedding function, so embed the query once
+            stage_start = time.perf_counter()
+            query_embedding = self.embedding_function([state['query']])[0]
+            embed_ms = round((time.perf_counter() - stage_start) * 1000, 2)
+
+            if len(collection_names) == 1:
+                result = self.search_collection(collection_names[0], state['query'], query_embedding, self.top_k)
+                sources = result['sources']
+                retrieval = {
+                    'timings': {'embed_ms': embed_ms, **result['timings']},
+                    'vector_candidates': result['vector_candidates'],
+                    'bm25_candidates': result['bm25_candidates']
+                }
+            else:
+                stage_start = time.perf_counter()
+                results = list(self.retrieval_pool.map(
+                    lambda name: self.search_collection(name, state['query'], query_embedding,
+                                                        self.collection_quota),
+                    collection_names
+                ))
+                fanout_ms = round((time.perf_counter() - stage_start) * 1000, 2)
+
+                # RRF and cross-encoder scores are comparable across collections, so merge on them;
+                # each collection already contributes at most collection_quota passages
+                stage_start = time.perf_counter()
+                merged = [source for result in results for source in result['sources']]
+                merged.sort(key=lambda source: source['scores'].get('rerank', source['scores']['rrf']),
+                            reverse=True)
+                sources = merged[:self.fanout_top_k]
+                retrieval = {
+                    'timings': {
+                        'embed_ms': embed_ms,
+                        'fanout_ms': fanout_ms,
+                        'merge_ms': round((time.perf_counter() - stage_start) * 1000, 2)
+                    },
+                    'collections': {
+                        name: {
+                            'timings': result['timings'],
+                            'vector_candidates': result['vector_candidates'],
+                            'bm25_candidates': result['bm25_candidates']
+                        }
+                        for name, result in zip(collection_names, results)
+                    }
+                }
+
+            if table_lookup is not None:
+                if table_lookup['kind'] == 'rows':
+                    # The rows the query names stand in for whole table chunks
+                    sources = table_lookup['sources'] + [
+                        source for source in sources if source['metadata'].get('kind') != 'table'
+                    ]
+                retrieval['timings']['table_ms'] = table_lookup['ms']
+                retrieval['tables'] = {key: value for key, value in table_lookup.items()
+                                       if key not in ('answer', 'sources')}
+
+            # Deduplicated, query-trimmed passages packed into the context token budget;
+            # fan-out passages are labelled with their document
+            stage_start = time.perf_counter()
+            context_text, retrieval['context'] = self.context_assembler.assemble(state['query'], [
+                {
+                    'text': source['text'],
+                    'kind': source['metadata'].get('kind', 'text'),
+                    'label': (os.path.basename(source['metadata'].get('source', source['collection']))
+                              if len(collection_names) > 1 else None)
+                }
+                for source in sources
+            ])
+            retrieval['timings']['pack_ms'] = round((time.perf_counter() - stage_start) * 1000, 2)
+            metrics.CONTEXT_TOKENS.inc(retrieval['context']['tokens_before'], kind="retrieved")
+            metrics.CONTEXT_TOKENS.inc(retrieval['context']['tokens_after'], kind="sent")
+            if state['memory']:
+                retrieval['memory'] = self.memory.stats(state['memory'])
+                metrics.CONTEXT_TOKENS.inc(retrieval['memory']['tokens'], kind="memory")
+
+            # Per-collection stages were recorded by search_collection
+            metrics.observe_stages("retrieve", {
+                key: retrieval['timings'][key] for key in ('embed_ms', 'fanout_ms', 'merge_ms', 'pack_ms')
+                if key in retrieval['timings']
+            })
+            retrieval['timings']['total_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            retrieval['reranked'] = self.reranker is not None
             state['sources'] = sources
             state['context'] = context_text
+            state['retrieval'] = retrieval
             state['status'] = 'context_retrieved'
             return state
 
@@ -126,11 +573,9 @@ class DocumentAgent:
             state['error'] = f"Context retrieval failed: {str(e)}"
             return state
 
-    def generate_response(self, state: AgentState) -> AgentState:
-        """Generate chat response using Deepseek"""
-        try:
-            print("Generating response")
-            prompt = f"""You are a helpful assistant that answers user queries based only on the provided document. Document can be a research paper, technical manual, or any other text.
+    def build_messages(self, state: AgentState) -> List[Dict[str, str]]:
+        """Build the Groq chat messages: the thread's memory window, then the retrieved context and query"""
+        prompt = f"""You are a helpful assistant that answers user queries based only on the provided document. Document can be a research paper, technical manual, or any other text.
 
     Manual Content:
     {state['context']}
@@ -144,27 +589,37 @@ class DocumentAgent:
     - Do not mention chunks, sections, or internal document markers.
     - Avoid adding assumptions or information not present in the manual.
     - Provide a complete, natural explanation as if guiding a user.
+    - Use the earlier conversation only to work out what the question refers to.
 
     Answer:"""
 
-            response = self.groq_client.chat.completions.create(
-                model="deepseek-r1-distill-llama-70b",
-                messages=[
-                    {"role": "system", "content": "You are an assistant that answers questions using product manual content. Provide clear, helpful answers based strictly on the provided manual."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=1500
-            )
+        return [
+            {"role": "system", "content": "You are an assistant that answers questions using product manual content. Provide clear, helpful answers based strictly on the provided manual."},
+            *self.memory.messages(state['memory']),
+            {"role": "user", "content": prompt}
+        ]
 
-            raw_response = response.choices[0].message.content
-            
-            clean_response = re.sub(r'<think>.*?</think>', '', raw_response, flags=re.DOTALL)
-            clean_response = re.sub(r'\bchunk\s+\d+[,\s]*', '', clean_response, flags=re.IGNORECASE)
-            clean_response = re.sub(r'\([^)]*chunk[^)]*\)', '', clean_response, flags=re.IGNORECASE)
-            clean_response = re.sub(r'\n\s*\n', '\n\n', clean_response.strip())
+    @metrics.timed_node("generate")
+    def generate_response(self, state: AgentState) -> AgentState:
+        """Generate chat response using Deepseek"""
+        try:
+            print("Generating response")
+            started = time.perf_counter()
+            try:
+                response = self.groq_client.chat.completions.create(
+                    model="deepseek-r1-distill-llama-70b",
+                    messages=self.build_messages(state),
+                    temperature=0.1,
+                    max_tokens=1500
+                )
+            except Exception:
+                metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode="sync", outcome="error")
+                raise
+            metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode="sync", outcome="ok")
+            state['usage'] = metrics.record_llm_usage(response.usage, "sync")
 
-            state['response'] = clean_response
+            raw_response = response.choices[0].message.content
+            state['response'] = clean_response(raw_response)
             state['status'] = 'completed'
             return state
 
@@ -173,6 +628,12 @@ class DocumentAgent:
             state['error'] = f"Response generation failed: {str(e)}"
             return state
 
+    def get_graph(self):
+        """Compile the extract -> store ingestion graph on first use"""
+        if self.graph is None:
+            self.graph = self._build_graph()
+        return self.graph
+
     def _build_graph(self):
         workflow = StateGraph(AgentState)
         workflow.add_node("extract", self.extract_text)
@@ -186,86 +647,294 @@ class DocumentAgent:
         workflow.add_edge("store", END)
         return workflow.compile()
 
-    def process(self, file_path: str, collection_name: str = None):
-        """Process document with unique collection name"""
+    def collection_exists(self, collection_name: str) -> bool:
+        try:
+            self.client.get_collection(collection_name)
+            return True
+        except Exception:
+            return False
+
+    def list_collections(self) -> List[Dict[str, Any]]:
+        """Every collection with its chunk count, on-disk bytes, documents, tags and last use"""
+        storage = ChromaStorage(self.db_path).collection_bytes()
+        last_used = self.registry.last_used()
+        tags = {}
+        for tag, names in self.registry.list_tags().items():
+            for name in names:
+                tags.setdefault(name, []).append(tag)
+
+        collections = []
+        for collection in self.client.list_collections():
+            name = collection.name
+            lexical_path = self.lexical_index.path_for(name)
+            table_path = self.table_index.path_for(name)
+            sizes = {**storage.get(name, {}),
+                     'lexical_bytes': path_bytes(lexical_path) if os.path.exists(lexical_path) else 0,
+                     'table_bytes': path_bytes(table_path) if os.path.exists(table_path) else 0}
+            collections.append({
+                'name': name,
+                'chunks': collection.count(),
+                'bytes': sum(sizes.values()),
+                'storage': sizes,
+                'documents': [document['source_name'] for document in self.registry.list_documents(name)],
+                'tags': tags.get(name, []),
+                'last_used_at': last_used.get(name),
+                'active': name == self.current_collection
+            })
+        collections.sort(key=lambda collection: collection['last_used_at'] or 0, reverse=True)
+        return collections
+
+    def switch_collection(self, collection_name: str) -> bool:
+        """Make an existing collection the default for new chats"""
+        if not self.collection_exists(collection_name):
+            print(f"Collection {collection_name} not found")
+            return False
+        self.current_collection = collection_name
+        self.registry.touch_collection(collection_name, force=True)
+        print(f"Active collection: {collection_name}")
+        return True
+
+    def delete_collection(self, collection_name: str) -> List[str]:
+        """Delete a collection with its lexical and table indexes, registry entries and cached answers.
+
+        Returns the source names of the documents it held.
+        """
+        sources = [document['source_name'] for document in self.registry.list_documents(collection_name)]
+        if self.collection_exists(collection_name):
+            self.client.delete_collection(collection_name)
+        self.lexical_index.drop(collection_name)
+        self.table_index.drop(collection_name)
+        self.registry.remove_collection(collection_name)
+        if self.response_cache:
+            self.response_cache.invalidate_collection(collection_name)
+        if self.current_collection == collection_name:
+            self.current_collection = None
+        return sources
+
+    def get_chat_graph(self):
+        """Compile the retrieve -> generate chat graph on first use; chat turns are checkpointed through it"""
+        if self.chat_graph is None:
+            chat_workflow = StateGraph(AgentState)
+            chat_workflow.add_node("retrieve", self.retrieve_context)
+            chat_workflow.add_node("generate", self.generate_response)
+            chat_workflow.set_entry_point("retrieve")
+            chat_workflow.add_conditional_edges(
+                "retrieve",
+                lambda state: "generate" if state['status'] == "context_retrieved" else END,
+                {"generate": "generate", END: END}
+            )
+            chat_workflow.add_edge("generate", END)
+            self.chat_graph = chat_workflow.compile(checkpointer=self.checkpointer)
+        return self.chat_graph
+
+    def process(self, file_path: str, collection_name: str = None, job_id: str = None,
+                progress_callback: Callable[..., None] = None, tags: List[str] = None, revision: bool = False):
+        """Process document with unique collection name, optionally tagging the collection.
+
+        Only pages changed since the last ingestion are re-extracted when the document updates
+        an existing collection: the given collection_name, or with revision=True the collection
+        last ingested from a file of the same name. Otherwise a new collection is created, so
+        unrelated uploads that share a filename never touch each other's chunks.
+        """
+        if job_id is None:
+            job_id = uuid.uuid4().hex
+
+        file_hash = self.registry.hash_file(file_path)
+        duplicate = self.registry.find_by_hash(file_hash)
+        if (duplicate and collection_name in (None, duplicate['collection_name'])
+                and self.collection_exists(duplicate['collection_name'])):
+            self.current_collection = duplicate['collection_name']
+            if tags:
+                self.registry.tag_collection(duplicate['collection_name'], tags)
+            print(f"Identical document already ingested. Active collection: {self.current_collection}")
+            return make_state(
+                file_path=file_path,
+                collection_name=duplicate['collection_name'],
+                status="completed",
+                mode="process",
+                job_id=job_id,
+                file_hash=file_hash,
+                ingest_stats={'mode': 'duplicate', 'pages_total': duplicate['page_count']}
+            )
+
         if collection_name is None:
-            collection_name = self.generate_collection_name(file_path)
+            # A new revision of a known document updates its existing collection in place
+            previous = self.registry.find_by_source(os.path.basename(file_path)) if revision else None
+            if previous and self.collection_exists(previous['collection_name']):
+                collection_name = previous['collection_name']
+            else:
+                collection_name = self.generate_collection_name(file_path)
         
         print(f"Processing file into collection: {collection_name}")
         
-        state = AgentState(
+        state = make_state(
             file_path=file_path,
-            extracted_text="",
             collection_name=collection_name,
-            query="",
-            response="",
-            sources=[],
-            context="",
-            status="starting",
-            error="",
-            mode="process"
+            mode="process",
+            job_id=job_id,
+            file_hash=file_hash
         )
         
-        result = self.graph.invoke(state)
+        if progress_callback:
+            self.progress_callbacks[job_id] = progress_callback
+        try:
+            result = self.get_graph().invoke(state)
+        finally:
+            self.progress_callbacks.pop(job_id, None)
         
         if result['status'] == 'completed':
             self.current_collection = collection_name  
+            if tags:
+                self.registry.tag_collection(collection_name, tags)
+            if self.response_cache:
+                # Answers cached before a re-ingestion may no longer match the document
+                self.response_cache.invalidate_collection(collection_name)
             print(f'Document processing completed! Active collection: {collection_name}')
         else:
             print(f"Processing failed: {result['error']}")
         
         return result
 
-    def chat(self, query: str, collection_name: str = None, thread_id: str = None):
-        """Chat with specific document collection"""
-        if collection_name is None:
-            if self.current_collection is None:
-                return {
-                    'response': "No document processed yet. Please process a document first.",
-                    'sources': [],
-                    'thread_id': thread_id
-                }
-            collection_name = self.current_collection
+    @staticmethod
+    def has_history(memory: Dict[str, Any]) -> bool:
+        """Whether a turn follows earlier ones; its answer then depends on the conversation, not just the query"""
+        return bool(memory and (memory.get('turns') or memory.get('summary')))
+
+    def lookup_cached_answer(self, collection_name: str, query: str, memory: Dict[str, Any] = None):
+        """Return (cached result or None, query embedding to reuse when storing the answer).
+
+        Follow-up turns skip the cache, as they are never stored in it.
+        """
+        if self.response_cache is None or self.has_history(memory):
+            return None, None
+        embedding = self.response_cache.embed(query)
+        return self.response_cache.get(collection_name, query, embedding=embedding), embedding
+
+    def load_memory(self, thread_id: str = None) -> Dict[str, Any]:
+        """The conversation memory stored in a thread's latest checkpoint"""
+        if thread_id is None:
+            return {}
+        checkpoint = self.checkpointer.get_tuple({"configurable": {"thread_id": thread_id}})
+        if checkpoint is None:
+            return {}
+        return checkpoint.checkpoint['channel_values'].get('memory') or {}
+
+    def checkpoint_turn(self, thread_id: str, state: AgentState):
+        """Add a finished turn to the thread's memory and checkpoint it, then prune older checkpoints.
+
+        The checkpoint keeps source references rather than passage text and drops the packed
+        context, which can be rebuilt from Chroma, so each turn writes one small row.
+        """
+        state['memory'] = self.memory.remember(state['memory'], state['query'], state['response'])
+        checkpoint = make_state(
+            collection_name=state['collection_name'],
+            collection_names=state['collection_names'],
+            query=state['query'],
+            response=state['response'],
+            sources=source_refs(state['sources']),
+            status=state['status'],
+            mode=state['mode'],
+            retrieval=state['retrieval'],
+            timings=state['timings'],
+            usage=state['usage'],
+            memory=state['memory']
+        )
+        config = {"configurable": {"thread_id": thread_id}}
+        self.get_chat_graph().update_state(config, checkpoint, as_node="generate")
+        self.checkpointer.prune(thread_id, keep=self.checkpoint_keep)
+
+    def record_cached_turn(self, thread_id: str, collection_name: str, query: str, cached: Dict[str, Any],
+                           memory: Dict[str, Any] = None):
+        """Checkpoint a turn answered from the cache so the thread stays complete"""
+        state = make_state(
+            collection_name=collection_name,
+            query=query,
+            response=cached['response'],
+            sources=cached['sources'],
+            status="completed",
+            mode="chat",
+            memory=memory or {}
+        )
+        self.checkpoint_turn(thread_id, state)
+
+    def resolve_collections(self, collection_name: str = None, collection_names: List[str] = None,
+                            tag: str = None) -> List[str]:
+        """Collections a query should search: an explicit list, a tag, one name or the active collection"""
+        if collection_names:
+            names = collection_names
+        elif tag:
+            names = [name for name in self.registry.find_by_tag(tag) if self.collection_exists(name)]
+        elif collection_name:
+            names = [collection_name]
+        elif self.current_collection:
+            names = [self.current_collection]
+        else:
+            names = []
+        return sorted(set(names))
+
+    @staticmethod
+    def missing_collection_message(tag: str = None) -> str:
+        if tag:
+            return f"No collections found for tag '{tag}'."
+        return "No document processed yet. Please process a document first."
+
+    def complete_turn(self, thread_id: str, state: AgentState, query_embedding: list = None):
+        """Checkpoint a generated turn and cache its answer"""
+        # An answer that leaned on earlier turns may not stand on its own, so only opening turns are cached
+        if self.response_cache and not self.has_history(state['memory']):
+            self.response_cache.put(
+                state['collection_name'], state['query'],
+                {'response': state['response'], 'sources': state['sources']},
+                embedding=query_embedding
+            )
+        self.checkpoint_turn(thread_id, state)
+
+    def chat(self, query: str, collection_name: str = None, thread_id: str = None,
+             collection_names: List[str] = None, tag: str = None):
+        """Chat with one document collection, or with several at once via collection_names or a tag"""
+        collection_names = self.resolve_collections(collection_name, collection_names, tag)
+        if not collection_names:
+            return {
+                'response': self.missing_collection_message(tag),
+                'sources': [],
+                'thread_id': thread_id
+            }
+        # Fan-out answers are cached and checkpointed under the joined collection names
+        collection_name = "+".join(collection_names)
         
+        memory = self.load_memory(thread_id)
         if thread_id is None:
             thread_id = str(uuid.uuid4())
         
         print(f"Processing query: {query} in collection: {collection_name}")
 
-        if self.chat_graph is None:
-            chat_workflow = StateGraph(AgentState)
-            chat_workflow.add_node("retrieve", self.retrieve_context)
-            chat_workflow.add_node("generate", self.generate_response)
-            chat_workflow.set_entry_point("retrieve")
-            chat_workflow.add_conditional_edges(
-                "retrieve",
-                lambda state: "generate" if state['status'] == "context_retrieved" else END,
-                {"generate": "generate", END: END}
-            )
-            chat_workflow.add_edge("generate", END)
-            self.chat_graph = chat_workflow.compile(checkpointer=self.checkpointer)
-        
-        state = AgentState(
-            file_path="",
-            extracted_text="",
+        cached, query_embedding = self.lookup_cached_answer(collection_name, query, memory)
+        if cached is not None:
+            self.record_cached_turn(thread_id, collection_name, query, cached, memory)
+            return {**cached, 'thread_id': thread_id, 'cached': True}
+
+        # The chat graph's nodes run directly so the turn is checkpointed once, in compact form,
+        # rather than after every node with the full context
+        result = self.retrieve_context(make_state(
             collection_name=collection_name,
+            collection_names=collection_names,
             query=query,
-            response="",
-            sources=[],
-            context="",
-            status="starting",
-            error="",
-            mode="chat"
-        )
-        
-        config = {"configurable": {"thread_id": thread_id}}
-        result = self.chat_graph.invoke(state, config=config)
+            mode="chat",
+            memory=memory
+        ))
+        if result['status'] == 'context_retrieved':
+            result = self.generate_response(result)
         
         if result['status'] == 'completed':
+            self.complete_turn(thread_id, result, query_embedding)
             return {
                 'response': result['response'],
                 'sources': result['sources'],
-                'thread_id': thread_id
+                'retrieval': result['retrieval'],
+                'timings': result['timings'],
+                'usage': result['usage'],
+                'thread_id': thread_id,
+                'cached': False
             }
         else:
             return {
@@ -274,6 +943,252 @@ class DocumentAgent:
                 'thread_id': thread_id
             }
             
+    def chat_stream(self, query: str, collection_name: str = None, thread_id: str = None,
+                    collection_names: List[str] = None, tag: str = None):
+        """Stream a chat answer as (event, data) pairs: sources first, then tokens, then done"""
+        collection_names = self.resolve_collections(collection_name, collection_names, tag)
+        memory = self.load_memory(thread_id)
+        if thread_id is None:
+            thread_id = str(uuid.uuid4())
+        if not collection_names:
+            yield 'error', {'error': self.missing_collection_message(tag), 'thread_id': thread_id}
+            return
+        collection_name = "+".join(collection_names)
+
+        print(f"Streaming query: {query} in collection: {collection_name}")
+        cached, query_embedding = self.lookup_cached_answer(collection_name, query, memory)
+        if cached is not None:
+            self.record_cached_turn(thread_id, collection_name, query, cached, memory)
+            yield 'sources', {'sources': cached['sources'], 'thread_id': thread_id}
+            yield 'token', {'text': cached['response']}
+            yield 'done', {'response': cached['response'], 'thread_id': thread_id, 'cached': True}
+            return
+
+        state = self.retrieve_context(make_state(
+            collection_name=collection_name, collection_names=collection_names, query=query, mode="chat",
+            memory=memory
+        ))
+        if state['status'] == 'completed':
+            # Answered from the table index
+            yield 'sources', {'sources': state['sources'], 'retrieval': state['retrieval'], 'thread_id': thread_id}
+            yield 'token', {'text': state['response']}
+            self.complete_turn(thread_id, state, query_embedding)
+            yield 'done', {'response': state['response'], 'timings': state['timings'], 'usage': state['usage'],
+                           'first_token_ms': None, 'thread_id': thread_id, 'cached': False}
+            return
+        if state['status'] != 'context_retrieved':
+            yield 'error', {'error': state['error'], 'thread_id': thread_id}
+            return
+        yield 'sources', {'sources': state['sources'], 'retrieval': state['retrieval'], 'thread_id': thread_id}
+
+        started = time.perf_counter()
+        first_token = None
+        try:
+            stream = self.groq_client.chat.completions.create(
+                model="deepseek-r1-distill-llama-70b",
+                messages=self.build_messages(state),
+                temperature=0.1,
+                max_tokens=1500,
+                stream=True
+            )
+            response_filter = StreamingResponseFilter()
+            raw_response = ""
+            for chunk in stream:
+                usage = self.chunk_usage(chunk)
+                if usage is not None:
+                    state['usage'] = metrics.record_llm_usage(usage, "stream")
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if not token:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                    metrics.LLM_FIRST_TOKEN_SECONDS.observe(first_token, mode="stream")
+                raw_response += token
+                visible = response_filter.feed(token)
+                if visible:
+                    yield 'token', {'text': visible}
+            visible = response_filter.flush()
+            if visible:
+                yield 'token', {'text': visible}
+        except Exception as e:
+            metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode="stream", outcome="error")
+            yield 'error', {'error': f"Response generation failed: {str(e)}", 'thread_id': thread_id}
+            return
+        metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode="stream", outcome="ok")
+
+        state['response'] = clean_response(raw_response)
+        state['status'] = 'completed'
+        metrics.record_node("generate", state, time.perf_counter() - started)
+        # Record the turn in the thread's checkpoint just like the non-streaming graph run
+        self.complete_turn(thread_id, state, query_embedding)
+        yield 'done', {'response': state['response'], 'timings': state['timings'], 'usage': state['usage'],
+                       'first_token_ms': round(first_token * 1000, 2) if first_token is not None else None,
+                       'thread_id': thread_id, 'cached': False}
+
+    @staticmethod
+    def chunk_usage(chunk):
+        """Token usage carried by a streamed chunk; Groq sends it on the last one under x_groq"""
+        x_groq = getattr(chunk, 'x_groq', None)
+        return getattr(x_groq, 'usage', None) or getattr(chunk, 'usage', None)
+
+    def get_async_groq(self) -> AsyncGroq:
+        """AsyncGroq client with a pooled HTTP client, created inside the running event loop"""
+        if self.async_groq is None:
+            limits = httpx.Limits(max_connections=self.llm_concurrency,
+                                  max_keepalive_connections=self.llm_concurrency)
+            self.async_groq = AsyncGroq(api_key=self.groq_api_key,
+                                        http_client=DefaultAsyncHttpxClient(limits=limits))
+            self.llm_semaphore = asyncio.Semaphore(self.llm_concurrency)
+        return self.async_groq
+
+    @metrics.timed_node("generate")
+    async def agenerate_response(self, state: AgentState) -> AgentState:
+        """Async generate_response: awaits Groq under the concurrency limit"""
+        try:
+            client = self.get_async_groq()
+            async with self.llm_semaphore:
+                # Timed inside the semaphore so the histogram shows Groq latency, not local queueing
+                started = time.perf_counter()
+                try:
+                    response = await client.chat.completions.create(
+                        model="deepseek-r1-distill-llama-70b",
+                        messages=self.build_messages(state),
+                        temperature=0.1,
+                        max_tokens=1500
+                    )
+                except Exception:
+                    metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode="async", outcome="error")
+                    raise
+                metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode="async", outcome="ok")
+            state['usage'] = metrics.record_llm_usage(response.usage, "async")
+            state['response'] = clean_response(response.choices[0].message.content)
+            state['status'] = 'completed'
+            return state
+
+        except Exception as e:
+            state['status'] = 'failed'
+            state['error'] = f"Response generation failed: {str(e)}"
+            return state
+
+    async def achat(self, query: str, collection_name: str = None, thread_id: str = None,
+                    collection_names: List[str] = None, tag: str = None):
+        """Async chat: Chroma and checkpoint work run in threads, the LLM call is awaited"""
+        collection_names = await asyncio.to_thread(self.resolve_collections, collection_name, collection_names, tag)
+        if not collection_names:
+            return {'response': self.missing_collection_message(tag), 'sources': [], 'thread_id': thread_id}
+        collection_name = "+".join(collection_names)
+        memory = await asyncio.to_thread(self.load_memory, thread_id)
+        if thread_id is None:
+            thread_id = str(uuid.uuid4())
+
+        cached, query_embedding = await asyncio.to_thread(self.lookup_cached_answer, collection_name, query, memory)
+        if cached is not None:
+            await asyncio.to_thread(self.record_cached_turn, thread_id, collection_name, query, cached, memory)
+            return {**cached, 'thread_id': thread_id, 'cached': True}
+
+        state = await asyncio.to_thread(self.retrieve_context, make_state(
+            collection_name=collection_name, collection_names=collection_names, query=query, mode="chat",
+            memory=memory
+        ))
+        if state['status'] == 'context_retrieved':
+            state = await self.agenerate_response(state)
+        if state['status'] != 'completed':
+            return {'response': f"Error: {state['error']}", 'sources': [], 'thread_id': thread_id}
+
+        await asyncio.to_thread(self.complete_turn, thread_id, state, query_embedding)
+        return {
+            'response': state['response'],
+            'sources': state['sources'],
+            'retrieval': state['retrieval'],
+            'timings': state['timings'],
+            'usage': state['usage'],
+            'thread_id': thread_id,
+            'cached': False
+        }
+
+    async def achat_stream(self, query: str, collection_name: str = None, thread_id: str = None,
+                           collection_names: List[str] = None, tag: str = None):
+        """Async chat_stream: yields the same (event, data) pairs"""
+        collection_names = await asyncio.to_thread(self.resolve_collections, collection_name, collection_names, tag)
+        memory = await asyncio.to_thread(self.load_memory, thread_id)
+        if thread_id is None:
+            thread_id = str(uuid.uuid4())
+        if not collection_names:
+            yield 'error', {'error': self.missing_collection_message(tag), 'thread_id': thread_id}
+            return
+        collection_name = "+".join(collection_names)
+
+        cached, query_embedding = await asyncio.to_thread(self.lookup_cached_answer, collection_name, query, memory)
+        if cached is not None:
+            await asyncio.to_thread(self.record_cached_turn, thread_id, collection_name, query, cached, memory)
+            yield 'sources', {'sources': cached['sources'], 'thread_id': thread_id}
+            yield 'token', {'text': cached['response']}
+            yield 'done', {'response': cached['response'], 'thread_id': thread_id, 'cached': True}
+            return
+
+        state = await asyncio.to_thread(self.retrieve_context, make_state(
+            collection_name=collection_name, collection_names=collection_names, query=query, mode="chat",
+            memory=memory
+        ))
+        if state['status'] == 'completed':
+            # Answered from the table index
+            yield 'sources', {'sources': state['sources'], 'retrieval': state['retrieval'], 'thread_id': thread_id}
+            yield 'token', {'text': state['response']}
+            await asyncio.to_thread(self.complete_turn, thread_id, state, query_embedding)
+            yield 'done', {'response': state['response'], 'timings': state['timings'], 'usage': state['usage'],
+                           'first_token_ms': None, 'thread_id': thread_id, 'cached': False}
+            return
+        if state['status'] != 'context_retrieved':
+            yield 'error', {'error': state['error'], 'thread_id': thread_id}
+            return
+        yield 'sources', {'sources': state['sources'], 'retrieval': state['retrieval'], 'thread_id': thread_id}
+
+        started = first_token = None
+        try:
+            client = self.get_async_groq()
+            response_filter = StreamingResponseFilter()
+            raw_response = ""
+            async with self.llm_semaphore:
+                started = time.perf_counter()
+                stream = await client.chat.completions.create(
+                    model="deepseek-r1-distill-llama-70b",
+                    messages=self.build_messages(state),
+                    temperature=0.1,
+                    max_tokens=1500,
+                    stream=True
+                )
+                async for chunk in stream:
+                    usage = self.chunk_usage(chunk)
+                    if usage is not None:
+                        state['usage'] = metrics.record_llm_usage(usage, "async_stream")
+                    token = chunk.choices[0].delta.content if chunk.choices else None
+                    if not token:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                        metrics.LLM_FIRST_TOKEN_SECONDS.observe(first_token, mode="async_stream")
+                    raw_response += token
+                    visible = response_filter.feed(token)
+                    if visible:
+                        yield 'token', {'text': visible}
+            visible = response_filter.flush()
+            if visible:
+                yield 'token', {'text': visible}
+        except Exception as e:
+            if started is not None:
+                metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode="async_stream", outcome="error")
+            yield 'error', {'error': f"Response generation failed: {str(e)}", 'thread_id': thread_id}
+            return
+        metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode="async_stream", outcome="ok")
+
+        state['response'] = clean_response(raw_response)
+        state['status'] = 'completed'
+        metrics.record_node("generate", state, time.perf_counter() - started)
+        await asyncio.to_thread(self.complete_turn, thread_id, state, query_embedding)
+        yield 'done', {'response': state['response'], 'timings': state['timings'], 'usage': state['usage'],
+                       'first_token_ms': round(first_token * 1000, 2) if first_token is not None else None,
+                       'thread_id': thread_id, 'cached': False}
+
     def format_response(self, chat_result: Dict[str, Any]) -> str:
         """Format response with sources"""
         response = chat_result['response']
@@ -286,39 +1201,49 @@ class DocumentAgent:
         return formatted
 
 if __name__ == "__main__":
+    import sys
+
     if not groq_api_key:
         print("Error: GROQ_API_KEY not found in environment variables!")
         exit(1)
     
     agent = DocumentAgent(groq_api_key)
     
-    file_path = r"C:\Users\sspl1431\Downloads\f0457fd050a9dc4d5cfaa750ed1ee39d84c8.pdf"
+    # python agent_level.py [document] -- without a document, chat with an existing collection
+    if len(sys.argv) > 1:
+        print("Processing document...")
+        doc_result = agent.process(sys.argv[1])
+        if doc_result['status'] != 'completed':
+            print(f"Processing failed: {doc_result['error']}")
+            exit(1)
+        print("Document processed successfully! Starting chat...")
+    else:
+        collections = agent.list_collections()
+        if not collections:
+            print("No collections yet: python agent_level.py <document.pdf|docx>")
+            exit(1)
+        agent.switch_collection(collections[0]['name'])
+    print(f"Active collection: {agent.current_collection}")
     
-    print("Processing document...")
-    doc_result = agent.process(file_path)
+    thread_id = None
     
-    if doc_result['status'] == 'completed':
-        print("Document processed successfully! Starting chat...")
-        print(f"Active collection: {agent.current_collection}")
+    while True:
+        query = input("\nAsk a question, 'list' for collections, 'switch <collection>' to change, or 'quit': ")
         
-        thread_id = None
+        if query.lower() == 'quit':
+            break
+        elif query.lower() == 'list':
+            for collection in agent.list_collections():
+                marker = "*" if collection['active'] else " "
+                print(f"{marker} {collection['name']}: {collection['chunks']} chunks, {collection['bytes']} bytes, "
+                      f"documents: {', '.join(collection['documents']) or '-'}")
+            continue
+        elif query.lower().startswith('switch '):
+            if agent.switch_collection(query[7:].strip()):
+                thread_id = None
+            continue
         
-        while True:
-            query = input("\nAsk a question, 'list' for collections, 'switch <collection>' to change, or 'quit': ")
-            
-            if query.lower() == 'quit':
-                break
-            elif query.lower() == 'list':
-                agent.list_collections()
-                continue
-            elif query.lower().startswith('switch '):
-                collection_name = query[7:].strip()
-                agent.switch_collection(collection_name)
-                continue
-            
-            result = agent.chat(query, thread_id=thread_id)
-            thread_id = result['thread_id']
-            
-            print(f"\n{agent.format_response(result)}")
-    else:
-        print(f"Processing failed: {doc_result['error']}")
\ No newline at end of file
+        result = agent.chat(query, thread_id=thread_id)
+        thread_id = result['thread_id']
+        
+        print(f"\n{agent.format_response(result)}")
@@ -1,8 +1,24 @@
-from flask import Flask, request, jsonify
+import time
+# Startup is timed from here, so the cost of the imports below is included
+STARTUP_STARTED = time.perf_counter()
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import os
+import json
+import threading
+import uuid
 from werkzeug.utils import secure_filename
 from agent_level import DocumentAgent
+from chunking import get_chunker
+from retrieval import CrossEncoderReranker
+from response_cache import ResponseCache
+from job_queue import IngestionJobQueue, QueueFullError
+from bulk_ingest import BulkIngestor
+from collection_lifecycle import CollectionLifecycle
+from session_store import SessionStore, SqliteSessionStore
+from context_assembly import ContextAssembler
+from conversation_memory import ConversationMemory
+import metrics
 
 app = Flask(__name__)
 
@@ -17,22 +33,235 @@ CORS(app, resources={
 
 app.config['UPLOAD_FOLDER'] = './uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+# Ingestion runs on its own bounded pool so upload bursts can't starve /chat
+app.config['INGEST_WORKERS'] = int(os.getenv("INGEST_WORKERS", 2))
+app.config['INGEST_QUEUE_SIZE'] = int(os.getenv("INGEST_QUEUE_SIZE", 8))
+# Processes used for page-level extraction inside each ingestion job
+app.config['EXTRACT_WORKERS'] = int(os.getenv("EXTRACT_WORKERS", 1))
+# Chunks embedded and written to Chroma per batch (capped by Chroma's max batch size)
+app.config['EMBED_BATCH_SIZE'] = int(os.getenv("EMBED_BATCH_SIZE", 64))
+# OCR output cached by page-image hash so re-ingesting scanned pages skips Tesseract ("" disables)
+app.config['OCR_CACHE_DIR'] = os.getenv("OCR_CACHE_DIR", "./ocr_cache")
+# Bulk imports: extraction processes, manifests for resuming, the only server directory /bulk may
+# read from ("" allows ZIP uploads only) and the size limit of uploaded archives. Uploaded archives
+# are kept apart from UPLOAD_FOLDER, which upload cleanup sweeps, so an unfinished import can resume
+app.config['BULK_WORKERS'] = int(os.getenv("BULK_WORKERS", 0)) or None
+app.config['BULK_MANIFEST_DIR'] = os.getenv("BULK_MANIFEST_DIR", "./bulk_manifests")
+app.config['BULK_IMPORT_ROOT'] = os.getenv("BULK_IMPORT_ROOT", "")
+app.config['BULK_MAX_UPLOAD_MB'] = int(os.getenv("BULK_MAX_UPLOAD_MB", 1024))
+app.config['BULK_UPLOAD_FOLDER'] = os.getenv("BULK_UPLOAD_FOLDER", "./bulk_uploads")
+# Collection lifecycle: evict collections idle for COLLECTION_TTL seconds and the least recently
+# used beyond MAX_COLLECTIONS (0 disables each), remove unreferenced uploads older than
+# UPLOAD_MIN_AGE, and run both every MAINTENANCE_INTERVAL seconds (0 disables the background run)
+app.config['COLLECTION_TTL'] = float(os.getenv("COLLECTION_TTL", 0))
+app.config['MAX_COLLECTIONS'] = int(os.getenv("MAX_COLLECTIONS", 0))
+app.config['UPLOAD_MIN_AGE'] = float(os.getenv("UPLOAD_MIN_AGE", 24 * 3600))
+app.config['MAINTENANCE_INTERVAL'] = float(os.getenv("MAINTENANCE_INTERVAL", 3600))
+# Chunking strategy ("fixed" 1000/200 character windows, or "structure": sentence and table
+# aware chunks within a token budget). "fixed" stays the default: on benchmarks/eval_chunking.py
+# "structure" builds a smaller index but has not beaten it on retrieval hit rate
+app.config['CHUNK_STRATEGY'] = os.getenv("CHUNK_STRATEGY", "fixed")
+app.config['CHUNK_MAX_TOKENS'] = int(os.getenv("CHUNK_MAX_TOKENS", 256))
+# Retrieval: passages sent to the LLM, candidates taken from each of the vector and BM25
+# retrievers, and an optional local cross-encoder (needs sentence-transformers) to rerank them
+app.config['RETRIEVAL_TOP_K'] = int(os.getenv("RETRIEVAL_TOP_K", 3))
+app.config['RETRIEVAL_CANDIDATES'] = int(os.getenv("RETRIEVAL_CANDIDATES", 20))
+app.config['RERANK_MODEL'] = os.getenv("RERANK_MODEL", "")
+# Fan-out chat across several collections: passages kept in total and per collection
+app.config['FANOUT_TOP_K'] = int(os.getenv("FANOUT_TOP_K", 6))
+app.config['FANOUT_COLLECTION_QUOTA'] = int(os.getenv("FANOUT_COLLECTION_QUOTA", 2))
+app.config['RETRIEVAL_WORKERS'] = int(os.getenv("RETRIEVAL_WORKERS", 8))
+# Context packing: token budget for retrieved passages in the prompt (0 = unlimited) and
+# whether passages are trimmed to the sentences that match the query
+app.config['CONTEXT_MAX_TOKENS'] = int(os.getenv("CONTEXT_MAX_TOKENS", 1500))
+app.config['CONTEXT_TRIM'] = os.getenv("CONTEXT_TRIM", "1") == "1"
+# Table index: answer exact and filtered lookups in extracted tables without the LLM, and
+# the most matching rows per table put in the prompt otherwise
+app.config['TABLE_LOOKUP'] = os.getenv("TABLE_LOOKUP", "1") == "1"
+app.config['TABLE_MAX_ROWS'] = int(os.getenv("TABLE_MAX_ROWS", 20))
+# Conversation memory fed to generation: recent turns kept verbatim within a token budget,
+# older turns folded into a summary of at most MEMORY_SUMMARY_TOKENS
+app.config['MEMORY_TURNS'] = int(os.getenv("MEMORY_TURNS", 4))
+app.config['MEMORY_MAX_TOKENS'] = int(os.getenv("MEMORY_MAX_TOKENS", 800))
+app.config['MEMORY_SUMMARY_TOKENS'] = int(os.getenv("MEMORY_SUMMARY_TOKENS", 300))
+# Async serving (asgi.py): concurrent Groq requests per process, threads for Chroma/SQLite
+# work moved off the event loop, and pooled connections to the checkpoint database
+app.config['LLM_CONCURRENCY'] = int(os.getenv("LLM_CONCURRENCY", 64))
+app.config['ASYNC_THREADS'] = int(os.getenv("ASYNC_THREADS", 64))
+app.config['CHECKPOINT_POOL_SIZE'] = int(os.getenv("CHECKPOINT_POOL_SIZE", 8))
+# Checkpoints kept per chat thread; older ones are pruned after every turn
+app.config['CHECKPOINT_KEEP'] = int(os.getenv("CHECKPOINT_KEEP", 1))
+# Chat sessions: "memory" or "sqlite" (stored in the checkpoint database, survives restarts),
+# bounded by count (least recently used first), idle TTL and turns kept per session
+app.config['SESSION_BACKEND'] = os.getenv("SESSION_BACKEND", "memory")
+app.config['SESSION_MAX'] = int(os.getenv("SESSION_MAX", 1000))
+app.config['SESSION_TTL'] = float(os.getenv("SESSION_TTL", 24 * 3600))
+app.config['SESSION_MAX_TURNS'] = int(os.getenv("SESSION_MAX_TURNS", 200))
+# Answer cache: size/TTL bounds, optional near-duplicate matching and on-disk persistence
+app.config['RESPONSE_CACHE_SIZE'] = int(os.getenv("RESPONSE_CACHE_SIZE", 512))
+app.config['RESPONSE_CACHE_MAX_MB'] = int(os.getenv("RESPONSE_CACHE_MAX_MB", 32))
+app.config['RESPONSE_CACHE_TTL'] = float(os.getenv("RESPONSE_CACHE_TTL", 3600))
+app.config['RESPONSE_CACHE_SIMILARITY'] = os.getenv("RESPONSE_CACHE_SIMILARITY")
+app.config['RESPONSE_CACHE_PATH'] = os.getenv("RESPONSE_CACHE_PATH", "./response_cache.json")
+app.config['RESPONSE_CACHE_SAVE_INTERVAL'] = float(os.getenv("RESPONSE_CACHE_SAVE_INTERVAL", 60))
+# cProfile dumps per request: "off", "header" (only requests sent with X-Profile: 1) or "all"
+app.config['PROFILE_REQUESTS'] = os.getenv("PROFILE_REQUESTS", "off")
+app.config['PROFILE_DIR'] = os.getenv("PROFILE_DIR", "./profiles")
 
-# Ensure upload directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Warm-up before /ready reports ready: "background" (serve while warming), "blocking" (warm
+# before the first request is served) or "off" (first request pays)
+app.config['WARMUP'] = os.getenv("WARMUP", "background")
 
-# Initialize the agent
-groq_api_key = os.getenv("GROQ_API_KEY") 
-agent = DocumentAgent(groq_api_key)
+startup = {'imports_ms': round((time.perf_counter() - STARTUP_STARTED) * 1000, 2), 'ready': False}
 
-# Store active sessions
-active_sessions = {}
+# Services are built by init_services() on the first request (or by the ASGI lifespan startup),
+# so importing this module doesn't open databases, load models or start threads
+agent = None
+bulk_ingestor = None
+job_queue = None
+lifecycle = None
+session_store = None
+profiler = None
+services_ready = False
+services_lock = threading.Lock()
+
+def release_session(session):
+    """Drop the checkpoints of an evicted session's thread"""
+    if session.get('thread_id'):
+        agent.checkpointer.delete_thread(session['thread_id'])
+
+def warm_up():
+    """Preload models and graphs, then mark the process ready"""
+    try:
+        if app.config['WARMUP'] != "off":
+            warmup_started = time.perf_counter()
+            startup['warmup'] = agent.warm_up()
+            startup['warmup_ms'] = round((time.perf_counter() - warmup_started) * 1000, 2)
+    except Exception as e:
+        # A failed warm-up only costs the first request its load time; it doesn't block serving
+        startup['warmup_error'] = str(e)
+    startup['total_ms'] = round((time.perf_counter() - STARTUP_STARTED) * 1000, 2)
+    startup['ready'] = True
+    metrics.observe_stages("startup", {key: value for key, value in startup.items() if key.endswith("_ms")})
+    print(f"Ready after {startup['total_ms']} ms: {startup}")
+
+def init_services():
+    """Build the agent, queues, stores and background threads once; later calls return at once"""
+    global agent, bulk_ingestor, job_queue, lifecycle, session_store, profiler, services_ready
+    if services_ready:
+        return
+    with services_lock:
+        if services_ready:
+            return
+        services_started = time.perf_counter()
+
+        # Ensure upload directories exist
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['BULK_UPLOAD_FOLDER'], exist_ok=True)
+
+        # Initialize the agent
+        groq_api_key = os.getenv("GROQ_API_KEY")
+        agent = DocumentAgent(
+            groq_api_key,
+            extract_workers=app.config['EXTRACT_WORKERS'],
+            embed_batch_size=app.config['EMBED_BATCH_SIZE'],
+            chunker=get_chunker(
+                app.config['CHUNK_STRATEGY'],
+                **({'max_tokens': app.config['CHUNK_MAX_TOKENS']} if app.config['CHUNK_STRATEGY'] == "structure" else {})
+            ),
+            top_k=app.config['RETRIEVAL_TOP_K'],
+            candidate_k=app.config['RETRIEVAL_CANDIDATES'],
+            reranker=CrossEncoderReranker(app.config['RERANK_MODEL']) if app.config['RERANK_MODEL'] else None,
+            fanout_top_k=app.config['FANOUT_TOP_K'],
+            collection_quota=app.config['FANOUT_COLLECTION_QUOTA'],
+            retrieval_workers=app.config['RETRIEVAL_WORKERS'],
+            checkpoint_pool_size=app.config['CHECKPOINT_POOL_SIZE'],
+            llm_concurrency=app.config['LLM_CONCURRENCY'],
+            ocr_cache_dir=app.config['OCR_CACHE_DIR'] or None,
+            context_assembler=ContextAssembler(
+                max_tokens=app.config['CONTEXT_MAX_TOKENS'],
+                trim_sentences=app.config['CONTEXT_TRIM']
+            ),
+            memory=ConversationMemory(
+                max_turns=app.config['MEMORY_TURNS'],
+                max_tokens=app.config['MEMORY_MAX_TOKENS'],
+                summary_tokens=app.config['MEMORY_SUMMARY_TOKENS']
+            ),
+            checkpoint_keep=app.config['CHECKPOINT_KEEP'],
+            table_lookup=app.config['TABLE_LOOKUP'],
+            table_rows=app.config['TABLE_MAX_ROWS']
+        )
+        agent.response_cache = ResponseCache(
+            max_entries=app.config['RESPONSE_CACHE_SIZE'],
+            max_bytes=app.config['RESPONSE_CACHE_MAX_MB'] * 1024 * 1024,
+            ttl_seconds=app.config['RESPONSE_CACHE_TTL'],
+            similarity_threshold=(float(app.config['RESPONSE_CACHE_SIMILARITY'])
+                                  if app.config['RESPONSE_CACHE_SIMILARITY'] else None),
+            embedding_function=agent.embedding_function,
+            persist_path=app.config['RESPONSE_CACHE_PATH'] or None,
+            save_interval=app.config['RESPONSE_CACHE_SAVE_INTERVAL']
+        )
+        bulk_ingestor = BulkIngestor(
+            agent,
+            workers=app.config['BULK_WORKERS'],
+            manifest_dir=app.config['BULK_MANIFEST_DIR'],
+            staging_dir=os.path.join(app.config['UPLOAD_FOLDER'], "bulk")
+        )
+        job_queue = IngestionJobQueue(
+            agent,
+            max_workers=app.config['INGEST_WORKERS'],
+            max_queue_size=app.config['INGEST_QUEUE_SIZE'],
+            bulk_ingestor=bulk_ingestor
+        )
+
+        lifecycle = CollectionLifecycle(
+            agent,
+            upload_folder=app.config['UPLOAD_FOLDER'],
+            ttl_seconds=app.config['COLLECTION_TTL'],
+            max_collections=app.config['MAX_COLLECTIONS'],
+            min_upload_age=app.config['UPLOAD_MIN_AGE'],
+            interval=app.config['MAINTENANCE_INTERVAL']
+        )
+
+        # Store active sessions
+        session_options = dict(
+            max_sessions=app.config['SESSION_MAX'],
+            ttl_seconds=app.config['SESSION_TTL'],
+            max_turns=app.config['SESSION_MAX_TURNS'],
+            on_evict=release_session
+        )
+        if app.config['SESSION_BACKEND'] == "sqlite":
+            session_store = SqliteSessionStore(agent.checkpoint_pool.db_path, **session_options)
+        else:
+            session_store = SessionStore(**session_options)
+
+        profiler = metrics.RequestProfiler(app.config['PROFILE_DIR']) if app.config['PROFILE_REQUESTS'] != "off" else None
+        startup['services_ms'] = round((time.perf_counter() - services_started) * 1000, 2)
+
+        lifecycle.start()
+        if app.config['WARMUP'] == "background":
+            threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+        else:
+            warm_up()
+        services_ready = True
 
 # Add test endpoint
 @app.route('/', methods=['GET'])
 def test():
     return jsonify({'message': 'API is working!', 'status': 'OK'})
 
+# Readiness probe: 503 until warm-up has finished, with the startup timings once it has
+@app.route('/ready', methods=['GET'])
+def ready():
+    response = jsonify({'status': 'ready' if startup['ready'] else 'warming_up', 'startup': startup})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200 if startup['ready'] else 503
+
+# Build the services before the first request needs them
+@app.before_request
+def ensure_services():
+    init_services()
+
 # Handle preflight requests
 @app.before_request
 def handle_preflight():
@@ -43,55 +272,284 @@ def handle_preflight():
         response.headers.add('Access-Control-Allow-Methods', "GET,PUT,POST,DELETE,OPTIONS")
         return response
 
+# Time every request, and profile it when profiling is switched on for it
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if profiler and (app.config['PROFILE_REQUESTS'] == "all" or request.headers.get('X-Profile') == "1"):
+        g.profile = profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    # Streaming responses are timed up to their headers; their generation is in the node metrics
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.HTTP_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=request.url_rule.rule if request.url_rule else "unmatched",
+            status=response.status_code
+        )
+    profile = g.pop('profile', None)
+    if profile is not None:
+        response.headers['X-Profile-File'] = profiler.stop(profile, f"{request.method}_{request.path}")
+    return response
+
+def queue_upload(file, tags_field: str = '', collection_name: str = None, revision: str = ''):
+    """Save an uploaded file and queue it for ingestion; returns (payload, status code).
+
+    The upload gets a new collection unless it names one to update (collection_name) or is
+    flagged as a new revision ('true') of the document last uploaded under its filename.
+    """
+    if file is None:
+        return {'error': 'No file provided'}, 400
+    if file.filename == '':
+        return {'error': 'No file selected'}, 400
+    
+    # Save uploaded file in its own directory so concurrent uploads of the same name never
+    # overwrite each other; the file keeps its name for the collection name and registry
+    filename = secure_filename(file.filename)
+    upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], uuid.uuid4().hex)
+    os.makedirs(upload_dir)
+    file_path = os.path.join(upload_dir, filename)
+    file.save(file_path)
+    
+    # Optional comma-separated tags group collections for fan-out chat
+    tags = [tag.strip() for tag in tags_field.split(',') if tag.strip()]
+    
+    # Queue document for background processing
+    try:
+        job = job_queue.submit(file_path, collection_name=collection_name or None, tags=tags,
+                               revision=revision.lower() in ('1', 'true', 'yes'))
+    except QueueFullError as e:
+        return {'error': str(e), 'status': 'rejected'}, 429
+    
+    return {
+        'message': 'Document queued for processing',
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'status_url': f"/jobs/{job['job_id']}"
+    }, 202
+
+def get_session(session_id: str, collection_name: str = None):
+    """Get or create a chat session, remembering the collection it started with"""
+    return session_store.get_or_create(session_id, collection_name or agent.current_collection)
+
+def record_turn(session, query: str, result):
+    """Store a finished turn in the session and return it"""
+    response_bytes = len(json.dumps({'response': result['response'], 'sources': result.get('sources', [])}))
+    return session_store.record_turn(
+        session['session_id'], query, result['response'], result['thread_id'], response_bytes
+    )
+
 @app.route('/upload', methods=['POST', 'OPTIONS'])
 def upload_document():
     try:
-        if 'file' not in request.files:
-            response = jsonify({'error': 'No file provided'})
-            response.headers.add("Access-Control-Allow-Origin", "*")
-            return response, 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            response = jsonify({'error': 'No file selected'})
-            response.headers.add("Access-Control-Allow-Origin", "*")
-            return response, 400
-        
-        # Save uploaded file
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
-        # Process document
-        result = agent.process(file_path)
-        
-        if result['status'] == 'completed':
-            response = jsonify({
-                'message': 'Document processed successfully',
-                'collection_name': result['collection_name'],
-                'status': 'success'
-            })
-            response.headers.add("Access-Control-Allow-Origin", "*")
-            return response, 200
+        payload, status = queue_upload(request.files.get('file'), request.form.get('tags', ''),
+                                       request.form.get('collection_name'), request.form.get('revision', ''))
+        response = jsonify(payload)
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, status
+            
+    except Exception as e:
+        response = jsonify({'error': str(e)})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 500
+
+def resolve_bulk_source(path: str):
+    """Absolute path of a server-side import source inside BULK_IMPORT_ROOT, or None if not allowed"""
+    root = app.config['BULK_IMPORT_ROOT']
+    if not root:
+        return None
+    root = os.path.realpath(root)
+    source = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, source]) != root or not os.path.exists(source):
+        return None
+    return source
+
+@app.route('/bulk', methods=['POST', 'OPTIONS'])
+def bulk_import():
+    """Queue a bulk import: a ZIP upload ('file'), or JSON {"path": <directory or .zip under
+    BULK_IMPORT_ROOT>}; 'tags' are added to every collection. Rerunning the same server-side
+    source resumes it; an uploaded archive is a new import each time and is deleted once imported."""
+    try:
+        request.max_content_length = app.config['BULK_MAX_UPLOAD_MB'] * 1024 * 1024
+        if request.files.get('file'):
+            file = request.files['file']
+            filename = secure_filename(file.filename)
+            if not filename.lower().endswith('.zip'):
+                response = jsonify({'error': 'Bulk uploads must be a ZIP archive'})
+                response.headers.add("Access-Control-Allow-Origin", "*")
+                return response, 400
+            # Each archive gets its own directory, so a second upload of the same name never
+            # overwrites one a queued or running import is reading; it is deleted once imported
+            upload_dir = os.path.join(app.config['BULK_UPLOAD_FOLDER'], uuid.uuid4().hex)
+            os.makedirs(upload_dir)
+            source = os.path.join(upload_dir, filename)
+            file.save(source)
+            tags_field = request.form.get('tags', '')
+            remove_source = True
         else:
-            response = jsonify({
-                'error': result['error'],
-                'status': 'failed'
-            })
+            data = request.get_json(silent=True) or {}
+            source = resolve_bulk_source(data.get('path', ''))
+            if source is None:
+                response = jsonify({'error': 'Provide a ZIP file, or a path inside the configured bulk import root'})
+                response.headers.add("Access-Control-Allow-Origin", "*")
+                return response, 400
+            tags_field = data.get('tags', '')
+            if isinstance(tags_field, list):
+                tags_field = ','.join(tags_field)
+            remove_source = False
+
+        tags = [tag.strip() for tag in tags_field.split(',') if tag.strip()]
+        try:
+            job = job_queue.submit(source, tags=tags, kind="bulk", remove_source=remove_source)
+        except QueueFullError as e:
+            if remove_source:
+                os.remove(source)
+                os.rmdir(os.path.dirname(source))
+            response = jsonify({'error': str(e), 'status': 'rejected'})
             response.headers.add("Access-Control-Allow-Origin", "*")
-            return response, 500
-            
+            return response, 429
+
+        response = jsonify({
+            'message': 'Bulk import queued',
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'status_url': f"/jobs/{job['job_id']}"
+        })
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 202
+
+    except Exception as e:
+        response = jsonify({'error': str(e)})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 500
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    response = jsonify({'jobs': job_queue.list_jobs(), 'queue': job_queue.stats()})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        response = jsonify({'error': 'Job not found'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 404
+    
+    response = jsonify(job)
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200
+
+@app.route('/collections', methods=['GET'])
+def list_collections():
+    response = jsonify({'collections': agent.list_collections(), 'active': agent.current_collection})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200
+
+@app.route('/collections/switch', methods=['POST', 'OPTIONS'])
+def switch_collection():
+    """Make a collection the default for new sessions (and for session_id, if given)"""
+    data = request.get_json(silent=True) or {}
+    collection_name = data.get('collection_name')
+    if not collection_name or not agent.switch_collection(collection_name):
+        response = jsonify({'error': 'Collection not found'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 404
+    if data.get('session_id'):
+        session_store.set_collection(data['session_id'], collection_name)
+    response = jsonify({'active': collection_name})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200
+
+@app.route('/collections/<collection_name>', methods=['DELETE', 'OPTIONS'])
+def delete_collection(collection_name):
+    if not agent.collection_exists(collection_name):
+        response = jsonify({'error': 'Collection not found'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 404
+    removed = lifecycle.remove(collection_name)
+    response = jsonify({'deleted': collection_name, 'uploads_removed': removed})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200
+
+@app.route('/collections/compact', methods=['POST', 'OPTIONS'])
+def compact_collections():
+    """Run eviction, then compaction; ?vacuum=0 skips the SQLite VACUUM"""
+    try:
+        report = {
+            'evict': lifecycle.evict(),
+            'compact': lifecycle.compact(vacuum=request.args.get('vacuum', '1') != '0')
+        }
+        response = jsonify(report)
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 200
     except Exception as e:
         response = jsonify({'error': str(e)})
         response.headers.add("Access-Control-Allow-Origin", "*")
         return response, 500
 
+@app.route('/tags', methods=['GET'])
+def list_tags():
+    response = jsonify({'tags': agent.registry.list_tags()})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200
+
+@app.route('/sessions/stats', methods=['GET'])
+def sessions_stats():
+    response = jsonify(session_store.stats())
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200
+
+@app.route('/sessions/<session_id>', methods=['GET'])
+def get_session_stats(session_id):
+    stats = session_store.session_stats(session_id)
+    if stats is None:
+        response = jsonify({'error': 'Session not found'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 404
+    
+    response = jsonify(stats)
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200
+
+@app.route('/sessions/<session_id>/history', methods=['GET'])
+def get_session_history(session_id):
+    """Page through a session's turns, oldest first: ?offset=<turn index>&limit=<n, max 100>"""
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    history = session_store.history(session_id, offset=offset, limit=limit)
+    if history is None:
+        response = jsonify({'error': 'Session not found'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 404
+    
+    response = jsonify(history)
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    response = jsonify(agent.response_cache.stats() if agent.response_cache else {'enabled': False})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of node, stage, LLM and HTTP latency histograms and token counters"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/chat', methods=['POST', 'OPTIONS'])
 def chat():
     try:
         data = request.get_json()
         query = data.get('query')
         collection_name = data.get('collection_name')
+        collection_names = data.get('collection_names')
+        tag = data.get('tag')
         session_id = data.get('session_id', 'default')
         
         if not query:
@@ -100,14 +558,7 @@ def chat():
             return response, 400
         
         # Get or create thread_id for this session
-        if session_id not in active_sessions:
-            active_sessions[session_id] = {
-                'thread_id': None,
-                'collection_name': collection_name or agent.current_collection,
-                'chat_history': []
-            }
-        
-        session = active_sessions[session_id]
+        session = get_session(session_id, collection_name)
         
         # Use collection from session if not provided
         if not collection_name:
@@ -117,22 +568,24 @@ def chat():
         result = agent.chat(
             query=query, 
             collection_name=collection_name,
-            thread_id=session['thread_id']
+            thread_id=session['thread_id'],
+            collection_names=collection_names,
+            tag=tag
         )
         
-        # Update session
-        session['thread_id'] = result['thread_id']
-        session['chat_history'].append({
-            'query': query,
-            'response': result['response']
-        })
+        # Update session; earlier turns are served by /sessions/<session_id>/history
+        turn = record_turn(session, query, result)
         
         response = jsonify({
             'response': result['response'],
             'sources': result['sources'],
+            'retrieval': result.get('retrieval', {}),
+            'timings': result.get('timings', {}),
+            'usage': result.get('usage', {}),
+            'cached': result.get('cached', False),
             'session_id': session_id,
             'thread_id': result['thread_id'],
-            'chat_history': session['chat_history']
+            'turn': turn['index']
         })
         response.headers.add("Access-Control-Allow-Origin", "*")
         return response, 200
@@ -142,6 +595,44 @@ def chat():
         response.headers.add("Access-Control-Allow-Origin", "*")
         return response, 500
 
+@app.route('/chat/stream', methods=['POST', 'OPTIONS'])
+def chat_stream():
+    """Server-Sent Events variant of /chat: a sources event, then token events, then done"""
+    data = request.get_json()
+    query = data.get('query')
+    collection_name = data.get('collection_name')
+    collection_names = data.get('collection_names')
+    tag = data.get('tag')
+    session_id = data.get('session_id', 'default')
+    
+    if not query:
+        response = jsonify({'error': 'Query is required'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response, 400
+    
+    session = get_session(session_id, collection_name)
+    
+    if not collection_name:
+        collection_name = session['collection_name']
+    
+    def generate():
+        try:
+            for event, payload in agent.chat_stream(query, collection_name=collection_name,
+                                                    thread_id=session['thread_id'],
+                                                    collection_names=collection_names, tag=tag):
+                if event == 'done':
+                    payload['turn'] = record_turn(session, query, payload)['index']
+                    payload['session_id'] = session_id
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 if __name__ == '__main__':
     print("Starting Flask API server...")
     print("API will be available at: http://localhost:5000")
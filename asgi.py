@@ -0,0 +1,193 @@
+"""
+ASGI entry point for serving many concurrent chats from one process:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+POST /chat, /chat/stream and /upload are handled natively on the event loop:
+Groq calls are awaited through a pooled async client, while Chroma, SQLite and
+file work run on a thread pool. Every other route, and CORS preflight, falls
+through to the Flask app, so both servers expose the same API.
+"""
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.formparser import parse_form_data
+
+import app as server
+from app import app as flask_app, get_session, record_turn, queue_upload
+import metrics
+
+flask_asgi = WsgiToAsgi(flask_app)
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+async def read_body(receive, limit: int) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get('body', b"")
+        if len(body) > limit:
+            raise RequestTooLarge(f"Request body exceeds {limit} bytes")
+        if not message.get('more_body'):
+            return body
+
+
+async def send_json(send, status: int, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"access-control-allow-origin", b"*")
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def chat(scope, receive, send):
+    data = json.loads(await read_body(receive, flask_app.config['MAX_CONTENT_LENGTH']) or b"{}")
+    query = data.get('query')
+    collection_name = data.get('collection_name')
+    session_id = data.get('session_id', 'default')
+    if not query:
+        return await send_json(send, 400, {'error': 'Query is required'})
+
+    session = await asyncio.to_thread(get_session, session_id, collection_name)
+    result = await server.agent.achat(
+        query,
+        collection_name=collection_name or session['collection_name'],
+        thread_id=session['thread_id'],
+        collection_names=data.get('collection_names'),
+        tag=data.get('tag')
+    )
+    turn = await asyncio.to_thread(record_turn, session, query, result)
+    await send_json(send, 200, {
+        'response': result['response'],
+        'sources': result['sources'],
+        'retrieval': result.get('retrieval', {}),
+        'timings': result.get('timings', {}),
+        'usage': result.get('usage', {}),
+        'cached': result.get('cached', False),
+        'session_id': session_id,
+        'thread_id': result['thread_id'],
+        'turn': turn['index']
+    })
+
+
+async def chat_stream(scope, receive, send):
+    data = json.loads(await read_body(receive, flask_app.config['MAX_CONTENT_LENGTH']) or b"{}")
+    query = data.get('query')
+    collection_name = data.get('collection_name')
+    session_id = data.get('session_id', 'default')
+    if not query:
+        return await send_json(send, 400, {'error': 'Query is required'})
+
+    session = await asyncio.to_thread(get_session, session_id, collection_name)
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b"content-type", b"text/event-stream"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+            (b"access-control-allow-origin", b"*")
+        ]
+    })
+    try:
+        async for event, payload in server.agent.achat_stream(
+            query,
+            collection_name=collection_name or session['collection_name'],
+            thread_id=session['thread_id'],
+            collection_names=data.get('collection_names'),
+            tag=data.get('tag')
+        ):
+            if event == 'done':
+                payload['turn'] = (await asyncio.to_thread(record_turn, session, query, payload))['index']
+                payload['session_id'] = session_id
+            await send({
+                'type': 'http.response.body',
+                'body': f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode(),
+                'more_body': True
+            })
+    except Exception as e:
+        await send({
+            'type': 'http.response.body',
+            'body': f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n".encode(),
+            'more_body': True
+        })
+    await send({'type': 'http.response.body', 'body': b""})
+
+
+async def upload(scope, receive, send):
+    body = await read_body(receive, flask_app.config['MAX_CONTENT_LENGTH'])
+    headers = dict(scope['headers'])
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'CONTENT_TYPE': headers.get(b"content-type", b"").decode(),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body)
+    }
+
+    def save_and_queue():
+        _, form, files = parse_form_data(environ)
+        return queue_upload(files.get('file'), form.get('tags', ''), form.get('collection_name'),
+                            form.get('revision', ''))
+
+    payload, status = await asyncio.to_thread(save_and_queue)
+    await send_json(send, status, payload)
+
+
+ROUTES = {
+    '/chat': chat,
+    '/chat/stream': chat_stream,
+    '/upload': upload
+}
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # asyncio.to_thread runs on the default executor; size it for the expected concurrency
+                asyncio.get_running_loop().set_default_executor(
+                    ThreadPoolExecutor(max_workers=flask_app.config['ASYNC_THREADS'], thread_name_prefix="asgi")
+                )
+                await asyncio.to_thread(server.init_services)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    handler = ROUTES.get(scope['path']) if scope['type'] == 'http' and scope['method'] == 'POST' else None
+    if handler is None:
+        # Flask's own request hooks time (and optionally profile) these routes
+        return await flask_asgi(scope, receive, send)
+
+    started = time.perf_counter()
+    if not server.services_ready:
+        # Without lifespan events (uvicorn --lifespan off) the services are built on the first native request
+        await asyncio.to_thread(server.init_services)
+
+    async def send_and_record(message):
+        if message['type'] == 'http.response.start':
+            # Like the Flask hooks, streamed responses are timed up to their headers
+            metrics.HTTP_SECONDS.observe(time.perf_counter() - started, method="POST",
+                                         route=scope['path'], status=message['status'])
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_and_record)
+    except RequestTooLarge as e:
+        await send_json(send_and_record, 413, {'error': str(e)})
+    except Exception as e:
+        await send_json(send_and_record, 500, {'error': str(e)})
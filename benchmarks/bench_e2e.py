@@ -0,0 +1,347 @@
+"""
+Offline end-to-end benchmark: ingestion and chat latency without a Groq key.
+
+Starts a local fake Groq server (benchmarks/fake_groq.py) with configurable
+latency and token rate, generates text-only, table-heavy and scanned PDFs and
+DOCX files, and runs each scenario in a fresh subprocess so its peak RSS is
+measured on its own:
+
+    ingest  DocumentAgent.process over every document kind
+    chat    DocumentAgent.chat and chat_stream under concurrent load
+    http    the Flask app served over HTTP: /upload + /jobs polling, /chat, /chat/stream
+
+Reports p50/p95/p99 latency, throughput and peak memory per operation as JSON.
+Scanned documents need the tesseract binary; without it they show up as errors.
+
+    python benchmarks/bench_e2e.py --scenarios ingest chat http --concurrency 8 --json e2e.json
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from documents import KINDS, make_document, questions
+from fake_groq import FakeGroqServer
+from offline_embeddings import get_embedding_function
+
+SCENARIOS = ("ingest", "chat", "http")
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile of a list of numbers, q in [0, 100]"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(latencies, errors, wall_seconds, count=None):
+    """Latency percentiles in milliseconds, plus throughput over the operation's wall time"""
+    count = count if count is not None else len(latencies) + len(errors)
+    milliseconds = [seconds * 1000 for seconds in latencies]
+    return {
+        "count": count,
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3],
+        "p50_ms": round(percentile(milliseconds, 50), 2) if milliseconds else None,
+        "p95_ms": round(percentile(milliseconds, 95), 2) if milliseconds else None,
+        "p99_ms": round(percentile(milliseconds, 99), 2) if milliseconds else None,
+        "mean_ms": round(sum(milliseconds) / len(milliseconds), 2) if milliseconds else None,
+        "max_ms": round(max(milliseconds), 2) if milliseconds else None,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_s": round(len(latencies) / wall_seconds, 3) if wall_seconds else None,
+    }
+
+
+def run_load(fn, items, concurrency):
+    """Call fn(item) for every item on a thread pool; fn raises to report an error.
+
+    Returns (latencies of successful calls, error messages, wall seconds).
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def timed(item):
+        started = time.perf_counter()
+        try:
+            fn(item)
+        except Exception as e:
+            with lock:
+                errors.append(str(e)[:200])
+            return
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, items))
+    return latencies, errors, time.perf_counter() - started
+
+
+def generate_documents(directory, kinds, pages, documents):
+    os.makedirs(directory, exist_ok=True)
+    return {kind: [make_document(directory, kind, pages, variant) for variant in range(documents)] for kind in kinds}
+
+
+def make_agent(config, workdir):
+    from agent_level import DocumentAgent
+
+    return DocumentAgent(
+        "offline",
+        db_path=os.path.join(workdir, "chroma_db"),
+        checkpoint_path=os.path.join(workdir, "checkpoints.db"),
+        embedding_function=get_embedding_function(config["embedding"]),
+        extract_workers=config["extract_workers"],
+        ocr_cache_dir=None
+    )
+
+
+def ingest_or_raise(agent, path):
+    result = agent.process(path)
+    if result["status"] != "completed":
+        raise RuntimeError(result["error"])
+    return result
+
+
+def scenario_ingest(config, workdir):
+    documents = generate_documents(os.path.join(workdir, "docs"), config["kinds"], config["pages"],
+                                   config["documents"])
+    agent = make_agent(config, workdir)
+    operations = {}
+    for kind, paths in documents.items():
+        latencies, errors, wall = run_load(lambda path: ingest_or_raise(agent, path), paths,
+                                           config["ingest_concurrency"])
+        operations[f"process_{kind}"] = {
+            **summarize(latencies, errors, wall),
+            "pages_per_s": round(len(latencies) * config["pages"] / wall, 2) if wall else None,
+        }
+    return operations
+
+
+def chat_or_raise(agent, query, collection_name):
+    result = agent.chat(query, collection_name=collection_name)
+    if result["response"].startswith("Error:"):
+        raise RuntimeError(result["response"])
+
+
+def scenario_chat(config, workdir):
+    documents = generate_documents(os.path.join(workdir, "docs"), ["text"], config["pages"], 1)
+    agent = make_agent(config, workdir)
+    collection_name = ingest_or_raise(agent, documents["text"][0])["collection_name"]
+    queries = questions(config["requests"])
+
+    operations = {}
+    latencies, errors, wall = run_load(lambda query: chat_or_raise(agent, query, collection_name), queries,
+                                       config["concurrency"])
+    operations["chat"] = summarize(latencies, errors, wall)
+
+    first_tokens = []
+
+    def stream(query):
+        started = time.perf_counter()
+        first_token = None
+        for event, payload in agent.chat_stream(f"{query} (streamed)", collection_name=collection_name):
+            if event == "token" and first_token is None:
+                first_token = time.perf_counter() - started
+            elif event == "error":
+                raise RuntimeError(payload["error"])
+        first_tokens.append(first_token)
+
+    latencies, errors, wall = run_load(stream, queries, config["concurrency"])
+    operations["chat_stream"] = summarize(latencies, errors, wall)
+    operations["chat_stream_first_token"] = summarize([t for t in first_tokens if t is not None], [], wall)
+    return operations
+
+
+def scenario_http(config, workdir):
+    import httpx
+    from werkzeug.serving import make_server
+
+    # app.py reads its configuration from the environment and uses paths relative to the working directory
+    os.environ.setdefault("RESPONSE_CACHE_PATH", "")
+    import app as app_module
+
+    app_module.init_services()
+    app_module.agent.embedding_function = get_embedding_function(config["embedding"])
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    client = httpx.Client(base_url=base_url, timeout=300,
+                          limits=httpx.Limits(max_connections=config["concurrency"] * 2))
+
+    documents = generate_documents(os.path.join(workdir, "docs"), config["kinds"], config["pages"],
+                                   config["documents"])
+    paths = [path for kind_paths in documents.values() for path in kind_paths]
+    accept_latencies, collections = [], {}
+
+    def upload(path):
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            response = client.post("/upload", files={"file": (os.path.basename(path), f)})
+        if response.status_code != 202:
+            raise RuntimeError(f"upload returned {response.status_code}: {response.text[:100]}")
+        accept_latencies.append(time.perf_counter() - started)
+        job_url = response.json()["status_url"]
+        while True:
+            job = client.get(job_url).json()
+            if job["status"] == "completed":
+                collections[os.path.basename(path)] = job["collection_name"]
+                return
+            if job["status"] == "failed":
+                raise RuntimeError(job["error"])
+            time.sleep(0.05)
+
+    operations = {}
+    latencies, errors, wall = run_load(upload, paths, config["ingest_concurrency"])
+    operations["upload_accept"] = summarize(accept_latencies, [], wall)
+    operations["upload_to_completed"] = summarize(latencies, errors, wall)
+
+    collection_name = next(
+        (name for source, name in collections.items() if source.startswith("text_")),
+        next(iter(collections.values()), None)
+    )
+    queries = list(enumerate(questions(config["requests"])))
+
+    def chat(item):
+        n, query = item
+        response = client.post("/chat", json={"query": query, "collection_name": collection_name,
+                                              "session_id": f"bench-{n % config['concurrency']}"})
+        if response.status_code != 200 or response.json()["response"].startswith("Error:"):
+            raise RuntimeError(f"chat returned {response.status_code}: {response.text[:100]}")
+
+    latencies, errors, wall = run_load(chat, queries, config["concurrency"])
+    operations["http_chat"] = summarize(latencies, errors, wall)
+
+    first_tokens = []
+
+    def chat_stream(item):
+        n, query = item
+        started = time.perf_counter()
+        first_token = None
+        with client.stream("POST", "/chat/stream", json={
+            "query": f"{query} (streamed)", "collection_name": collection_name,
+            "session_id": f"bench-stream-{n % config['concurrency']}"
+        }) as response:
+            for line in response.iter_lines():
+                if line == "event: token" and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif line == "event: error":
+                    raise RuntimeError("stream returned an error event")
+        first_tokens.append(first_token)
+
+    latencies, errors, wall = run_load(chat_stream, queries, config["concurrency"])
+    operations["http_chat_stream"] = summarize(latencies, errors, wall)
+    operations["http_chat_stream_first_token"] = summarize([t for t in first_tokens if t is not None], [], wall)
+
+    client.close()
+    server.shutdown()
+    app_module.job_queue.shutdown(wait=True)
+    return operations
+
+
+def child(scenario, config):
+    workdir = config["workdir"]
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    os.environ["GROQ_BASE_URL"] = config["groq_url"]
+    os.environ["GROQ_API_KEY"] = "offline"
+
+    started = time.perf_counter()
+    operations = globals()[f"scenario_{scenario}"](config, workdir)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "scenario": scenario,
+        "seconds": round(time.perf_counter() - started, 3),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "operations": operations,
+    }))
+
+
+def measure(scenario, config):
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", scenario, json.dumps(config)],
+        capture_output=True, text=True
+    )
+    if out.returncode != 0:
+        return {"scenario": scenario, "failed": True, "stderr": out.stderr[-2000:]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--pages", type=int, default=10, help="pages per generated document")
+    parser.add_argument("--documents", type=int, default=2, help="distinct documents generated per kind")
+    parser.add_argument("--ingest-concurrency", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=50, help="chat requests per chat operation")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent chat clients")
+    parser.add_argument("--extract-workers", type=int, default=1)
+    parser.add_argument("--embedding", choices=["hashing", "default"], default="hashing")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake Groq seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--workdir", help="keep databases and documents here instead of a temporary directory")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("SCENARIO", "CONFIG"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], json.loads(args.child[1]))
+        return
+
+    server = FakeGroqServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                            response_tokens=args.response_tokens)
+    groq_url = server.start()
+    base_dir = args.workdir or tempfile.mkdtemp(prefix="docuquery_bench_")
+    config = {
+        "kinds": args.kinds, "pages": args.pages, "documents": args.documents,
+        "ingest_concurrency": args.ingest_concurrency, "requests": args.requests,
+        "concurrency": args.concurrency, "extract_workers": args.extract_workers, "embedding": args.embedding,
+        "groq_url": groq_url,
+    }
+
+    results = []
+    try:
+        for scenario in args.scenarios:
+            result = measure(scenario, {**config, "workdir": os.path.join(base_dir, scenario)})
+            results.append(result)
+            if result.get("failed"):
+                print(f"{scenario:<8} failed:\n{result['stderr']}")
+                continue
+            print(f"{scenario:<8} {result['seconds']:8.2f}s  peak {result['peak_rss_mb']:8.1f} MB")
+            for name, row in result["operations"].items():
+                print(f"  {name:<30}{row['count']:>5} ok/err {row['count'] - row['errors']}/{row['errors']:<4}"
+                      f"p50 {row['p50_ms'] or 0:>9.1f}  p95 {row['p95_ms'] or 0:>9.1f}  "
+                      f"p99 {row['p99_ms'] or 0:>9.1f} ms  {row['throughput_per_s'] or 0:>8.2f}/s")
+    finally:
+        server.shutdown()
+        if not args.workdir:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    report = {
+        "config": {key: value for key, value in config.items() if key != "groq_url"},
+        "fake_groq": {"latency": args.latency, "tokens_per_second": args.tokens_per_second,
+                      "response_tokens": args.response_tokens, "requests_served": server.requests},
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark the page-wise extractor against the old per-page PyMuPDF4LLMLoader path.
+
+Generates synthetic text PDFs and runs each engine in a fresh subprocess so
+peak RSS is measured per run.
+
+    python benchmarks/bench_pagewise.py --pages 10 100 500
+
+The legacy engine is quadratic in the page count; pass --legacy-max-pages to cap it
+for a quick run.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_pdf(path, pages):
+    import fitz
+
+    doc = fitz.open()
+    for page_num in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((72, 60), f"Section {page_num}", fontsize=16)
+        body = "\n".join(
+            f"Line {line}: the operating torque for unit {page_num}-{line} is {page_num + line} Nm."
+            for line in range(1, 30)
+        )
+        page.insert_text((72, 90), body, fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def run_legacy(path):
+    """The pre-fix path: one loader and a full document parse per page."""
+    import fitz
+    from langchain_pymupdf4llm import PyMuPDF4LLMLoader
+
+    all_text = ""
+    doc = fitz.open(path)
+    for page_num, page in enumerate(doc, start=1):
+        loader = PyMuPDF4LLMLoader(path)
+        text = ""
+        for d in loader.load():
+            if d.metadata['page'] + 1 == page_num:
+                text = d.page_content
+                break
+        all_text += f"--- Page {page_num} ---\n{text}\n"
+    return all_text
+
+
+def run_streaming(path):
+    from text_extrtaction import DocumentProcessor
+
+    return DocumentProcessor(path).process_pdf_pagewise()
+
+
+ENGINES = {"legacy": run_legacy, "streaming": run_streaming}
+
+
+def child(engine, path):
+    start = time.perf_counter()
+    text = ENGINES[engine](path)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_kb / 1024, "chars": len(text)}))
+
+
+def measure(engine, path):
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", engine, path],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--legacy-max-pages", type=int, default=None,
+                        help="skip the legacy engine above this size (it re-parses the document per page, "
+                             "so large sizes take a long time); by default every size runs both engines")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("ENGINE", "PDF"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            make_pdf(path, pages)
+            for engine in ENGINES:
+                if engine == "legacy" and args.legacy_max_pages is not None and pages > args.legacy_max_pages:
+                    print(f"{pages:>5} pages  {engine:<10} skipped (--legacy-max-pages {args.legacy_max_pages})")
+                    continue
+                row = {"pages": pages, "engine": engine, **measure(engine, path)}
+                results.append(row)
+                print(f"{pages:>5} pages  {engine:<10} {row['seconds']:8.2f}s  {row['peak_rss_mb']:8.1f} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Synthetic documents for the offline benchmarks: text-only, table-heavy and
+scanned PDFs, and DOCX files. The variant number changes the content (and so
+the file hash), letting one run ingest several distinct copies of each kind.
+"""
+import os
+import zipfile
+from xml.sax.saxutils import escape
+
+KINDS = ("text", "tables", "scanned", "docx")
+
+
+def body_lines(page_num, variant, lines=28):
+    return [
+        f"Line {line}: the operating torque for unit {page_num}-{line} is {page_num + line + variant} Nm."
+        for line in range(1, lines + 1)
+    ]
+
+
+def make_text_pdf(path, pages=10, variant=0):
+    import fitz
+
+    doc = fitz.open()
+    for page_num in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((72, 60), f"Section {page_num}: maintenance schedule rev {variant}", fontsize=16)
+        page.insert_text((72, 90), "\n".join(body_lines(page_num, variant)), fontsize=10)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_table_pdf(path, pages=10, variant=0, rows=18, columns=("Part", "Code", "Torque", "Interval")):
+    """Ruled tables that pdfplumber's line-based table finder picks up"""
+    import fitz
+
+    doc = fitz.open()
+    col_width, row_height, left, top = 110, 24, 60, 110
+    for page_num in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((60, 70), f"Table {page_num}: torque specifications rev {variant}", fontsize=14)
+        cells = [list(columns)] + [
+            [f"Bolt {page_num}.{row}", f"PX-{page_num * 100 + row + variant}", f"{10 + row + variant} Nm",
+             f"{(row % 4 + 1) * 250} h"]
+            for row in range(1, rows + 1)
+        ]
+        bottom = top + row_height * len(cells)
+        right = left + col_width * len(columns)
+        for i in range(len(cells) + 1):
+            y = top + i * row_height
+            page.draw_line((left, y), (right, y))
+        for j in range(len(columns) + 1):
+            x = left + j * col_width
+            page.draw_line((x, top), (x, bottom))
+        for i, row in enumerate(cells):
+            for j, value in enumerate(row):
+                page.insert_text((left + j * col_width + 4, top + i * row_height + 16), value, fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_scanned_pdf(path, pages=10, variant=0, dpi=100):
+    """Pages that are only an image of text, so extraction has to go through OCR"""
+    import fitz
+
+    source = fitz.open(make_text_pdf(f"{path}.source.pdf", pages, variant))
+    doc = fitz.open()
+    for page in source:
+        pixmap = page.get_pixmap(dpi=dpi)
+        scanned = doc.new_page(width=page.rect.width, height=page.rect.height)
+        scanned.insert_image(scanned.rect, pixmap=pixmap)
+    source.close()
+    os.remove(f"{path}.source.pdf")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+
+def docx_paragraph(text, style=None, page_break=False):
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    brk = '<w:r><w:br w:type="page"/></w:r>' if page_break else ""
+    return f"<w:p>{properties}{brk}<w:r><w:t xml:space=\"preserve\">{escape(text)}</w:t></w:r></w:p>"
+
+
+def docx_table(rows):
+    cells = "".join(
+        "<w:tr>" + "".join(f"<w:tc><w:p><w:r><w:t>{escape(value)}</w:t></w:r></w:p></w:tc>" for value in row) + "</w:tr>"
+        for row in rows
+    )
+    return f"<w:tbl>{cells}</w:tbl>"
+
+
+def make_docx(path, pages=10, variant=0):
+    """A minimal WordprocessingML package written directly, with headings, tables and page breaks"""
+    body = []
+    for page_num in range(1, pages + 1):
+        body.append(docx_paragraph(f"Section {page_num}: maintenance schedule rev {variant}", style="Heading1",
+                                   page_break=page_num > 1))
+        body.extend(docx_paragraph(line) for line in body_lines(page_num, variant, lines=12))
+        body.append(docx_table([["Part", "Code", "Torque"]] + [
+            [f"Bolt {page_num}.{row}", f"PX-{page_num * 100 + row + variant}", f"{10 + row + variant} Nm"]
+            for row in range(1, 6)
+        ]))
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{''.join(body)}</w:body></w:document>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", DOCX_CONTENT_TYPES)
+        package.writestr("_rels/.rels", DOCX_RELS)
+        package.writestr("word/document.xml", document)
+    return path
+
+
+MAKERS = {
+    "text": (make_text_pdf, ".pdf"),
+    "tables": (make_table_pdf, ".pdf"),
+    "scanned": (make_scanned_pdf, ".pdf"),
+    "docx": (make_docx, ".docx"),
+}
+
+
+def make_document(directory, kind, pages=10, variant=0):
+    maker, extension = MAKERS[kind]
+    return maker(os.path.join(directory, f"{kind}_{pages}p_v{variant}{extension}"), pages, variant)
+
+
+def questions(count):
+    """Queries answerable from every generated document kind"""
+    return [
+        f"What is the operating torque for unit {n % 10 + 1}-{n % 12 + 1}?" if n % 2 == 0
+        else f"Which torque and interval apply to part code PX-{(n % 10 + 1) * 100 + n % 18 + 1}?"
+        for n in range(count)
+    ]
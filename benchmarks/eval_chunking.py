@@ -0,0 +1,170 @@
+"""
+Offline evaluation of chunking strategies.
+
+For every strategy, chunks the fixture corpus, embeds it into an in-memory
+Chroma collection and asks the fixture questions. Reports chunk count, index
+size, ingestion time and hit-rate (share of questions where a top-k chunk
+contains the expected answer).
+
+    python benchmarks/eval_chunking.py --embedding hashing --top-k 3
+    python benchmarks/eval_chunking.py --corpus generated
+
+The hand-written fixtures are only a few pages per document, so top-k covers most of
+each document; the generated corpus (long manuals with many similar facts) is large
+enough to tell the strategies apart.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import chromadb
+
+from chunking import count_tokens, get_chunker
+from offline_embeddings import get_embedding_function
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "chunking")
+
+STRATEGIES = {
+    "fixed-1000/200": ("fixed", {"chunk_size": 1000, "chunk_overlap": 200}),
+    "structure-64": ("structure", {"max_tokens": 64}),
+    "structure-128": ("structure", {"max_tokens": 128}),
+    "structure-256": ("structure", {"max_tokens": 256}),
+    "structure-256+1": ("structure", {"max_tokens": 256, "overlap_sentences": 1}),
+}
+
+
+COMPONENTS = [
+    "intake gasket", "drive belt", "coolant filter", "bearing sleeve", "pressure valve", "fuel injector",
+    "impeller seal", "control board", "hydraulic hose", "thermal fuse", "air damper", "check valve",
+    "oil strainer", "torque sensor", "brake pad", "heat exchanger", "flow meter", "relief spring",
+    "motor brush", "vent cap", "gear coupling", "level switch", "pilot lamp", "inlet screen"
+]
+ACTIONS = [
+    ("replace the {part}", "Replace the {part} every {value} operating hours", "hours"),
+    ("tighten the {part}", "Tighten the {part} to {value} Nm with a calibrated wrench", "Nm"),
+    ("clean the {part}", "Clean the {part} after {value} cycles using a soft brush", "cycles"),
+    ("inspect the {part}", "Inspect the {part} for wear at least every {value} days", "days"),
+]
+FILLER = [
+    "Always isolate the supply before opening the housing.",
+    "Record the work in the service log together with the date and the technician's initials.",
+    "Use only genuine spare parts; third-party parts void the warranty.",
+    "Wear protective gloves when handling parts that may still be hot.",
+    "Dispose of used parts according to local environmental regulations.",
+    "If in doubt, contact the authorised service partner for your region.",
+]
+
+
+def generated_corpus(documents=6, pages=24, seed=7):
+    """Long synthetic manuals: every page states several maintenance facts about different
+    parts in the same sentence patterns, plus a model table, so retrieval has to find the
+    one chunk that holds the fact rather than any chunk of a short document"""
+    rng = random.Random(seed)
+    corpus, questions = {}, []
+    for d in range(documents):
+        name = f"manual_{d + 1}.txt"
+        text = ""
+        for page in range(1, pages + 1):
+            lines = [f"--- Page {page} ---", f"Section {page}: maintenance of unit group {d + 1}.{page}"]
+            for part in rng.sample(COMPONENTS, 4):
+                question, fact, _ = rng.choice(ACTIONS)
+                value = rng.randint(10, 9000)
+                label = f"{part} of unit {d + 1}.{page}"
+                lines.append(" ".join([fact.format(part=label, value=value) + "."] + rng.sample(FILLER, 2)))
+                questions.append({"doc": name, "question": f"How often should I {question.format(part=label)}?",
+                                  "answer": f"{fact.format(part=label, value=value)}"})
+            rows = [f"PX-{d + 1}{page:02d}{row} | {rng.randint(2, 60)} bar | {rng.randint(20, 900)} W"
+                    for row in range(1, 6)]
+            lines.append(f"\n--- Table Extracted (Page {page}) ---\nModel | Pressure | Power\n" + "\n".join(rows))
+            row = rng.choice(rows)
+            questions.append({"doc": name, "question": f"What pressure and power does the {row.split(' | ')[0]} have?",
+                              "answer": row})
+            text += "\n".join(lines) + "\n"
+        corpus[name] = text
+    return corpus, questions
+
+
+def load_corpus(corpus_dir):
+    documents = {}
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(".txt"):
+            with open(os.path.join(corpus_dir, name)) as f:
+                documents[name] = f.read()
+    with open(os.path.join(corpus_dir, "questions.jsonl")) as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    return documents, questions
+
+
+def evaluate(label, strategy, options, documents, questions, embedding_function, top_k):
+    chunker = get_chunker(strategy, **options)
+    client = chromadb.EphemeralClient()
+    collection_name = label.replace("/", "_").replace("+", "_")
+    try:
+        client.delete_collection(collection_name)
+    except Exception:
+        pass
+    collection = client.create_collection(collection_name, embedding_function=embedding_function)
+
+    started = time.perf_counter()
+    texts, metadatas, ids = [], [], []
+    for doc_name, text in documents.items():
+        for i, chunk in enumerate(chunker.chunk(text)):
+            texts.append(chunk['text'])
+            metadatas.append({"doc": doc_name, "page": chunk['page']})
+            ids.append(f"{doc_name}_{i}")
+    embeddings = embedding_function(texts)
+    collection.add(documents=texts, embeddings=embeddings, metadatas=metadatas, ids=ids)
+    ingest_seconds = time.perf_counter() - started
+
+    hits = 0
+    for question in questions:
+        results = collection.query(
+            query_texts=[question['question']], n_results=top_k, where={"doc": question['doc']}
+        )
+        if any(question['answer'].lower() in doc.lower() for doc in results['documents'][0]):
+            hits += 1
+
+    return {
+        "strategy": label,
+        "chunks": len(texts),
+        "index_chars": sum(len(t) for t in texts),
+        "index_tokens": sum(count_tokens(t) for t in texts),
+        "embedding_bytes": len(texts) * len(embeddings[0]) * 4 if texts else 0,
+        "ingest_ms": round(ingest_seconds * 1000, 2),
+        "hit_rate": round(hits / len(questions), 4) if questions else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=FIXTURES,
+                        help="directory with .txt documents and questions.jsonl, or 'generated'")
+    parser.add_argument("--embedding", choices=["hashing", "default"], default="hashing")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    documents, questions = generated_corpus() if args.corpus == "generated" else load_corpus(args.corpus)
+    embedding_function = get_embedding_function(args.embedding)
+
+    results = []
+    print(f"{'strategy':<18}{'chunks':>8}{'chars':>9}{'tokens':>9}{'ingest ms':>11}{'hit@' + str(args.top_k):>8}")
+    for label, (strategy, options) in STRATEGIES.items():
+        row = evaluate(label, strategy, options, documents, questions, embedding_function, args.top_k)
+        results.append(row)
+        print(f"{label:<18}{row['chunks']:>8}{row['index_chars']:>9}{row['index_tokens']:>9}"
+              f"{row['ingest_ms']:>11.1f}{row['hit_rate']:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
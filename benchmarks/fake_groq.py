@@ -0,0 +1,125 @@
+"""
+Local stand-in for Groq's OpenAI-compatible chat completions API.
+
+Answers every request after a fixed latency, then produces tokens at a fixed
+rate, both for plain and streamed (SSE) completions, and reports token usage
+the way Groq does (x_groq.usage on the last streamed chunk). Point the Groq
+SDK at it with GROQ_BASE_URL:
+
+    python benchmarks/fake_groq.py --port 8765 --latency 0.3 --tokens-per-second 200
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=offline python app.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self.send_json(404, {'error': {'message': f"Unknown path {self.path}"}})
+            return
+
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        prompt_tokens = sum(len(message.get('content', '').split()) for message in body.get('messages', []))
+        tokens = ["<think>", "checking", "the", "manual", "</think>"] + [
+            f"word{n}" for n in range(server.response_tokens)
+        ]
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(tokens),
+                 'total_tokens': prompt_tokens + len(tokens)}
+
+        time.sleep(server.latency)
+        if body.get('stream'):
+            self.stream(tokens, usage)
+            return
+        if server.tokens_per_second:
+            time.sleep(len(tokens) / server.tokens_per_second)
+        self.send_json(200, {
+            'id': "chatcmpl-offline", 'object': "chat.completion", 'created': int(time.time()),
+            'model': body.get('model', "offline"),
+            'choices': [{'index': 0, 'message': {'role': "assistant", 'content': " ".join(tokens)},
+                         'finish_reason': "stop"}],
+            'usage': usage
+        })
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def stream(self, tokens, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        delay = 1 / self.server.tokens_per_second if self.server.tokens_per_second else 0
+        for n, token in enumerate(tokens):
+            self.send_event({'choices': [{'index': 0, 'delta': {'content': token if n == 0 else f" {token}"},
+                                          'finish_reason': None}]})
+            time.sleep(delay)
+        self.send_event({'choices': [{'index': 0, 'delta': {}, 'finish_reason': "stop"}],
+                         'x_groq': {'id': "offline", 'usage': usage}})
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_event(self, payload):
+        chunk = {'id': "chatcmpl-offline", 'object': "chat.completion.chunk", 'created': int(time.time()),
+                 'model': "offline", **payload}
+        self.write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+    def write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+class FakeGroqServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.3, tokens_per_second=200.0, response_tokens=64):
+        super().__init__((host, port), FakeGroqHandler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        """Serve from a background thread and return the base URL"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="0 for no generation delay")
+    parser.add_argument("--response-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    server = FakeGroqServer(args.host, args.port, args.latency, args.tokens_per_second, args.response_tokens)
+    print(f"Fake Groq API on {server.url} (latency {args.latency}s, {args.tokens_per_second} tokens/s)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
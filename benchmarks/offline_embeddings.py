@@ -0,0 +1,48 @@
+"""
+Deterministic feature-hashing embeddings for running benchmarks without
+downloading Chroma's ONNX model. Quality is far below a real model; use it to
+compare strategies against each other, not to judge absolute retrieval quality.
+"""
+import hashlib
+import re
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+WORD = re.compile(r"\w+")
+
+
+class HashingEmbeddingFunction(EmbeddingFunction[Documents]):
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def __call__(self, input: Documents) -> Embeddings:
+        embeddings = []
+        for text in input:
+            words = WORD.findall(text.lower())
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                vector[int.from_bytes(digest, "little") % self.dimensions] += 1.0
+            norm = np.linalg.norm(vector)
+            embeddings.append(vector / norm if norm else vector)
+        return embeddings
+
+    @staticmethod
+    def name() -> str:
+        return "hashing"
+
+    def get_config(self):
+        return {"dimensions": self.dimensions}
+
+    @staticmethod
+    def build_from_config(config):
+        return HashingEmbeddingFunction(**config)
+
+
+def get_embedding_function(name: str):
+    """'hashing' for the offline stand-in, 'default' for Chroma's MiniLM model"""
+    if name == "hashing":
+        return HashingEmbeddingFunction()
+    from chromadb.utils import embedding_functions
+    return embedding_functions.DefaultEmbeddingFunction()
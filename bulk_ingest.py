@@ -0,0 +1,463 @@
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, Callable, Optional
+
+from text_extrtaction import DocumentProcessor
+from document_registry import DocumentRegistry
+from chunking import Chunker
+from table_index import collect_tables
+import metrics
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+
+
+def _extract_document(file_path: str, chunker: Chunker, ocr_cache_dir: Optional[str]) -> Dict[str, Any]:
+    """Pool worker: validate, extract and chunk one document, returning everything the writer needs"""
+    processor = DocumentProcessor(file_path, ocr_cache_dir=ocr_cache_dir)
+    if not processor.prepare():
+        raise ValueError("Unsupported file format or unreadable DOCX")
+    page_hashes = processor.page_hashes()
+    tables = []
+    chunks = list(chunker.chunk_stream(collect_tables(processor.stream_pages(use_table_aware=True), tables)))
+    return {
+        'page_hashes': page_hashes,
+        'chunks': chunks,
+        'tables': tables,
+        'stage_timings': processor.stage_timings
+    }
+
+
+class BulkManifest:
+    """Append-only JSON lines log of every file of a bulk import; the last line per path wins.
+
+    A file is only logged 'completed' after its chunks, lexical index and registry entries are
+    written, and logged 'writing' (with its collection) before the first chunk is added, so a
+    rerun can skip finished files and clean up the one that was interrupted mid-write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by a crash; the file it describes is simply redone
+                        continue
+                    self.entries[entry['path']] = entry
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a")
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(path)
+
+    def record(self, path: str, status: str, **fields):
+        entry = {'path': path, 'status': status, **fields, 'at': time.time()}
+        self.entries[path] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class BulkIngestor:
+    """Ingests a directory or ZIP archive of documents into one collection per document.
+
+    Documents are extracted and chunked in a process pool of DocumentProcessor workers while
+    the calling thread is the only writer: it embeds chunks in batches that span documents,
+    adds each batch to the documents' collections and records them in the registry. Progress
+    is kept in a BulkManifest, so an interrupted import continues where it stopped.
+    """
+
+    def __init__(self, agent, workers: int = None, manifest_dir: str = "./bulk_manifests",
+                 staging_dir: str = "./uploads/bulk", files_in_flight: int = 2):
+        self.agent = agent
+        self.workers = workers or os.cpu_count() or 1
+        self.manifest_dir = manifest_dir
+        self.staging_dir = staging_dir
+        self.files_in_flight = files_in_flight
+
+    def manifest_path(self, source: str) -> str:
+        """Default manifest of a source: the same directory or archive path always resumes the same import"""
+        source = os.path.abspath(source)
+        name = ''.join(c if c.isalnum() else '_' for c in os.path.basename(source.rstrip(os.sep)))
+        digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.manifest_dir, f"{name}_{digest}.jsonl")
+
+    def discover(self, source: str) -> List[Dict[str, Any]]:
+        """Supported documents of a directory (recursively) or ZIP archive, in a stable order.
+
+        Each entry has the document's 'path' relative to the source (its key in the manifest),
+        the 'source' it is registered under and its chunks cite (the absolute file path, or
+        /path/to/archive.zip!member for an archive member, which is only staged on disk while it
+        is imported) and a 'fingerprint' that changes when the file does. Qualifying the source
+        name with the import source keeps documents of the same relative path in different
+        imports from being taken for revisions of each other.
+        """
+        files = []
+        source = os.path.abspath(source)
+        if os.path.isdir(source):
+            for root, dirs, names in os.walk(source):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(names):
+                    if name.startswith(".") or not name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        continue
+                    file_path = os.path.join(root, name)
+                    stat = os.stat(file_path)
+                    files.append({
+                        'path': os.path.relpath(file_path, source).replace(os.sep, "/"),
+                        'file_path': file_path,
+                        'source': file_path,
+                        'fingerprint': f"{stat.st_size}:{stat.st_mtime_ns}"
+                    })
+            return files
+
+        if zipfile.is_zipfile(source):
+            with zipfile.ZipFile(source) as archive:
+                for info in archive.infolist():
+                    member = posixpath.normpath(info.filename)
+                    if (info.is_dir() or member.startswith(("/", "../")) or member == ".."
+                            or posixpath.basename(member).startswith(".") or member.startswith("__MACOSX/")
+                            or not member.lower().endswith(SUPPORTED_EXTENSIONS)):
+                        continue
+                    files.append({'path': member, 'member': info.filename,
+                                  'source': f"{source}!{member}",
+                                  'fingerprint': f"{info.file_size}:{info.CRC}"})
+            return sorted(files, key=lambda file: file['path'])
+
+        raise ValueError(f"{source} is neither a directory nor a ZIP archive")
+
+    def run(self, source: str, tags: List[str] = None, manifest_path: str = None,
+            progress_callback: Callable[..., None] = None) -> Dict[str, Any]:
+        """Ingest every supported document under source that the manifest doesn't already list
+        as done, and return a summary of the run"""
+        started = time.perf_counter()
+        files = self.discover(source)
+        manifest = BulkManifest(manifest_path or self.manifest_path(source))
+        tags = tags or []
+        summary = {
+            'source': source,
+            'manifest': manifest.path,
+            'files_total': len(files),
+            'files_done': 0,
+            'completed': 0,
+            'duplicate': 0,
+            'failed': 0,
+            'resumed': 0,
+            'chunks_written': 0,
+            'batches': 0,
+            'errors': []
+        }
+
+        pending = []
+        for file in files:
+            entry = manifest.get(file['path'])
+            if entry and entry['status'] in ('completed', 'duplicate') and entry.get('fingerprint') == file['fingerprint']:
+                summary['resumed'] += 1
+                continue
+            if entry and entry['status'] == 'writing':
+                self.discard_partial(entry, file['source'])
+            pending.append(file)
+        summary['files_done'] = summary['resumed']
+        print(f"📦 Bulk import of {source}: {len(files)} documents, {summary['resumed']} already done")
+
+        def report():
+            if progress_callback:
+                progress_callback(
+                    "bulk", files_done=summary['files_done'], files_total=summary['files_total'],
+                    files_failed=summary['failed'], chunks_written=summary['chunks_written']
+                )
+
+        writer = BulkWriter(self.agent, manifest, tags, summary, on_file_done=report)
+        report()
+        archive, staging = None, None
+        if not os.path.isdir(source):
+            archive = zipfile.ZipFile(source)
+            # Members left unpacked by an interrupted run of this import are cleared first
+            staging = os.path.join(self.staging_dir, os.path.splitext(os.path.basename(manifest.path))[0])
+            shutil.rmtree(staging, ignore_errors=True)
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {}
+                queued = iter(pending)
+                while True:
+                    # Keep a bounded number of documents extracting ahead of the writer
+                    while len(futures) < self.workers * self.files_in_flight:
+                        file = next(queued, None)
+                        if file is None:
+                            break
+                        submitted = self.submit(pool, file, archive, staging, writer)
+                        if submitted is not None:
+                            futures[submitted] = file
+                    if not futures:
+                        break
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        file = futures.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            writer.fail(file, str(e))
+                            continue
+                        writer.add(file, result)
+                writer.flush()
+        finally:
+            writer.discard()
+            if archive is not None:
+                archive.close()
+                shutil.rmtree(staging, ignore_errors=True)
+            manifest.close()
+
+        summary['seconds'] = round(time.perf_counter() - started, 2)
+        print(f"✅ Bulk import finished: {summary['completed']} ingested, {summary['duplicate']} duplicates, "
+              f"{summary['failed']} failed, {summary['resumed']} skipped as done, in {summary['seconds']}s")
+        return summary
+
+    def submit(self, pool, file: Dict[str, Any], archive, staging: str, writer: "BulkWriter"):
+        """Hash a document and queue it for extraction, unless its content is already ingested"""
+        try:
+            if archive is not None:
+                # Archive members are unpacked one at a time as they are queued, and removed once written
+                target = os.path.join(staging, uuid.uuid4().hex[:8], posixpath.basename(file['path']))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.open(file['member']) as src, open(target, "wb") as dst:
+                    while True:
+                        block = src.read(1 << 20)
+                        if not block:
+                            break
+                        dst.write(block)
+                file['file_path'] = target
+                file['staged'] = True
+            file['file_hash'] = DocumentRegistry.hash_file(file['file_path'])
+        except Exception as e:
+            writer.fail(file, str(e))
+            return None
+
+        if writer.is_duplicate(file):
+            return None
+        return pool.submit(_extract_document, file['file_path'], self.agent.chunker, self.agent.ocr_cache_dir)
+
+    def discard_partial(self, entry: Dict[str, Any], source_name: str):
+        """Drop the collection of a document whose import was interrupted mid-write"""
+        collection_name = entry.get('collection_name')
+        if not collection_name:
+            return
+        recorded = self.agent.registry.find_by_source(source_name)
+        if recorded and recorded['collection_name'] == collection_name:
+            # The crash came after the registry was updated; the collection is complete
+            return
+        print(f"Removing partially written collection {collection_name}")
+        self.agent.delete_collection(collection_name)
+
+
+class BulkWriter:
+    """The single writer of a bulk import: batches chunks of several documents per embedding call"""
+
+    def __init__(self, agent, manifest: BulkManifest, tags: List[str], summary: Dict[str, Any],
+                 on_file_done: Callable[[], None] = None):
+        self.agent = agent
+        self.manifest = manifest
+        self.tags = tags
+        self.summary = summary
+        self.on_file_done = on_file_done
+        self.batch_size = agent.get_batch_size()
+        # (document, chunk index) pairs waiting for the next embedding call
+        self.batch = []
+        # Documents with chunks still to write, in arrival order
+        self.open_documents = []
+        # Content hashes queued in this import, so identical files in one library are stored once
+        self.queued_hashes = set()
+
+    def is_duplicate(self, file: Dict[str, Any]) -> bool:
+        """Record files whose exact content is already ingested (or queued) instead of extracting them"""
+        if file['file_hash'] in self.queued_hashes:
+            self.finish(file, 'duplicate')
+            return True
+        duplicate = self.agent.registry.find_by_hash(file['file_hash'])
+        if duplicate and self.agent.collection_exists(duplicate['collection_name']):
+            if self.tags:
+                self.agent.registry.tag_collection(duplicate['collection_name'], self.tags)
+            self.finish(file, 'duplicate', collection_name=duplicate['collection_name'])
+            return True
+        self.queued_hashes.add(file['file_hash'])
+        return False
+
+    def fail(self, file: Dict[str, Any], error: str):
+        print(f"Bulk import of {file['path']} failed: {error}")
+        self.summary['errors'].append({'path': file['path'], 'error': error})
+        del self.summary['errors'][:-50]
+        self.finish(file, 'failed', error=error)
+
+    def finish(self, file: Dict[str, Any], status: str, **fields):
+        self.manifest.record(file['path'], status, fingerprint=file['fingerprint'],
+                             file_hash=file.get('file_hash'), **fields)
+        if file.get('staged'):
+            os.remove(file['file_path'])
+            os.rmdir(os.path.dirname(file['file_path']))
+            file['staged'] = False
+        metrics.BULK_FILES.inc(outcome=status)
+        self.summary[status] += 1
+        self.summary['files_done'] += 1
+        if self.on_file_done:
+            self.on_file_done()
+
+    def add(self, file: Dict[str, Any], result: Dict[str, Any]):
+        """Queue an extracted document's chunks, writing every batch that fills up"""
+        for stage, timings in result['stage_timings'].items():
+            for seconds in timings:
+                metrics.STAGE_SECONDS.observe(seconds, stage=f"extract.{stage}")
+        if not result['chunks']:
+            self.fail(file, "No text extracted")
+            return
+
+        # Only a document from the same import source (same directory or archive path) is a
+        # previous revision of this one
+        source_name = file['source']
+        previous = self.agent.registry.find_by_source(source_name)
+        document = {
+            'file': file,
+            'source_name': source_name,
+            'collection_name': self.agent.generate_collection_name(source_name),
+            'previous': previous['collection_name'] if previous else None,
+            'page_hashes': result['page_hashes'],
+            'chunks': result['chunks'],
+            'tables': result['tables'],
+            'ids': [],
+            'written': 0,
+            'collection': None
+        }
+        prefix = f"{file['path']}_{uuid.uuid4().hex[:8]}"
+        document['ids'] = [f"{prefix}_{n}" for n in range(len(result['chunks']))]
+        self.manifest.record(file['path'], 'writing', fingerprint=file['fingerprint'], file_hash=file['file_hash'],
+                             collection_name=document['collection_name'])
+        self.open_documents.append(document)
+        for n in range(len(result['chunks'])):
+            self.batch.append((document, n))
+            if len(self.batch) == self.batch_size:
+                self.flush()
+
+    def discard(self):
+        """Drop whatever is still queued after the run stopped; unfinished documents stay
+        'writing' in the manifest for the next run to clean up"""
+        self.batch = []
+        self.open_documents = []
+
+    def flush(self):
+        """Embed the queued chunks in one call and add them to their collections"""
+        if self.batch:
+            batch, self.batch = self.batch, []
+            embed_started = time.perf_counter()
+            embeddings = self.agent.embedding_function([document['chunks'][n]['text'] for document, n in batch])
+            embed_seconds = time.perf_counter() - embed_started
+
+            write_started = time.perf_counter()
+            by_document = {}
+            for (document, n), embedding in zip(batch, embeddings):
+                by_document.setdefault(id(document), (document, []))[1].append((n, embedding))
+            for document, items in by_document.values():
+                if document['collection'] is None:
+                    document['collection'] = self.agent.get_collection(document['collection_name'], create=True)
+                chunks = document['chunks']
+                document['collection'].add(
+                    documents=[chunks[n]['text'] for n, _ in items],
+                    embeddings=[embedding for _, embedding in items],
+                    metadatas=[{
+                        "source": document['file']['source'],
+                        "chunk": n,
+                        "page": chunks[n]['page'],
+                        "kind": chunks[n]['kind']
+                    } for n, _ in items],
+                    ids=[document['ids'][n] for n, _ in items]
+                )
+                document['written'] += len(items)
+            metrics.observe_stages("store", {
+                'embed_ms': embed_seconds * 1000,
+                'write_ms': (time.perf_counter() - write_started) * 1000
+            })
+            self.summary['chunks_written'] += len(batch)
+            self.summary['batches'] += 1
+
+        # Documents finish in arrival order once all of their chunks are in Chroma
+        while self.open_documents and self.open_documents[0]['written'] == len(self.open_documents[0]['chunks']):
+            self.complete(self.open_documents.pop(0))
+
+    def complete(self, document: Dict[str, Any]):
+        collection_name = document['collection_name']
+        source_name = document['source_name']
+        chunks = document['chunks']
+        self.agent.lexical_index.update(collection_name, document['ids'], [chunk['text'] for chunk in chunks])
+        self.agent.table_index.update(collection_name, source_name, document['file']['source'], document['tables'])
+
+        page_chunk_ids = {page_num: [] for page_num in document['page_hashes']}
+        for chunk_id, chunk in zip(document['ids'], chunks):
+            page_chunk_ids.setdefault(chunk['page'], []).append(chunk_id)
+        self.agent.registry.record_pages(collection_name, source_name, {
+            page_num: {'page_hash': document['page_hashes'].get(page_num, ""), 'chunk_ids': chunk_ids}
+            for page_num, chunk_ids in page_chunk_ids.items()
+        })
+        self.agent.registry.record_document(
+            source_name, document['file']['file_hash'], collection_name, len(document['page_hashes'])
+        )
+        if self.tags:
+            self.agent.registry.tag_collection(collection_name, self.tags)
+
+        # A changed file replaces the collection of its previous revision
+        previous = document['previous']
+        if previous and previous != collection_name:
+            self.agent.delete_collection(previous)
+
+        document['chunks'] = []
+        document['tables'] = []
+        self.finish(document['file'], 'completed', collection_name=collection_name, chunks=len(document['ids']),
+                    pages=len(document['page_hashes']))
+
+
+def main():
+    from agent_level import DocumentAgent, groq_api_key
+    from chunking import get_chunker
+
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory or ZIP archive of PDF/DOCX documents")
+    parser.add_argument("source", help="directory (searched recursively) or .zip archive")
+    parser.add_argument("--tags", default="", help="comma-separated tags added to every collection")
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: CPU count)")
+    parser.add_argument("--manifest", default=None, help="manifest path (default: derived from the source path)")
+    parser.add_argument("--db-path", default="./chroma_db")
+    parser.add_argument("--checkpoint-path", default="./checkpoints.db")
+    parser.add_argument("--embed-batch-size", type=int, default=int(os.getenv("EMBED_BATCH_SIZE", 64)))
+    parser.add_argument("--chunk-strategy", default=os.getenv("CHUNK_STRATEGY", "fixed"))
+    parser.add_argument("--ocr-cache-dir", default=os.getenv("OCR_CACHE_DIR", "./ocr_cache"))
+    args = parser.parse_args()
+
+    agent = DocumentAgent(
+        groq_api_key or "",
+        db_path=args.db_path,
+        checkpoint_path=args.checkpoint_path,
+        embed_batch_size=args.embed_batch_size,
+        chunker=get_chunker(args.chunk_strategy),
+        ocr_cache_dir=args.ocr_cache_dir or None
+    )
+    ingestor = BulkIngestor(agent, workers=args.workers)
+    summary = ingestor.run(
+        args.source,
+        tags=[tag.strip() for tag in args.tags.split(',') if tag.strip()],
+        manifest_path=args.manifest
+    )
+    print(json.dumps(summary, indent=2))
+    if summary['failed']:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
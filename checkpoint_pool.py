@@ -0,0 +1,142 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection frees up within the pool's timeout"""
+
+
+class SqliteConnectionPool:
+    """Fixed-size pool of SQLite connections to one database file.
+
+    Each connection is used by one thread at a time; WAL mode lets readers run
+    alongside the single writer instead of queueing behind one shared connection.
+    """
+
+    def __init__(self, db_path: str, size: int = 8, timeout: float = 30.0):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.timeout)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection, opening a new one while the pool is below its size"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                conn = self._connect()
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolTimeoutError(
+                        f"All {self.size} connections to {self.db_path} stayed busy for {self.timeout}s"
+                    ) from None
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def stats(self):
+        return {'size': self.size, 'open': self._created, 'idle': self._idle.qsize()}
+
+
+class PooledSqliteSaver(SqliteSaver):
+    """SqliteSaver whose reads and writes borrow connections from a SqliteConnectionPool
+    instead of serializing every thread on one shared connection and lock.
+
+    It holds no connection of its own: self.conn is the connection the calling thread has
+    borrowed, so inherited methods that reach for it (setup, list) stay on the pool.
+    """
+
+    def __init__(self, pool: SqliteConnectionPool):
+        self._local = threading.local()
+        super().__init__(None)
+        self.pool = pool
+
+    @property
+    def conn(self) -> Optional[sqlite3.Connection]:
+        return getattr(self._local, "conn", None)
+
+    @conn.setter
+    def conn(self, conn: Optional[sqlite3.Connection]):
+        self._local.conn = conn
+
+    @contextmanager
+    def borrow(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection and expose it as self.conn to this thread until returned"""
+        with self.pool.connection() as conn:
+            previous, self.conn = self.conn, conn
+            try:
+                yield conn
+            finally:
+                self.conn = previous
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        with self.borrow():
+            super().setup()
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        """Cursor on a pooled connection; a transaction commits when the block succeeds and
+        rolls back when it raises"""
+        if not self.is_setup:
+            with self.lock:
+                self.setup()
+        with self.borrow() as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            except BaseException:
+                if transaction:
+                    conn.rollback()
+                raise
+            else:
+                if transaction:
+                    conn.commit()
+            finally:
+                cur.close()
+
+    def prune(self, thread_id: str = None, keep: int = 1) -> int:
+        """Delete all but the newest keep checkpoints (and their pending writes) of one thread,
+        or of every thread when thread_id is None. Returns the number of checkpoints deleted."""
+        # checkpoint ids are time-ordered uuid6 strings, so the newest sort last
+        ranked = """
+            SELECT thread_id, checkpoint_ns, checkpoint_id FROM (
+                SELECT thread_id, checkpoint_ns, checkpoint_id, ROW_NUMBER() OVER (
+                    PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                ) AS position
+                FROM checkpoints {where}
+            ) WHERE position > ?
+        """.format(where="WHERE thread_id = ?" if thread_id is not None else "")
+        params = (str(thread_id), keep) if thread_id is not None else (keep,)
+        with self.cursor() as cur:
+            stale = cur.execute(ranked, params).fetchall()
+            if stale:
+                cur.executemany(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale
+                )
+                cur.executemany(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale
+                )
+        return len(stale)
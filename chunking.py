@@ -0,0 +1,170 @@
+import re
+from typing import List, Dict, Any, Tuple, Iterable, Iterator
+
+from text_extrtaction import split_pages
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+TABLE_MARKER = re.compile(r"^--- Table Extracted \(Page \d+\) ---$", re.MULTILINE)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+CONTINUATION_END = re.compile(r"[.!?:;]$")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate LLM token count: one token per word or punctuation mark"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+class Chunker:
+    """Splits extracted text (with --- Page N --- markers) into chunks.
+
+    chunk() returns dicts with 'text', 'page' and 'kind' ('text' or 'table').
+    Chunks never cross a page boundary, so every chunk belongs to one page.
+    """
+
+    name = "base"
+
+    def chunk(self, text: str) -> List[Dict[str, Any]]:
+        return list(self.chunk_stream(split_pages(text).items()))
+
+    def chunk_stream(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+        """Chunk (page_num, page_text) pairs as they arrive, e.g. from DocumentProcessor.stream_pages"""
+        for page_num, page_text in pages:
+            if page_text.strip():
+                yield from self.chunk_page(page_num, page_text)
+
+    def chunk_page(self, page_num: int, page_text: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class FixedWindowChunker(Chunker):
+    """The original slicer: fixed character windows with a character overlap"""
+
+    name = "fixed"
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def chunk_page(self, page_num: int, page_text: str) -> List[Dict[str, Any]]:
+        text = f"--- Page {page_num} ---\n{page_text}\n"
+        return [
+            {'text': text[i:i + self.chunk_size], 'page': page_num, 'kind': 'text'}
+            for i in range(0, len(text), self.chunk_size - self.chunk_overlap)
+            if text[i:i + self.chunk_size]
+        ]
+
+
+class StructureAwareChunker(Chunker):
+    """Packs whole sentences into chunks of at most max_tokens.
+
+    Extracted tables become their own chunks; a table too large for one chunk is
+    split by rows with its first row repeated so every piece keeps its header.
+    """
+
+    name = "structure"
+
+    def __init__(self, max_tokens: int = 256, overlap_sentences: int = 0):
+        self.max_tokens = max_tokens
+        self.overlap_sentences = overlap_sentences
+
+    def chunk_page(self, page_num: int, page_text: str) -> List[Dict[str, Any]]:
+        chunks = []
+        markers = list(TABLE_MARKER.finditer(page_text))
+        body = page_text[:markers[0].start()] if markers else page_text
+        chunks.extend(
+            {'text': text, 'page': page_num, 'kind': 'text'}
+            for text in self._pack_sentences(self._sentences(body))
+        )
+        for i, marker in enumerate(markers):
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(page_text)
+            rows = [row for row in page_text[marker.end():end].split("\n") if row.strip()]
+            chunks.extend(
+                {'text': text, 'page': page_num, 'kind': 'table'}
+                for text in self._pack_table(marker.group(0), rows)
+            )
+        return chunks
+
+    def _sentences(self, text: str) -> List[Tuple[str, str]]:
+        """Rejoin wrapped lines, then split on sentence punctuation.
+
+        Returns (separator, sentence) pairs so line breaks survive packing.
+        """
+        units = []
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if units and not CONTINUATION_END.search(units[-1]) and line[0].islower():
+                units[-1] += " " + line
+            else:
+                units.append(line)
+
+        sentences = []
+        for unit in units:
+            separator = "\n"
+            for sentence in SENTENCE_END.split(unit):
+                for piece in self._split_long(sentence):
+                    sentences.append((separator, piece))
+                    separator = " "
+        return sentences
+
+    def _split_long(self, sentence: str) -> List[str]:
+        """Break a single sentence that is over budget on word boundaries"""
+        if count_tokens(sentence) <= self.max_tokens:
+            return [sentence]
+        pieces, current = [], []
+        for word in sentence.split():
+            if current and count_tokens(" ".join(current + [word])) > self.max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def _pack_sentences(self, sentences: List[Tuple[str, str]]) -> List[str]:
+        chunks, current, current_tokens = [], [], 0
+        for separator, sentence in sentences:
+            tokens = count_tokens(sentence)
+            if current and current_tokens + tokens > self.max_tokens:
+                chunks.append(self._join(current))
+                current = current[-self.overlap_sentences:] if self.overlap_sentences else []
+                current_tokens = sum(count_tokens(text) for _, text in current)
+            current.append((separator, sentence))
+            current_tokens += tokens
+        if current:
+            chunks.append(self._join(current))
+        return chunks
+
+    @staticmethod
+    def _join(sentences: List[Tuple[str, str]]) -> str:
+        return "".join(separator + text for separator, text in sentences).lstrip()
+
+    def _pack_table(self, marker: str, rows: List[str]) -> List[str]:
+        if not rows:
+            return []
+        header, body = rows[0], rows[1:]
+        budget = self.max_tokens - count_tokens(marker) - count_tokens(header)
+        chunks, current, current_tokens = [], [], 0
+        for row in body:
+            tokens = count_tokens(row)
+            if current and current_tokens + tokens > budget:
+                chunks.append("\n".join([marker, header] + current))
+                current, current_tokens = [], 0
+            current.append(row)
+            current_tokens += tokens
+        chunks.append("\n".join([marker, header] + current))
+        return chunks
+
+
+CHUNKERS = {
+    FixedWindowChunker.name: FixedWindowChunker,
+    StructureAwareChunker.name: StructureAwareChunker,
+}
+
+
+def get_chunker(name: str = "fixed", **options) -> Chunker:
+    """Instantiate a registered chunking strategy by name"""
+    if name not in CHUNKERS:
+        raise ValueError(f"Unknown chunking strategy '{name}'. Available: {', '.join(CHUNKERS)}")
+    return CHUNKERS[name](**options)
@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List
+
+import metrics
+
+SEGMENT_DIR = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def path_bytes(path: str) -> int:
+    """Size of a file, or of everything under a directory"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ChromaStorage:
+    """Read-only view of how a persistent Chroma directory lays collections out on disk.
+
+    Each collection has a vector segment (an HNSW directory named after the segment id) and a
+    metadata segment whose rows live in the shared chroma.sqlite3, along with the write-ahead
+    log of recent additions. Chroma keeps the HNSW directory of a deleted collection, which
+    compaction removes.
+    """
+
+    def __init__(self, db_path: str = "./chroma_db"):
+        self.db_path = db_path
+        self.sqlite_path = os.path.join(db_path, "chroma.sqlite3")
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.sqlite_path}?mode=ro", uri=True, timeout=5)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def segments(self) -> Dict[str, Dict[str, str]]:
+        """Collection name -> {'id', 'vector', 'metadata'} segment ids"""
+        if not os.path.exists(self.sqlite_path):
+            return {}
+        with self.connect() as conn:
+            rows = conn.execute("""
+                SELECT c.name, c.id AS collection_id, s.id AS segment_id, s.scope
+                FROM collections c JOIN segments s ON s.collection = c.id
+            """).fetchall()
+        collections = {}
+        for row in rows:
+            collection = collections.setdefault(row['name'], {'id': row['collection_id']})
+            collection[row['scope'].lower()] = row['segment_id']
+        return collections
+
+    def collection_bytes(self) -> Dict[str, Dict[str, int]]:
+        """Bytes per collection: its HNSW files, its rows in chroma.sqlite3 and its unflushed log"""
+        collections = self.segments()
+        if not collections:
+            return {}
+        with self.connect() as conn:
+            metadata_bytes = {
+                row['segment_id']: row['bytes'] or 0
+                for row in conn.execute("""
+                    SELECT e.segment_id, SUM(LENGTH(e.embedding_id)) + COALESCE(SUM(m.bytes), 0) AS bytes
+                    FROM embeddings e LEFT JOIN (
+                        SELECT id, SUM(LENGTH(key) + COALESCE(LENGTH(string_value), 8)) AS bytes
+                        FROM embedding_metadata GROUP BY id
+                    ) m ON m.id = e.id
+                    GROUP BY e.segment_id
+                """)
+            }
+            log_bytes = {
+                row['topic'].rsplit("/", 1)[-1]: row['bytes'] or 0
+                for row in conn.execute("""
+                    SELECT topic, SUM(COALESCE(LENGTH(vector), 0) + COALESCE(LENGTH(metadata), 0)) AS bytes
+                    FROM embeddings_queue GROUP BY topic
+                """)
+            }
+        sizes = {}
+        for name, collection in collections.items():
+            vector_dir = os.path.join(self.db_path, collection.get('vector', ""))
+            sizes[name] = {
+                'vector_bytes': path_bytes(vector_dir) if collection.get('vector') and os.path.isdir(vector_dir) else 0,
+                'metadata_bytes': metadata_bytes.get(collection.get('metadata'), 0),
+                'log_bytes': log_bytes.get(collection['id'], 0)
+            }
+        return sizes
+
+    def orphan_segment_dirs(self) -> List[str]:
+        """HNSW directories whose segment no longer exists"""
+        if not os.path.isdir(self.db_path):
+            return []
+        # Directories are listed before the segments are read: a segment row exists before its directory
+        candidates = [name for name in os.listdir(self.db_path)
+                      if SEGMENT_DIR.match(name) and os.path.isdir(os.path.join(self.db_path, name))]
+        live = {
+            segment_id
+            for collection in self.segments().values()
+            for scope, segment_id in collection.items() if scope != 'id'
+        }
+        return [os.path.join(self.db_path, name) for name in candidates if name not in live]
+
+
+def vacuum_sqlite(path: str, timeout: float = 30.0) -> int:
+    """Checkpoint the WAL and VACUUM a SQLite file; returns the bytes reclaimed"""
+    if not os.path.exists(path):
+        return 0
+    before = sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+    conn = sqlite3.connect(path, timeout=timeout)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    after = sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+    return max(0, before - after)
+
+
+class CollectionLifecycle:
+    """Evicts idle collections and reclaims the storage they and their uploads leave behind.
+
+    Eviction drops collections unused for ttl_seconds, then the least recently used ones
+    beyond max_collections (0 disables either rule). Compaction removes what nothing refers
+    to any more: HNSW directories of deleted collections, lexical and table indexes and registry rows
+    of missing collections, uploads no registered document came from (once older than
+    min_upload_age) and legacy *_converted.pdf files, then optionally VACUUMs the SQLite files.
+    """
+
+    def __init__(self, agent, upload_folder: str = "./uploads", ttl_seconds: float = 0, max_collections: int = 0,
+                 min_upload_age: float = 24 * 3600, interval: float = 0):
+        self.agent = agent
+        self.upload_folder = upload_folder
+        self.ttl_seconds = ttl_seconds
+        self.max_collections = max_collections
+        self.min_upload_age = min_upload_age
+        self.interval = interval
+        self.storage = ChromaStorage(agent.db_path)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def evict(self) -> Dict[str, Any]:
+        """Delete idle collections (and the uploads they came from) under the TTL and LRU rules"""
+        with self._lock:
+            now = time.time()
+            names = [collection.name for collection in self.agent.client.list_collections()]
+            last_used = self.agent.registry.last_used()
+            for name in names:
+                if name not in last_used:
+                    # Collections from before usage tracking start their idle clock now
+                    self.agent.registry.touch_collection(name, force=True)
+                    last_used[name] = now
+
+            evicted = []
+            by_age = sorted(names, key=lambda name: last_used[name])
+            if self.ttl_seconds:
+                evicted += [name for name in by_age if now - last_used[name] > self.ttl_seconds]
+            if self.max_collections:
+                remaining = [name for name in by_age if name not in evicted]
+                evicted += remaining[:max(0, len(remaining) - self.max_collections)]
+
+            uploads_removed = []
+            for name in evicted:
+                print(f"Evicting collection {name} (idle {now - last_used[name]:.0f}s)")
+                uploads_removed += self.remove(name)
+            metrics.EVICTED_COLLECTIONS.inc(len(evicted))
+            return {'collections_evicted': evicted, 'uploads_removed': uploads_removed}
+
+    def remove(self, collection_name: str) -> List[str]:
+        """Delete a collection and the uploads its documents came from; returns the removed files"""
+        removed = []
+        for source_name in self.agent.delete_collection(collection_name):
+            filename = os.path.basename(source_name)
+            if self.agent.registry.find_by_source(source_name) or self.agent.registry.find_by_source(filename):
+                # Another collection still holds a document of that name
+                continue
+            for path in self.upload_paths(filename):
+                removed += self.remove_upload(path)
+        return removed
+
+    def upload_paths(self, filename: str = None) -> List[str]:
+        """Uploaded files (only those named filename, when given): each upload is saved in its own
+        directory, files directly in the upload folder are from before that"""
+        if not os.path.isdir(self.upload_folder):
+            return []
+        paths = []
+        for name in os.listdir(self.upload_folder):
+            path = os.path.join(self.upload_folder, name)
+            if os.path.isdir(path):
+                paths += [os.path.join(path, child) for child in os.listdir(path)
+                          if filename in (None, child) and os.path.isfile(os.path.join(path, child))]
+            elif filename in (None, name) and os.path.isfile(path):
+                paths.append(path)
+        return paths
+
+    def remove_upload(self, path: str) -> List[str]:
+        """Delete an uploaded file and its legacy _converted.pdf sibling, if they are inside the upload
+        folder, then the upload's own directory once it is empty"""
+        removed = []
+        root = os.path.realpath(self.upload_folder)
+        stem = os.path.splitext(path)[0]
+        for candidate in (path, f"{stem}_converted.pdf"):
+            real = os.path.realpath(candidate)
+            if os.path.commonpath([root, real]) == root and os.path.isfile(real):
+                os.remove(real)
+                removed.append(candidate)
+        upload_dir = os.path.dirname(os.path.realpath(path))
+        if upload_dir != root and os.path.commonpath([root, upload_dir]) == root and os.path.isdir(upload_dir) \
+                and not os.listdir(upload_dir):
+            os.rmdir(upload_dir)
+        return removed
+
+    def compact(self, vacuum: bool = True) -> Dict[str, Any]:
+        """Remove unreferenced files and registry rows and report the bytes reclaimed"""
+        with self._lock:
+            started = time.perf_counter()
+            report = {'segment_dirs_removed': 0, 'lexical_removed': 0, 'tables_removed': 0,
+                      'registry_collections_removed': 0,
+                      'checkpoints_pruned': 0, 'uploads_removed': [], 'bytes_reclaimed': 0}
+
+            for path in self.storage.orphan_segment_dirs():
+                report['bytes_reclaimed'] += path_bytes(path)
+                shutil.rmtree(path, ignore_errors=True)
+                report['segment_dirs_removed'] += 1
+
+            live = {collection.name for collection in self.agent.client.list_collections()}
+            for key, store in (('lexical_removed', self.agent.lexical_index), ('tables_removed', self.agent.table_index)):
+                for name in os.listdir(store.index_dir):
+                    collection_name, extension = os.path.splitext(name)
+                    if extension == ".json" and collection_name not in live:
+                        report['bytes_reclaimed'] += path_bytes(os.path.join(store.index_dir, name))
+                        store.drop(collection_name)
+                        report[key] += 1
+
+            for collection_name in self.agent.registry.collection_names():
+                if collection_name not in live:
+                    self.agent.registry.remove_collection(collection_name)
+                    report['registry_collections_removed'] += 1
+
+            # Threads checkpointed before retention was applied per turn
+            report['checkpoints_pruned'] = self.agent.checkpointer.prune(keep=self.agent.checkpoint_keep)
+            report['uploads_removed'] = self.remove_orphan_uploads()
+            if vacuum:
+                for path in (self.storage.sqlite_path, self.agent.checkpoint_pool.db_path):
+                    try:
+                        report['bytes_reclaimed'] += vacuum_sqlite(path)
+                    except sqlite3.Error as e:
+                        # A busy database is vacuumed on a later run
+                        report.setdefault('vacuum_errors', []).append(f"{path}: {e}")
+            report['seconds'] = round(time.perf_counter() - started, 2)
+            print(f"Compaction reclaimed {report['bytes_reclaimed']} bytes: {report}")
+            return report
+
+    def remove_orphan_uploads(self) -> List[str]:
+        """Uploads no registered document came from, and every legacy _converted.pdf file"""
+        sources = {os.path.basename(document['source_name']) for document in self.agent.registry.list_documents()}
+        cutoff = time.time() - self.min_upload_age
+        removed = []
+        for path in self.upload_paths():
+            if not os.path.exists(path):
+                continue
+            name = os.path.basename(path)
+            if name.endswith("_converted.pdf") or (name not in sources and os.path.getmtime(path) < cutoff):
+                removed += self.remove_upload(path)
+        return removed
+
+    def run_once(self) -> Dict[str, Any]:
+        # Periodic runs skip VACUUM, which locks the database while it rewrites it
+        return {'evict': self.evict(), 'compact': self.compact(vacuum=False)}
+
+    def start(self):
+        """Run eviction and compaction every interval seconds on a daemon thread"""
+        if not self.interval:
+            return
+
+        def loop():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"Collection maintenance failed: {e}")
+
+        threading.Thread(target=loop, name="collection-maintenance", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    from agent_level import DocumentAgent, groq_api_key
+
+    parser = argparse.ArgumentParser(description="List, evict and compact DocuQuery collections")
+    parser.add_argument("command", choices=("list", "evict", "compact"))
+    parser.add_argument("--db-path", default="./chroma_db")
+    parser.add_argument("--checkpoint-path", default="./checkpoints.db")
+    parser.add_argument("--upload-folder", default="./uploads")
+    parser.add_argument("--ttl", type=float, default=float(os.getenv("COLLECTION_TTL", 0)),
+                        help="evict collections idle for more than this many seconds")
+    parser.add_argument("--max-collections", type=int, default=int(os.getenv("MAX_COLLECTIONS", 0)),
+                        help="evict the least recently used collections beyond this count")
+    parser.add_argument("--min-upload-age", type=float, default=float(os.getenv("UPLOAD_MIN_AGE", 24 * 3600)))
+    parser.add_argument("--no-vacuum", action="store_true")
+    args = parser.parse_args()
+
+    agent = DocumentAgent(groq_api_key or "", db_path=args.db_path, checkpoint_path=args.checkpoint_path)
+    lifecycle = CollectionLifecycle(agent, upload_folder=args.upload_folder, ttl_seconds=args.ttl,
+                                    max_collections=args.max_collections, min_upload_age=args.min_upload_age)
+    if args.command == "list":
+        result = agent.list_collections()
+    elif args.command == "evict":
+        result = lifecycle.evict()
+    else:
+        result = {'evict': lifecycle.evict(), 'compact': lifecycle.compact(vacuum=not args.no_vacuum)}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import math
+from typing import List, Dict, Any, Tuple, Set
+
+from chunking import count_tokens, SENTENCE_END, TABLE_MARKER
+from retrieval import TERM_PATTERN, TERM_PARTS
+
+# Function words that match nearly every sentence and say nothing about relevance
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i", "if", "in",
+    "is", "it", "me", "of", "on", "or", "should", "that", "the", "this", "to", "was", "what", "when", "where",
+    "which", "who", "why", "with", "you", "your", "my", "we", "there", "their", "about", "tell", "explain"
+}
+
+
+def query_terms(text: str) -> Set[str]:
+    """Content terms of a query: whole codes such as 'px-4410' plus their alphabetic or long parts"""
+    terms = set()
+    for term in TERM_PATTERN.findall(text.lower()):
+        terms.add(term)
+        parts = TERM_PARTS.findall(term)
+        if len(parts) > 1:
+            terms.update(part for part in parts if len(part) > 2 and not part.isdigit())
+    return terms - STOPWORDS
+
+
+def unit_terms(text: str) -> Set[str]:
+    terms = set()
+    for term in TERM_PATTERN.findall(text.lower()):
+        terms.add(term)
+        terms.update(TERM_PARTS.findall(term))
+    return terms
+
+
+def overlap_length(left: str, right: str, min_chars: int) -> int:
+    """Length of the longest suffix of left that is also a prefix of right (0 below min_chars)"""
+    if len(left) < min_chars or len(right) < min_chars:
+        return 0
+    probe = right[:min_chars]
+    start = max(0, len(left) - len(right))
+    while True:
+        index = left.find(probe, start)
+        if index < 0:
+            return 0
+        if right.startswith(left[index:]):
+            return len(left) - index
+        start = index + 1
+
+
+class ContextAssembler:
+    """Packs retrieved passages into a token budget before they are sent to the LLM.
+
+    Passages are taken in rank order. Text repeated from an earlier passage (chunk overlap)
+    is cut, passages are trimmed to the sentences (or table rows) that match the query plus
+    sentence_window neighbours, and packing stops once max_tokens is reached. A passage with
+    no matching sentence is kept whole, since the vector retriever may have matched it on meaning.
+    """
+
+    def __init__(self, max_tokens: int = 1500, trim_sentences: bool = True, sentence_window: int = 1,
+                 relevance_ratio: float = 0.5, min_overlap_chars: int = 40, min_passage_tokens: int = 24):
+        self.max_tokens = max_tokens
+        self.trim_sentences = trim_sentences
+        self.sentence_window = sentence_window
+        self.relevance_ratio = relevance_ratio
+        self.min_overlap_chars = min_overlap_chars
+        self.min_passage_tokens = min_passage_tokens
+
+    @staticmethod
+    def format(passages: List[Dict[str, Any]]) -> str:
+        return "".join(
+            f"\n[{passage['label']}]\n{passage['text']}\n" if passage.get('label') else f"\n{passage['text']}\n"
+            for passage in passages
+        )
+
+    def assemble(self, query: str, passages: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """Build the context from passages ({'text', 'kind', optional 'label'}) in rank order.
+
+        Returns the context string and packing stats, including the tokens saved against
+        concatenating every passage whole.
+        """
+        tokens_before = count_tokens(self.format(passages))
+        stats = {
+            'budget': self.max_tokens,
+            'passages_in': len(passages),
+            'passages_used': 0,
+            'passages_trimmed': 0,
+            'duplicates_removed': 0,
+            'overlap_chars_removed': 0,
+            'units_dropped': 0,
+            'tokens_before': tokens_before
+        }
+
+        deduped = self._dedupe(passages, stats)
+        units = [self._units(passage) for passage in deduped]
+        selected = self._select(query, units) if self.trim_sentences else [
+            list(range(len(passage_units))) for passage_units in units
+        ]
+
+        packed = []
+        remaining = self.max_tokens if self.max_tokens else math.inf
+        for passage, passage_units, keep in zip(deduped, units, selected):
+            label_tokens = count_tokens(f"[{passage['label']}]") if passage.get('label') else 0
+            text = self._join(passage_units, keep)
+            tokens = label_tokens + count_tokens(text)
+            if tokens > remaining:
+                # Fill what is left with the passage's best units, if that leaves a useful passage
+                if remaining - label_tokens < self.min_passage_tokens:
+                    break
+                keep = self._fit(passage_units, keep, remaining - label_tokens)
+                if not keep:
+                    break
+                text = self._join(passage_units, keep)
+                tokens = label_tokens + count_tokens(text)
+            stats['units_dropped'] += len(passage_units) - len(keep)
+            if len(keep) < len(passage_units):
+                stats['passages_trimmed'] += 1
+            packed.append({**passage, 'text': text})
+            remaining -= tokens
+
+        context = self.format(packed)
+        stats['passages_used'] = len(packed)
+        stats['tokens_after'] = count_tokens(context)
+        stats['tokens_saved'] = tokens_before - stats['tokens_after']
+        return context, stats
+
+    def _dedupe(self, passages: List[Dict[str, Any]], stats: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Cut text an earlier passage already contains, e.g. the overlap between adjacent chunks"""
+        kept = []
+        for passage in passages:
+            text = passage['text'].strip()
+            for earlier in kept:
+                if text in earlier['text']:
+                    text = ""
+                    break
+                head = overlap_length(earlier['text'], text, self.min_overlap_chars)
+                if head:
+                    text = text[head:].strip()
+                    stats['overlap_chars_removed'] += head
+                tail = overlap_length(text, earlier['text'], self.min_overlap_chars)
+                if tail:
+                    text = text[:-tail].strip()
+                    stats['overlap_chars_removed'] += tail
+            if not text:
+                stats['duplicates_removed'] += 1
+                continue
+            kept.append({**passage, 'text': text})
+        return kept
+
+    @staticmethod
+    def _units(passage: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Split a passage into units joined back by their separator: table rows, or sentences of text.
+
+        A table's marker and header row are pinned so trimmed rows keep their columns.
+        """
+        units = []
+        lines = [line for line in passage['text'].split("\n") if line.strip()]
+        if passage.get('kind') == 'table' or (lines and TABLE_MARKER.match(lines[0])):
+            for i, line in enumerate(lines):
+                pinned = i == 0 or (i == 1 and TABLE_MARKER.match(lines[0]) is not None)
+                units.append({'separator': "\n", 'text': line, 'pinned': pinned, 'row': True})
+            return units
+        for line in lines:
+            separator = "\n"
+            for sentence in SENTENCE_END.split(line.strip()):
+                units.append({'separator': separator, 'text': sentence, 'pinned': False, 'row': False})
+                separator = " "
+        return units
+
+    def _select(self, query: str, units: List[List[Dict[str, Any]]]) -> List[List[int]]:
+        """Indices of the units to keep in each passage, scored by IDF-weighted query term matches"""
+        terms = query_terms(query)
+        all_units = [unit for passage_units in units for unit in passage_units]
+        for unit in all_units:
+            unit['terms'] = unit_terms(unit['text']) & terms
+        document_frequency = {term: sum(1 for unit in all_units if term in unit['terms']) for term in terms}
+        weights = {
+            term: math.log(1 + (len(all_units) + 1) / (frequency + 0.5))
+            for term, frequency in document_frequency.items() if frequency
+        }
+        for unit in all_units:
+            unit['score'] = sum(weights[term] for term in unit['terms'])
+        best = max((unit['score'] for unit in all_units), default=0)
+
+        selected = []
+        for passage_units in units:
+            relevant = [i for i, unit in enumerate(passage_units)
+                        if best and unit['score'] >= best * self.relevance_ratio]
+            if not relevant:
+                selected.append(list(range(len(passage_units))))
+                continue
+            keep = {i for i, unit in enumerate(passage_units) if unit['pinned']}
+            for i in relevant:
+                # Neighbouring sentences carry context; neighbouring table rows are just other records
+                window = 0 if passage_units[i]['row'] else self.sentence_window
+                keep.update(range(max(0, i - window), min(len(passage_units), i + window + 1)))
+            selected.append(sorted(keep))
+        return selected
+
+    def _fit(self, units: List[Dict[str, Any]], keep: List[int], budget: int) -> List[int]:
+        """Highest-scoring kept units (pinned first) that fit the budget, in original order"""
+        ranked = sorted(keep, key=lambda i: (not units[i]['pinned'], -units[i].get('score', 0), i))
+        fitted, used = [], 0
+        for i in ranked:
+            tokens = count_tokens(units[i]['text'])
+            if used + tokens > budget:
+                continue
+            fitted.append(i)
+            used += tokens
+        return sorted(fitted)
+
+    @staticmethod
+    def _join(units: List[Dict[str, Any]], keep: List[int]) -> str:
+        return "".join(units[i]['separator'] + units[i]['text'] for i in keep).lstrip()
@@ -0,0 +1,100 @@
+from typing import List, Dict, Any
+
+from chunking import count_tokens, SENTENCE_END
+
+
+def clip_sentences(text: str, max_tokens: int) -> str:
+    """Leading whole sentences of text within max_tokens; a longer first sentence is cut by words"""
+    sentences = SENTENCE_END.split(" ".join(text.split()))
+    kept, used = [], 0
+    for sentence in sentences:
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    if kept or not sentences[0]:
+        return " ".join(kept)
+    words, used = [], 0
+    for word in sentences[0].split():
+        used += count_tokens(word)
+        if used > max_tokens:
+            break
+        words.append(word)
+    return " ".join(words) + " ..."
+
+
+def empty_memory() -> Dict[str, Any]:
+    return {'summary': [], 'turns': [], 'total_turns': 0}
+
+
+class ConversationMemory:
+    """Bounded memory of a chat thread, carried in its checkpoint and fed to generation.
+
+    The last max_turns turns are kept verbatim (answers clipped to answer_tokens) while they fit
+    in max_tokens. Older turns are folded into a summary of one line per turn (the question and
+    the opening sentences of its answer), and the oldest summary lines are dropped once the
+    summary passes summary_tokens, so the prompt never grows with the length of the thread.
+    """
+
+    def __init__(self, max_turns: int = 4, max_tokens: int = 800, answer_tokens: int = 300,
+                 summary_tokens: int = 300, summary_answer_tokens: int = 40):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.answer_tokens = answer_tokens
+        self.summary_tokens = summary_tokens
+        self.summary_answer_tokens = summary_answer_tokens
+
+    @staticmethod
+    def turn_tokens(turn: Dict[str, str]) -> int:
+        return count_tokens(turn['query']) + count_tokens(turn['response'])
+
+    def summarize(self, turn: Dict[str, str]) -> str:
+        query = " ".join(turn['query'].split())
+        return f"- Asked: {query} Answered: {clip_sentences(turn['response'], self.summary_answer_tokens)}"
+
+    def remember(self, memory: Dict[str, Any], query: str, response: str) -> Dict[str, Any]:
+        """Memory after one more turn; the given memory is left unchanged"""
+        memory = memory or empty_memory()
+        summary = list(memory['summary'])
+        turns = list(memory['turns'])
+        turns.append({'query': query, 'response': clip_sentences(response, self.answer_tokens)})
+
+        while len(turns) > 1 and (len(turns) > self.max_turns
+                                  or sum(self.turn_tokens(turn) for turn in turns) > self.max_tokens):
+            summary.append(self.summarize(turns.pop(0)))
+        while summary and sum(count_tokens(line) for line in summary) > self.summary_tokens:
+            summary.pop(0)
+
+        return {'summary': summary, 'turns': turns, 'total_turns': memory['total_turns'] + 1}
+
+    @staticmethod
+    def messages(memory: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Chat messages replaying the summary and the recent turns before the current question"""
+        if not memory:
+            return []
+        messages = []
+        if memory['summary']:
+            messages.append({
+                "role": "system",
+                "content": "Summary of the earlier conversation:\n" + "\n".join(memory['summary'])
+            })
+        for turn in memory['turns']:
+            messages.append({"role": "user", "content": turn['query']})
+            messages.append({"role": "assistant", "content": turn['response']})
+        return messages
+
+    def stats(self, memory: Dict[str, Any]) -> Dict[str, Any]:
+        memory = memory or empty_memory()
+        return {
+            'turns': len(memory['turns']),
+            'summarized_turns': len(memory['summary']),
+            'total_turns': memory['total_turns'],
+            'tokens': sum(self.turn_tokens(turn) for turn in memory['turns'])
+                      + sum(count_tokens(line) for line in memory['summary'])
+        }
+
+
+def source_refs(sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sources without their passage text, for checkpoints: the chunk ids point back into Chroma"""
+    return [{key: value for key, value in source.items() if key != 'text'} for source in sources]
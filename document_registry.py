@@ -0,0 +1,189 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+
+class DocumentRegistry:
+    """Persistent map of document content hashes to collections and per-page chunk ids"""
+
+    def __init__(self, db_path: str = "./checkpoints.db", touch_interval: float = 60.0):
+        self.touch_interval = touch_interval
+        self._touched: Dict[str, float] = {}
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    source_name TEXT NOT NULL,
+                    file_hash TEXT NOT NULL,
+                    collection_name TEXT NOT NULL,
+                    page_count INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (source_name, collection_name)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents (file_hash)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_pages (
+                    collection_name TEXT NOT NULL,
+                    source_name TEXT NOT NULL,
+                    page_num INTEGER NOT NULL,
+                    page_hash TEXT NOT NULL,
+                    chunk_ids TEXT NOT NULL,
+                    PRIMARY KEY (collection_name, source_name, page_num)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS collection_tags (
+                    tag TEXT NOT NULL,
+                    collection_name TEXT NOT NULL,
+                    PRIMARY KEY (tag, collection_name)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS collection_usage (
+                    collection_name TEXT PRIMARY KEY,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+        """SHA-256 of the file contents, read in blocks"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def find_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM documents WHERE file_hash = ? ORDER BY updated_at DESC LIMIT 1", (file_hash,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def find_by_source(self, source_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM documents WHERE source_name = ? ORDER BY updated_at DESC LIMIT 1", (source_name,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_pages(self, collection_name: str, source_name: str) -> Dict[int, Dict[str, Any]]:
+        """Page number -> {'page_hash', 'chunk_ids'} for one document in a collection"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT page_num, page_hash, chunk_ids FROM document_pages "
+                "WHERE collection_name = ? AND source_name = ?",
+                (collection_name, source_name)
+            ).fetchall()
+        return {
+            row['page_num']: {'page_hash': row['page_hash'], 'chunk_ids': json.loads(row['chunk_ids'])}
+            for row in rows
+        }
+
+    def record_document(self, source_name: str, file_hash: str, collection_name: str, page_count: int):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                (source_name, file_hash, collection_name, page_count, time.time())
+            )
+
+    def record_pages(self, collection_name: str, source_name: str, pages: Dict[int, Dict[str, Any]]):
+        """Store page hashes and the chunk ids generated from each page"""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO document_pages VALUES (?, ?, ?, ?, ?)",
+                [
+                    (collection_name, source_name, page_num, page['page_hash'], json.dumps(page['chunk_ids']))
+                    for page_num, page in pages.items()
+                ]
+            )
+
+    def delete_pages(self, collection_name: str, source_name: str, page_nums: List[int]):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM document_pages WHERE collection_name = ? AND source_name = ? AND page_num = ?",
+                [(collection_name, source_name, page_num) for page_num in page_nums]
+            )
+
+    def tag_collection(self, collection_name: str, tags: List[str]):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO collection_tags VALUES (?, ?)",
+                [(tag, collection_name) for tag in tags]
+            )
+
+    def find_by_tag(self, tag: str) -> List[str]:
+        """Names of the collections carrying a tag"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT collection_name FROM collection_tags WHERE tag = ? ORDER BY collection_name", (tag,)
+            ).fetchall()
+        return [row['collection_name'] for row in rows]
+
+    def list_tags(self) -> Dict[str, List[str]]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT tag, collection_name FROM collection_tags ORDER BY tag, collection_name"
+            ).fetchall()
+        tags = {}
+        for row in rows:
+            tags.setdefault(row['tag'], []).append(row['collection_name'])
+        return tags
+
+    def touch_collection(self, collection_name: str, force: bool = False):
+        """Record that a collection was just used; writes at most once per touch_interval per collection"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._touched.get(collection_name, 0) < self.touch_interval:
+                return
+            self._touched[collection_name] = now
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO collection_usage VALUES (?, ?)", (collection_name, now))
+
+    def last_used(self) -> Dict[str, float]:
+        """Collection name -> last time it was searched, or failing that last (re)ingested"""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT collection_name, MAX(at) AS at FROM (
+                    SELECT collection_name, last_used_at AS at FROM collection_usage
+                    UNION ALL
+                    SELECT collection_name, updated_at AS at FROM documents
+                ) GROUP BY collection_name
+            """).fetchall()
+        return {row['collection_name']: row['at'] for row in rows}
+
+    def list_documents(self, collection_name: str = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            if collection_name is None:
+                rows = self.conn.execute("SELECT * FROM documents ORDER BY source_name").fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT * FROM documents WHERE collection_name = ? ORDER BY source_name", (collection_name,)
+                ).fetchall()
+        return [dict(row) for row in rows]
+
+    def collection_names(self) -> List[str]:
+        """Every collection the registry holds documents, tags or usage for"""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT collection_name FROM documents
+                UNION SELECT collection_name FROM collection_tags
+                UNION SELECT collection_name FROM collection_usage
+            """).fetchall()
+        return [row['collection_name'] for row in rows]
+
+    def remove_collection(self, collection_name: str):
+        """Forget every document, page, tag and usage record of a collection"""
+        with self._lock, self.conn:
+            self._touched.pop(collection_name, None)
+            self.conn.execute("DELETE FROM collection_usage WHERE collection_name = ?", (collection_name,))
+            self.conn.execute("DELETE FROM documents WHERE collection_name = ?", (collection_name,))
+            self.conn.execute("DELETE FROM document_pages WHERE collection_name = ?", (collection_name,))
+            self.conn.execute("DELETE FROM collection_tags WHERE collection_name = ?", (collection_name,))
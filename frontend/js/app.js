@@ -201,12 +201,13 @@ function highlightSources(sources) {
         const totalPages = 5; // crude estimate, adjust if you know the page count
         const containerHeight = container.offsetHeight;
         sources.forEach(src => {
-            if (src.page) {
+            const page = src.page || (src.metadata && src.metadata.page);
+            if (page) {
                 const highlightDiv = document.createElement('div');
                 highlightDiv.className = 'pdf-highlight';
                 highlightDiv.style.position = 'absolute';
                 highlightDiv.style.left = '0';
-                highlightDiv.style.top = ((src.page - 1) * (containerHeight / totalPages)) + 'px';
+                highlightDiv.style.top = ((page - 1) * (containerHeight / totalPages)) + 'px';
                 highlightDiv.style.width = '100%';
                 highlightDiv.style.height = (containerHeight / totalPages) + 'px';
                 highlightDiv.style.background = 'rgba(255, 255, 0, 0.25)';
@@ -227,12 +228,7 @@ async function uploadDocument(file) {
     const uploadStatus = document.getElementById('uploadStatus');
     uploadContent.style.display = 'none';
     uploadProgress.style.display = 'block';
-    let progress = 0;
-    const progressInterval = setInterval(() => {
-        progress += Math.random() * 15;
-        if (progress > 90) progress = 90;
-        progressFill.style.width = progress + '%';
-    }, 200);
+    progressFill.style.width = '5%';
     try {
         const formData = new FormData();
         formData.append('file', file);
@@ -241,25 +237,24 @@ async function uploadDocument(file) {
             body: formData
         });
         const result = await response.json();
-        clearInterval(progressInterval);
-        progressFill.style.width = '100%';
-        if (response.ok) {
-            uploadStatus.textContent = 'Processing complete!';
-            currentDocument = {
-                name: file.name,
-                collectionName: result.collection_name,
-                pdfUrl: result.pdf_url || URL.createObjectURL(file)
-            };
-            pdfFileUrl = currentDocument.pdfUrl;
-            setTimeout(() => {
-                showMainContentRow();
-                renderPDF(pdfFileUrl);
-            }, 1000);
-        } else {
+        if (!response.ok) {
             throw new Error(result.error || 'Upload failed');
         }
+        // Ingestion runs in the background, poll the job until it finishes
+        const job = await waitForJob(result.job_id, progressFill, uploadStatus);
+        progressFill.style.width = '100%';
+        uploadStatus.textContent = 'Processing complete!';
+        currentDocument = {
+            name: file.name,
+            collectionName: job.collection_name,
+            pdfUrl: job.pdf_url || URL.createObjectURL(file)
+        };
+        pdfFileUrl = currentDocument.pdfUrl;
+        setTimeout(() => {
+            showMainContentRow();
+            renderPDF(pdfFileUrl);
+        }, 1000);
     } catch (error) {
-        clearInterval(progressInterval);
         console.error('Upload error:', error);
         showError('Failed to upload document: ' + error.message);
         resetUploadSection();
@@ -268,6 +263,38 @@ async function uploadDocument(file) {
     }
 }
 
+// Poll an ingestion job and reflect its per-stage progress in the upload bar
+async function waitForJob(jobId, progressFill, uploadStatus) {
+    while (true) {
+        const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.error || 'Could not read job status');
+        }
+        if (job.status === 'completed') {
+            return job;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Processing failed');
+        }
+
+        const extract = job.progress.extract;
+        const store = job.progress.store;
+        let progress = 5;
+        if (extract.pages_total) {
+            // Pages are chunked and embedded as they are extracted, so page progress covers both
+            progress = 5 + 90 * (extract.pages_done / extract.pages_total);
+            uploadStatus.textContent = `Processing page ${extract.pages_done} of ${extract.pages_total}... ` +
+                `${store.chunks_embedded} chunks embedded`;
+        } else if (job.status === 'queued') {
+            uploadStatus.textContent = 'Waiting in the processing queue...';
+        }
+        progressFill.style.width = progress + '%';
+
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 // Show the main content row (PDF + Chat)
 function showMainContentRow() {
     // Hide upload section with fade out effect
@@ -413,7 +440,7 @@ async function sendMessage() {
     document.getElementById('loadingIcon').style.display = 'inline';
     
     try {
-        const response = await fetch(`${API_BASE_URL}/chat`, {
+        const response = await fetch(`${API_BASE_URL}/chat/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -425,32 +452,43 @@ async function sendMessage() {
             })
         });
         
-        const result = await response.json();
+        if (!response.ok) {
+            const result = await response.json();
+            throw new Error(result.error || 'Chat failed');
+        }
+        
+        // Render answer tokens as they arrive over Server-Sent Events
+        let answerElement = null;
+        await readEventStream(response, (event, data) => {
+            if (event === 'sources') {
+                // Highlight sources in PDF preview as soon as retrieval is done
+                highlightSources(data.sources);
+            } else if (event === 'token') {
+                if (!answerElement) {
+                    removeTypingIndicator();
+                    answerElement = createStreamingBotMessage();
+                }
+                answerElement.textContent += data.text;
+                scrollToBottom();
+            } else if (event === 'done') {
+                if (!answerElement) {
+                    removeTypingIndicator();
+                    answerElement = createStreamingBotMessage();
+                }
+                answerElement.textContent = data.response;
+                console.log('Chat turn completed in thread:', data.thread_id);
+            } else if (event === 'error') {
+                throw new Error(data.error || 'Chat failed');
+            }
+        });
         
-        // Remove typing indicator
         removeTypingIndicator();
         
-        if (response.ok) {
-            // Add bot response
-            addMessage(result.response, 'bot');
-
-            // Highlight sources in PDF preview if present
-            if (result.sources) {
-                highlightSources(result.sources);
-            }
-
-            // Log chat history (you can see it in browser console)
-            console.log('Chat History:', result.chat_history);
-            
-            // Force chat input to be visible and ready for next message
-            setTimeout(() => {
-                ensureChatInputReady();
-                forceChatInputVisible();
-            }, 100);
-            
-        } else {
-            throw new Error(result.error || 'Chat failed');
-        }
+        // Force chat input to be visible and ready for next message
+        setTimeout(() => {
+            ensureChatInputReady();
+            forceChatInputVisible();
+        }, 100);
         
     } catch (error) {
         removeTypingIndicator();
@@ -468,6 +506,45 @@ async function sendMessage() {
     }
 }
 
+// Read a text/event-stream response body and call onEvent(event, data) per message
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
+}
+
+// Add an empty bot message and return the element tokens are appended to
+function createStreamingBotMessage() {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message bot-message';
+    messageDiv.innerHTML = `
+        <div class="avatar bot-avatar">🤖</div>
+        <div class="message-content">
+            <p></p>
+        </div>
+    `;
+    chatMessages.appendChild(messageDiv);
+    scrollToBottom();
+    return messageDiv.querySelector('p');
+}
+
 function addMessage(content, sender) {
     const messageDiv = document.createElement('div');
     messageDiv.className = 'message';
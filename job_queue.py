@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue has no free slots"""
+
+
+class IngestionJobQueue:
+    """Bounded worker pool that runs DocumentAgent.process (or a bulk import) in the background"""
+
+    def __init__(self, agent, max_workers: int = 2, max_queue_size: int = 8, max_finished_jobs: int = 200,
+                 bulk_ingestor=None):
+        self.agent = agent
+        self.bulk_ingestor = bulk_ingestor
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.max_finished_jobs = max_finished_jobs
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, status: str) -> int:
+        return sum(1 for job in self.jobs.values() if job['status'] == status)
+
+    def submit(self, file_path: str, collection_name: str = None, tags: List[str] = None,
+               kind: str = "document", remove_source: bool = False, revision: bool = False) -> Dict[str, Any]:
+        """Queue a document (or, with kind='bulk', a directory or ZIP archive) for ingestion
+        and return its job record. revision marks a document as a new revision of the one last
+        ingested under its filename (see DocumentAgent.process). With remove_source, an uploaded
+        bulk archive (and its import manifest) is deleted once the job has finished."""
+        with self._lock:
+            if self._count('queued') >= self.max_queue_size:
+                raise QueueFullError(
+                    f"Ingestion queue is full ({self.max_queue_size} jobs waiting), try again later"
+                )
+
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'kind': kind,
+                'file_path': file_path,
+                'collection_name': collection_name,
+                'tags': tags or [],
+                'remove_source': remove_source,
+                'revision': revision,
+                'status': 'queued',
+                'stage': 'queued',
+                'progress': {
+                    'bulk': {'files_done': 0, 'files_total': None, 'files_failed': 0, 'chunks_written': 0}
+                } if kind == "bulk" else {
+                    'extract': {'pages_done': 0, 'pages_total': None},
+                    'store': {'chunks_embedded': 0, 'chunks_total': None}
+                },
+                'error': '',
+                'batch_timings': [],
+                'ingest_stats': {},
+                'timings': {},
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None
+            }
+            self._prune_finished()
+            job = self._snapshot(job_id)
+
+        self.executor.submit(self._run_bulk if kind == "bulk" else self._run, job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the job record, or None if unknown"""
+        with self._lock:
+            if job_id not in self.jobs:
+                return None
+            return self._snapshot(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._snapshot(job_id) for job_id in self.jobs]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'queued': self._count('queued'),
+                'running': self._count('running'),
+                'max_workers': self.max_workers,
+                'max_queue_size': self.max_queue_size
+            }
+
+    def _snapshot(self, job_id: str) -> Dict[str, Any]:
+        job = self.jobs[job_id]
+        snapshot = dict(job)
+        snapshot['progress'] = {stage: dict(values) for stage, values in job['progress'].items()}
+        return snapshot
+
+    def _prune_finished(self):
+        finished = [job for job in self.jobs.values() if job['status'] in ('completed', 'failed')]
+        if len(finished) <= self.max_finished_jobs:
+            return
+        finished.sort(key=lambda job: job['finished_at'])
+        for job in finished[:len(finished) - self.max_finished_jobs]:
+            del self.jobs[job['job_id']]
+
+    def _update_progress(self, job_id: str, stage: str, **progress):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job['stage'] = stage
+            job['progress'].setdefault(stage, {}).update(progress)
+
+    def _run(self, job_id: str):
+        with self._lock:
+            job = self.jobs[job_id]
+            job['status'] = 'running'
+            job['stage'] = 'extract'
+            job['started_at'] = time.time()
+            file_path = job['file_path']
+            collection_name = job['collection_name']
+            tags = job['tags']
+            revision = job['revision']
+
+        try:
+            result = self.agent.process(
+                file_path,
+                collection_name=collection_name,
+                job_id=job_id,
+                progress_callback=lambda stage, **progress: self._update_progress(job_id, stage, **progress),
+                tags=tags,
+                revision=revision
+            )
+            status = 'completed' if result['status'] == 'completed' else 'failed'
+            error = result.get('error', '')
+            collection_name = result.get('collection_name', collection_name)
+            batch_timings = result.get('batch_timings', [])
+            ingest_stats = result.get('ingest_stats', {})
+            timings = result.get('timings', {})
+        except Exception as e:
+            status = 'failed'
+            error = str(e)
+            batch_timings = []
+            ingest_stats = {}
+            timings = {}
+
+        with self._lock:
+            job = self.jobs[job_id]
+            job['status'] = status
+            job['stage'] = status
+            job['error'] = error
+            job['collection_name'] = collection_name
+            job['batch_timings'] = batch_timings
+            job['ingest_stats'] = ingest_stats
+            job['timings'] = timings
+            job['finished_at'] = time.time()
+
+    def _run_bulk(self, job_id: str):
+        with self._lock:
+            job = self.jobs[job_id]
+            job['status'] = 'running'
+            job['stage'] = 'bulk'
+            job['started_at'] = time.time()
+            source = job['file_path']
+            tags = job['tags']
+            remove_source = job['remove_source']
+
+        try:
+            summary = self.bulk_ingestor.run(
+                source,
+                tags=tags,
+                progress_callback=lambda stage, **progress: self._update_progress(job_id, stage, **progress)
+            )
+            # Individual failures are listed in the summary; the import itself ran to the end
+            status = 'completed'
+            error = ''
+        except Exception as e:
+            status = 'failed'
+            error = str(e)
+            summary = {}
+        if remove_source:
+            self._remove_upload(source)
+
+        with self._lock:
+            job = self.jobs[job_id]
+            job['status'] = status
+            job['stage'] = status
+            job['error'] = error
+            job['ingest_stats'] = summary
+            job['finished_at'] = time.time()
+
+    def _remove_upload(self, source: str):
+        """Delete a finished bulk upload, its manifest and the upload's own directory"""
+        try:
+            manifest_path = self.bulk_ingestor.manifest_path(source)
+            for path in (source, manifest_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            upload_dir = os.path.dirname(source)
+            if not os.listdir(upload_dir):
+                os.rmdir(upload_dir)
+        except OSError as e:
+            print(f"Could not remove bulk upload {source}: {e}")
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,233 @@
+import cProfile
+import functools
+import inspect
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Tuple, Callable, Optional
+
+# Seconds; reaches minutes because whole-document extraction and store nodes are timed too
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: Dict[str, str] = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self.values)
+        return [f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in seconds, one series per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {'counts': [0] * len(self.buckets), 'count': 0, 'sum': 0.0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['count'] += 1
+            series['sum'] += seconds
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = {key: {**value, 'counts': list(value['counts'])} for key, value in self.series.items()}
+        lines = []
+        for key, value in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, value['counts']):
+                cumulative += count
+                labels = format_labels(self.label_names, key, {'le': format_value(bound)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.label_names, key, {'le': "+Inf"})
+            lines.append(f"{self.name}_bucket{labels} {value['count']}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, key)} {format_value(value['sum'])}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, key)} {value['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+NODE_SECONDS = REGISTRY.histogram(
+    "docuquery_node_seconds", "Time spent in each LangGraph node", ("node", "outcome")
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "docuquery_stage_seconds", "Time spent in each extraction, storage and retrieval stage", ("stage",)
+)
+LLM_SECONDS = REGISTRY.histogram(
+    "docuquery_llm_request_seconds", "Groq chat completion latency", ("mode", "outcome")
+)
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "docuquery_llm_first_token_seconds", "Time until the first streamed Groq token", ("mode",)
+)
+LLM_TOKENS = REGISTRY.counter(
+    "docuquery_llm_tokens_total", "Tokens reported by Groq, by kind", ("kind",)
+)
+CONTEXT_TOKENS = REGISTRY.counter(
+    "docuquery_context_tokens_total",
+    "Context tokens retrieved and actually sent to the LLM after budget packing", ("kind",)
+)
+BULK_FILES = REGISTRY.counter(
+    "docuquery_bulk_files_total", "Documents handled by bulk ingestion, by outcome", ("outcome",)
+)
+TABLE_LOOKUPS = REGISTRY.counter(
+    "docuquery_table_lookups_total",
+    "Chat queries matched against the table index, by outcome (answer, filter, rows, miss)", ("outcome",)
+)
+EVICTED_COLLECTIONS = REGISTRY.counter(
+    "docuquery_collections_evicted_total", "Collections deleted by TTL or LRU eviction"
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "docuquery_http_request_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+
+
+def observe_stages(prefix: str, timings: Dict[str, float]):
+    """Record a {'<stage>_ms': milliseconds} timings dict as '<prefix>.<stage>' observations"""
+    for key, ms in timings.items():
+        if key.endswith("_ms") and key != "total_ms" and ms is not None:
+            STAGE_SECONDS.observe(ms / 1000, stage=f"{prefix}.{key[:-3]}")
+
+
+def record_node(node: str, state: Dict[str, Any], seconds: float):
+    outcome = "error" if state.get('status') == 'failed' else "ok"
+    NODE_SECONDS.observe(seconds, node=node, outcome=outcome)
+    state.setdefault('timings', {})[node] = round(seconds * 1000, 2)
+
+
+def timed_node(node: str):
+    """Decorator for LangGraph node functions (sync or async) taking and returning the state.
+
+    Each call is observed in docuquery_node_seconds and its milliseconds stored in state['timings'].
+    """
+    def decorator(fn: Callable):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                state = await fn(*args, **kwargs)
+                record_node(node, state, time.perf_counter() - started)
+                return state
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            state = fn(*args, **kwargs)
+            record_node(node, state, time.perf_counter() - started)
+            return state
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(usage, mode: str) -> Dict[str, Any]:
+    """Count the prompt/completion tokens of a Groq usage object and return them as a dict"""
+    if usage is None:
+        return {}
+    tokens = {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'total_tokens': getattr(usage, 'total_tokens', 0) or 0
+    }
+    LLM_TOKENS.inc(tokens['prompt_tokens'], kind="prompt")
+    LLM_TOKENS.inc(tokens['completion_tokens'], kind="completion")
+    # Groq also reports its own queue and generation times
+    for field in ('queue_time', 'prompt_time', 'completion_time'):
+        value = getattr(usage, field, None)
+        if value is not None:
+            tokens[field] = value
+    tokens['mode'] = mode
+    return tokens
+
+
+class RequestProfiler:
+    """Optional cProfile capture of single requests, dumped as .prof files for snakeviz/pstats"""
+
+    def __init__(self, profile_dir: str = "./profiles"):
+        self.profile_dir = profile_dir
+        os.makedirs(profile_dir, exist_ok=True)
+
+    def start(self) -> cProfile.Profile:
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile: cProfile.Profile, name: str) -> Optional[str]:
+        """Stop profiling and write the stats; returns the file path"""
+        profile.disable()
+        safe_name = ''.join(c if c.isalnum() else '_' for c in name).strip('_') or "request"
+        path = os.path.join(self.profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}_{safe_name}_{uuid.uuid4().hex[:6]}.prof")
+        profile.dump_stats(path)
+        return path
@@ -0,0 +1,226 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+
+class ResponseCache:
+    """LRU/TTL cache of chat answers keyed on (collection, normalized query).
+
+    With a similarity_threshold and an embedding function, a miss on the exact
+    key falls back to the most similar cached question in the same collection.
+    With a persist_path, the cache is reloaded at start (within its TTL and size bounds),
+    saved every save_interval seconds while it has changed, and saved again at exit.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024, ttl_seconds: float = 3600,
+                 similarity_threshold: float = None, embedding_function=None, persist_path: str = None,
+                 save_interval: float = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embedding_function = embedding_function
+        self.persist_path = persist_path
+        self.save_interval = save_interval
+        self.entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self.total_bytes = 0
+        self.counters = {'hits': 0, 'semantic_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._save_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        if persist_path:
+            self.load()
+            atexit.register(self.save)
+            self.start()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        query = re.sub(r'\s+', ' ', query.lower()).strip()
+        return query.strip(' ?!.')
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity_threshold is not None and self.embedding_function is not None
+
+    def embed(self, query: str) -> Optional[list]:
+        """Embedding of the normalized query, or None when semantic matching is off"""
+        if not self.semantic:
+            return None
+        return [float(x) for x in self.embedding_function([self.normalize_query(query)])[0]]
+
+    def get(self, collection_name: str, query: str, embedding: list = None) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a query, or None on a miss"""
+        key = (collection_name, self.normalize_query(query))
+        with self._lock:
+            self._expire()
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return entry['result']
+
+        if self.semantic:
+            if embedding is None:
+                embedding = self.embed(query)
+            with self._lock:
+                match = self._nearest(collection_name, embedding)
+                if match is not None:
+                    self.entries.move_to_end(match)
+                    self.counters['semantic_hits'] += 1
+                    return self.entries[match]['result']
+
+        with self._lock:
+            self.counters['misses'] += 1
+        return None
+
+    def put(self, collection_name: str, query: str, result: Dict[str, Any], embedding: list = None):
+        if self.semantic and embedding is None:
+            embedding = self.embed(query)
+        key = (collection_name, self.normalize_query(query))
+        size = len(json.dumps(result)) + len(key[1]) + (8 * len(embedding) if embedding else 0)
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = {
+                'result': result,
+                'embedding': embedding,
+                'created_at': time.time(),
+                'size': size
+            }
+            self.total_bytes += size
+            self._dirty = True
+            self._trim()
+
+    def invalidate_collection(self, collection_name: str):
+        """Drop every answer cached for a collection, e.g. after it is re-ingested.
+
+        Fan-out answers are cached under "a+b+c" keys and are dropped when any member changes.
+        """
+        with self._lock:
+            for key in [key for key in self.entries if collection_name in key[0].split("+")]:
+                self._remove(key)
+                self.counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+            self._dirty = True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['semantic_hits'] + self.counters['misses']
+            hits = self.counters['hits'] + self.counters['semantic_hits']
+            return {
+                **self.counters,
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'similarity_threshold': self.similarity_threshold
+            }
+
+    def save(self):
+        """Write the cache to persist_path atomically"""
+        if not self.persist_path:
+            return
+        # The periodic saver and the exit hook may both be saving
+        with self._save_lock:
+            with self._lock:
+                self._expire()
+                data = [
+                    {'collection': key[0], 'query': key[1], **entry}
+                    for key, entry in self.entries.items()
+                ]
+                self._dirty = False
+            tmp_path = f"{self.persist_path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.persist_path)
+            except OSError:
+                self._dirty = True
+                raise
+
+    def load(self):
+        """Read the cache back from persist_path, dropping expired entries and the least recently
+        used ones beyond max_entries and max_bytes"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable response cache {self.persist_path}: {e}")
+            return
+        with self._lock:
+            for item in data:
+                key = (item.pop('collection'), item.pop('query'))
+                self.entries[key] = item
+                self.total_bytes += item['size']
+            self._expire()
+            self._trim()
+            self._dirty = False
+
+    def start(self):
+        """Save the cache every save_interval seconds on a daemon thread, when it has changed"""
+        if not self.persist_path or not self.save_interval:
+            return
+
+        def loop():
+            while not self._stop.wait(self.save_interval):
+                if self._dirty:
+                    try:
+                        self.save()
+                    except OSError as e:
+                        print(f"Saving the response cache failed: {e}")
+
+        threading.Thread(target=loop, name="response-cache-save", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry['size']
+        self._dirty = True
+
+    def _trim(self):
+        """Evict least recently used entries until the cache is within max_entries and max_bytes"""
+        while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            self._remove(next(iter(self.entries)))
+            self.counters['evictions'] += 1
+
+    def _expire(self):
+        if not self.ttl_seconds:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        for key in [key for key, entry in self.entries.items() if entry['created_at'] < cutoff]:
+            self._remove(key)
+
+    def _nearest(self, collection_name: str, embedding: list):
+        candidates = [
+            (key, entry['embedding']) for key, entry in self.entries.items()
+            if key[0] == collection_name and entry['embedding'] is not None
+        ]
+        if not candidates or embedding is None:
+            return None
+        matrix = np.array([vector for _, vector in candidates], dtype=np.float32)
+        query = np.array(embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        similarities = matrix @ query / np.where(norms == 0, 1.0, norms)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return candidates[best][0]
+        return None
@@ -0,0 +1,94 @@
+import re
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+THINK_BLOCK = re.compile(r'<think>.*?</think>', re.DOTALL)
+CHUNK_REF = re.compile(r'\bchunk\s+\d+[,\s]*', re.IGNORECASE)
+CHUNK_PAREN = re.compile(r'\([^)]*chunk[^)]*\)', re.IGNORECASE)
+BLANK_LINES = re.compile(r'\n\s*\n')
+# A trailing "chunk 1" may still grow into "chunk 12, ", and trailing whitespace
+# may still become a blank line, so neither can be released yet
+UNSAFE_TAIL = re.compile(r'(\bc(h(u(n(k(\s+\d*[,\s]*)?)?)?)?)?|\s+)$', re.IGNORECASE)
+
+
+def clean_response(raw_response: str) -> str:
+    """Strip the <think> block and chunk references from a complete answer"""
+    clean = THINK_BLOCK.sub('', raw_response)
+    clean = CHUNK_REF.sub('', clean)
+    clean = CHUNK_PAREN.sub('', clean)
+    return BLANK_LINES.sub('\n\n', clean.strip())
+
+
+def _partial_suffix(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of tag"""
+    for size in range(min(len(text), len(tag) - 1), 0, -1):
+        if tag.startswith(text[-size:]):
+            return size
+    return 0
+
+
+class StreamingResponseFilter:
+    """Applies clean_response incrementally to a token stream.
+
+    Text is only released once no later token can change how it is cleaned:
+    anything inside <think>, a possibly partial tag, an unclosed parenthesis
+    (up to max_hold characters) or a trailing chunk reference is held back.
+    """
+
+    def __init__(self, max_hold: int = 200):
+        self.max_hold = max_hold
+        self.buffer = ""
+        self.pending = ""
+        self.in_think = False
+        self.started = False
+
+    def feed(self, token: str) -> str:
+        """Add a token and return the text that is now safe to show"""
+        self.buffer += token
+        visible = ""
+        while self.buffer:
+            if self.in_think:
+                end = self.buffer.find(THINK_CLOSE)
+                if end == -1:
+                    keep = _partial_suffix(self.buffer, THINK_CLOSE)
+                    self.buffer = self.buffer[len(self.buffer) - keep:]
+                    break
+                self.buffer = self.buffer[end + len(THINK_CLOSE):]
+                self.in_think = False
+            else:
+                start = self.buffer.find(THINK_OPEN)
+                if start == -1:
+                    keep = _partial_suffix(self.buffer, THINK_OPEN)
+                    visible += self.buffer[:len(self.buffer) - keep]
+                    self.buffer = self.buffer[len(self.buffer) - keep:]
+                    break
+                visible += self.buffer[:start]
+                self.buffer = self.buffer[start + len(THINK_OPEN):]
+                self.in_think = True
+        return self._release(visible, final=False)
+
+    def flush(self) -> str:
+        """Return whatever is still held back once the stream has ended"""
+        visible = "" if self.in_think else self.buffer
+        self.buffer = ""
+        return self._release(visible, final=True)
+
+    def _release(self, visible: str, final: bool) -> str:
+        text = self.pending + visible
+        hold = len(text)
+        if not final:
+            paren = text.rfind('(')
+            if paren != -1 and ')' not in text[paren:] and len(text) - paren <= self.max_hold:
+                hold = paren
+            tail = UNSAFE_TAIL.search(text[:hold])
+            if tail:
+                hold = tail.start()
+        self.pending = text[hold:]
+
+        released = CHUNK_PAREN.sub('', CHUNK_REF.sub('', text[:hold]))
+        released = BLANK_LINES.sub('\n\n', released)
+        if not self.started:
+            released = released.lstrip()
+            self.started = bool(released)
+        return released.rstrip() if final else released
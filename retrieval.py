@@ -0,0 +1,226 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Tuple, Iterable
+
+# Keeps part numbers and error codes such as "PX-4410", "E.27" or "v2.1" as one term
+TERM_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+TERM_PARTS = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound codes are indexed whole and by their parts"""
+    terms = []
+    for term in TERM_PATTERN.findall(text.lower()):
+        terms.append(term)
+        parts = TERM_PARTS.findall(term)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    """In-memory inverted index over chunk ids with Okapi BM25 scoring"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        for chunk_id, text in zip(ids, texts):
+            if chunk_id in self.lengths:
+                self.remove([chunk_id])
+            terms = tokenize(text)
+            for term, count in Counter(terms).items():
+                self.postings.setdefault(term, {})[chunk_id] = count
+            self.lengths[chunk_id] = len(terms)
+            self.total_length += len(terms)
+
+    def remove(self, ids: Iterable[str]):
+        ids = {chunk_id for chunk_id in ids if chunk_id in self.lengths}
+        if not ids:
+            return
+        for term in list(self.postings):
+            posting = self.postings[term]
+            for chunk_id in ids & posting.keys():
+                del posting[chunk_id]
+            if not posting:
+                del self.postings[term]
+        for chunk_id in ids:
+            self.total_length -= self.lengths.pop(chunk_id)
+
+    def search(self, query: str, top_k: int = 20) -> List[Tuple[str, float]]:
+        """Best (chunk_id, score) pairs for the query, highest score first"""
+        if not self.lengths:
+            return []
+        n_docs = len(self.lengths)
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for chunk_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def copy(self) -> "BM25Index":
+        index = BM25Index(k1=self.k1, b=self.b)
+        index.postings = {term: dict(posting) for term, posting in self.postings.items()}
+        index.lengths = dict(self.lengths)
+        index.total_length = self.total_length
+        return index
+
+    def to_dict(self) -> Dict:
+        return {'k1': self.k1, 'b': self.b, 'postings': self.postings, 'lengths': self.lengths}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BM25Index":
+        index = cls(k1=data.get('k1', 1.2), b=data.get('b', 0.75))
+        index.postings = data['postings']
+        index.lengths = data['lengths']
+        index.total_length = sum(index.lengths.values())
+        return index
+
+
+class LexicalIndexStore:
+    """One BM25 index per collection, kept in memory and persisted next to Chroma's files.
+
+    Updates go to a copy of a collection's index that replaces it once saved, never to the
+    index searches are reading, so searches score without holding any lock. Loading, backfill
+    and updates take a lock per collection; the store-wide lock only guards the dictionaries.
+    """
+
+    def __init__(self, db_path: str = "./chroma_db"):
+        self.index_dir = os.path.join(db_path, "lexical")
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.indexes: Dict[str, BM25Index] = {}
+        # Copies holding updates made with save=False, published by save()
+        self.drafts: Dict[str, BM25Index] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, collection_name: str) -> str:
+        return os.path.join(self.index_dir, f"{collection_name}.json")
+
+    def collection_lock(self, collection_name: str) -> threading.RLock:
+        with self._lock:
+            return self._locks.setdefault(collection_name, threading.RLock())
+
+    def get(self, collection_name: str, collection=None) -> BM25Index:
+        """Index for a collection: cached, loaded from disk, or rebuilt from the Chroma collection"""
+        with self._lock:
+            index = self.indexes.get(collection_name)
+        if index is not None:
+            return index
+        with self.collection_lock(collection_name):
+            with self._lock:
+                index = self.indexes.get(collection_name)
+            if index is not None:
+                return index
+            path = self.path_for(collection_name)
+            if os.path.exists(path):
+                with open(path) as f:
+                    index = BM25Index.from_dict(json.load(f))
+            else:
+                index = BM25Index()
+                if collection is not None:
+                    # Collections ingested before the lexical index existed are backfilled once
+                    existing = collection.get(include=["documents"])
+                    index.add(existing['ids'], existing['documents'])
+                    self._save(collection_name, index)
+            with self._lock:
+                self.indexes[collection_name] = index
+            return index
+
+    def search(self, collection_name: str, query: str, top_k: int = 20, collection=None) -> List[Tuple[str, float]]:
+        return self.get(collection_name, collection).search(query, top_k)
+
+    def update(self, collection_name: str, add_ids: List[str], add_texts: List[str], remove_ids: List[str] = (),
+               collection=None, save: bool = True):
+        """Apply chunk additions/removals; pass save=False to batch several updates, which
+        searches don't see until save()"""
+        with self.collection_lock(collection_name):
+            index = self.drafts.get(collection_name)
+            if index is None:
+                index = self.get(collection_name, collection).copy()
+            index.remove(remove_ids)
+            index.add(add_ids, add_texts)
+            self.drafts[collection_name] = index
+            if save:
+                self.save(collection_name)
+
+    def save(self, collection_name: str):
+        """Publish the pending updates of a collection to searches and persist its index"""
+        with self.collection_lock(collection_name):
+            index = self.drafts.pop(collection_name, None)
+            with self._lock:
+                if index is not None:
+                    self.indexes[collection_name] = index
+                index = self.indexes.get(collection_name)
+            if index is not None:
+                self._save(collection_name, index)
+
+    def drop(self, collection_name: str):
+        with self.collection_lock(collection_name):
+            self.drafts.pop(collection_name, None)
+            with self._lock:
+                self.indexes.pop(collection_name, None)
+                self._locks.pop(collection_name, None)
+            path = self.path_for(collection_name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _save(self, collection_name: str, index: BM25Index):
+        path = self.path_for(collection_name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, path)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several ranked id lists: score(id) = sum of 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, 1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class CrossEncoderReranker:
+    """Local cross-encoder that rescores (query, passage) pairs.
+
+    Needs the optional sentence-transformers package; the model is loaded on first use.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        self.model_name = model_name
+        self.model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self.model is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError as e:
+                    raise ImportError("Reranking needs sentence-transformers: pip install sentence-transformers") from e
+                self.model = CrossEncoder(self.model_name)
+        return self.model
+
+    def score(self, query: str, passages: List[str]) -> List[float]:
+        if not passages:
+            return []
+        return [float(score) for score in self.load().predict([(query, passage) for passage in passages])]
@@ -0,0 +1,320 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional
+
+
+def turn_size(query: str, response: str) -> int:
+    return len(query.encode()) + len(response.encode())
+
+
+class SessionStore:
+    """In-memory chat sessions with LRU and idle-TTL eviction.
+
+    Each session keeps its thread id, collection and at most max_turns recent turns;
+    on_evict is called with the session when it is dropped (e.g. to free its checkpoints).
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 24 * 3600, max_turns: int = 200,
+                 on_evict: Callable[[Dict[str, Any]], None] = None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.on_evict = on_evict
+        self.sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.counters = {'created': 0, 'evicted': 0, 'expired': 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_session(session_id: str, collection_name: str = None) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            'session_id': session_id,
+            'thread_id': None,
+            'collection_name': collection_name,
+            'created_at': now,
+            'last_active': now,
+            'turns': 0,
+            'history_bytes': 0,
+            'response_bytes': 0,
+            'last_response_bytes': 0
+        }
+
+    def get_or_create(self, session_id: str, collection_name: str = None) -> Dict[str, Any]:
+        """Snapshot of the session's metadata, creating the session if needed"""
+        evicted = []
+        with self._lock:
+            evicted += self._expire()
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self._insert(session_id, collection_name, evicted)
+            session['last_active'] = time.time()
+            self.sessions.move_to_end(session_id)
+            snapshot = {key: value for key, value in session.items() if key != 'history'}
+        self._notify(evicted)
+        return snapshot
+
+    def set_collection(self, session_id: str, collection_name: str):
+        """Point an existing session at another collection"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                session['collection_name'] = collection_name
+
+    def record_turn(self, session_id: str, query: str, response: str, thread_id: str,
+                    response_bytes: int = 0) -> Dict[str, Any]:
+        """Append a turn and return it with its index in the session"""
+        evicted = []
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                # The session was evicted while its turn was being answered
+                session = self._insert(session_id, None, evicted)
+            turn = {'index': session['turns'], 'query': query, 'response': response, 'created_at': time.time()}
+            session['history'].append(turn)
+            session['history_bytes'] += turn_size(query, response)
+            if len(session['history']) > self.max_turns:
+                dropped = session['history'].pop(0)
+                session['history_bytes'] -= turn_size(dropped['query'], dropped['response'])
+            self._touch(session, thread_id, response_bytes)
+            self.sessions.move_to_end(session_id)
+        self._notify(evicted)
+        return turn
+
+    def history(self, session_id: str, offset: int = 0, limit: int = 20) -> Optional[Dict[str, Any]]:
+        """A page of a session's turns, oldest first; None for an unknown session"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            first_kept = session['turns'] - len(session['history'])
+            turns = [turn for turn in session['history'] if turn['index'] >= offset][:limit]
+            return {'turns': turns, 'total': session['turns'], 'first_available': first_kept,
+                    'offset': offset, 'limit': limit}
+
+    def session_stats(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            return {key: value for key, value in session.items() if key != 'history'}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = list(self.sessions.values())
+        return self._summarize(sessions)
+
+    def _summarize(self, sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            'backend': 'memory',
+            'sessions': len(sessions),
+            'history_bytes': sum(session['history_bytes'] for session in sessions),
+            'max_session_history_bytes': max((session['history_bytes'] for session in sessions), default=0),
+            'avg_response_bytes': round(
+                sum(session['response_bytes'] for session in sessions)
+                / max(sum(session['turns'] for session in sessions), 1), 1
+            ),
+            'max_sessions': self.max_sessions,
+            'ttl_seconds': self.ttl_seconds,
+            'max_turns': self.max_turns
+        }
+
+    def _insert(self, session_id: str, collection_name: str, evicted: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Add a new session, evicting the least recently used ones beyond max_sessions into evicted"""
+        session = {**self.new_session(session_id, collection_name), 'history': []}
+        self.sessions[session_id] = session
+        self.counters['created'] += 1
+        while len(self.sessions) > self.max_sessions:
+            evicted.append(self.sessions.popitem(last=False)[1])
+            self.counters['evicted'] += 1
+        return session
+
+    @staticmethod
+    def _touch(session: Dict[str, Any], thread_id: str, response_bytes: int):
+        session['thread_id'] = thread_id
+        session['turns'] += 1
+        session['last_active'] = time.time()
+        session['response_bytes'] += response_bytes
+        session['last_response_bytes'] = response_bytes
+
+    def _expire(self) -> List[Dict[str, Any]]:
+        if not self.ttl_seconds:
+            return []
+        cutoff = time.time() - self.ttl_seconds
+        expired = [session_id for session_id, session in self.sessions.items() if session['last_active'] < cutoff]
+        self.counters['expired'] += len(expired)
+        return [self.sessions.pop(session_id) for session_id in expired]
+
+    def _notify(self, evicted: List[Dict[str, Any]]):
+        if self.on_evict:
+            for session in evicted:
+                try:
+                    self.on_evict(session)
+                except Exception as e:
+                    print(f"Session eviction hook failed for {session['session_id']}: {e}")
+
+
+class SqliteSessionStore(SessionStore):
+    """SessionStore persisted in SQLite (typically the checkpoint database) so sessions
+    survive restarts; nothing per session is held in memory and history pages are read from disk"""
+
+    def __init__(self, db_path: str = "./checkpoints.db", **kwargs):
+        super().__init__(**kwargs)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    thread_id TEXT,
+                    collection_name TEXT,
+                    created_at REAL NOT NULL,
+                    last_active REAL NOT NULL,
+                    turns INTEGER NOT NULL,
+                    history_bytes INTEGER NOT NULL,
+                    response_bytes INTEGER NOT NULL,
+                    last_response_bytes INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_active ON chat_sessions (last_active)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_turns (
+                    session_id TEXT NOT NULL,
+                    turn INTEGER NOT NULL,
+                    query TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, turn)
+                )
+            """)
+
+    def get_or_create(self, session_id: str, collection_name: str = None) -> Dict[str, Any]:
+        evicted = []
+        with self._lock:
+            evicted += self._expire()
+            session = self._load(session_id)
+            if session is None:
+                session = self.new_session(session_id, collection_name)
+                self._save(session)
+                self.counters['created'] += 1
+                evicted += self._evict_over_limit()
+            else:
+                session['last_active'] = time.time()
+                self._save(session)
+        self._notify(evicted)
+        return session
+
+    def set_collection(self, session_id: str, collection_name: str):
+        with self._lock:
+            session = self._load(session_id)
+            if session is not None:
+                session['collection_name'] = collection_name
+                self._save(session)
+
+    def record_turn(self, session_id: str, query: str, response: str, thread_id: str,
+                    response_bytes: int = 0) -> Dict[str, Any]:
+        evicted = []
+        with self._lock:
+            session = self._load(session_id)
+            created = session is None
+            if created:
+                # The session was evicted while its turn was being answered
+                session = self.new_session(session_id)
+                self.counters['created'] += 1
+            turn = {'index': session['turns'], 'query': query, 'response': response, 'created_at': time.time()}
+            session['history_bytes'] += turn_size(query, response)
+            self._touch(session, thread_id, response_bytes)
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO chat_turns VALUES (?, ?, ?, ?, ?)",
+                    (session_id, turn['index'], query, response, turn['created_at'])
+                )
+                # Keep only the newest max_turns turns per session
+                dropped = self.conn.execute(
+                    "SELECT query, response FROM chat_turns WHERE session_id = ? AND turn <= ?",
+                    (session_id, turn['index'] - self.max_turns)
+                ).fetchall()
+                if dropped:
+                    session['history_bytes'] -= sum(turn_size(row['query'], row['response']) for row in dropped)
+                    self.conn.execute(
+                        "DELETE FROM chat_turns WHERE session_id = ? AND turn <= ?",
+                        (session_id, turn['index'] - self.max_turns)
+                    )
+                self._save(session)
+            if created:
+                evicted += self._evict_over_limit()
+        self._notify(evicted)
+        return turn
+
+    def history(self, session_id: str, offset: int = 0, limit: int = 20) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            session = self._load(session_id)
+            if session is None:
+                return None
+            rows = self.conn.execute(
+                "SELECT turn, query, response, created_at FROM chat_turns "
+                "WHERE session_id = ? AND turn >= ? ORDER BY turn LIMIT ?",
+                (session_id, offset, limit)
+            ).fetchall()
+            first_kept = self.conn.execute(
+                "SELECT MIN(turn) FROM chat_turns WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+        return {
+            'turns': [
+                {'index': row['turn'], 'query': row['query'], 'response': row['response'],
+                 'created_at': row['created_at']}
+                for row in rows
+            ],
+            'total': session['turns'],
+            'first_available': first_kept if first_kept is not None else session['turns'],
+            'offset': offset,
+            'limit': limit
+        }
+
+    def session_stats(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._load(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = [dict(row) for row in self.conn.execute("SELECT * FROM chat_sessions").fetchall()]
+        return {**self._summarize(sessions), 'backend': 'sqlite'}
+
+    def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT * FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def _save(self, session: Dict[str, Any]):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session['session_id'], session['thread_id'], session['collection_name'], session['created_at'],
+                 session['last_active'], session['turns'], session['history_bytes'], session['response_bytes'],
+                 session['last_response_bytes'])
+            )
+
+    def _delete(self, session_ids: List[str]) -> List[Dict[str, Any]]:
+        removed = [session for session in map(self._load, session_ids) if session]
+        with self.conn:
+            self.conn.executemany("DELETE FROM chat_sessions WHERE session_id = ?", [(sid,) for sid in session_ids])
+            self.conn.executemany("DELETE FROM chat_turns WHERE session_id = ?", [(sid,) for sid in session_ids])
+        return removed
+
+    def _expire(self) -> List[Dict[str, Any]]:
+        if not self.ttl_seconds:
+            return []
+        rows = self.conn.execute(
+            "SELECT session_id FROM chat_sessions WHERE last_active < ?", (time.time() - self.ttl_seconds,)
+        ).fetchall()
+        self.counters['expired'] += len(rows)
+        return self._delete([row['session_id'] for row in rows])
+
+    def _evict_over_limit(self) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT session_id FROM chat_sessions ORDER BY last_active DESC LIMIT -1 OFFSET ?",
+            (self.max_sessions,)
+        ).fetchall()
+        self.counters['evicted'] += len(rows)
+        return self._delete([row['session_id'] for row in rows])
@@ -0,0 +1,414 @@
+import json
+import os
+import re
+import threading
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Callable, Optional
+
+from chunking import count_tokens, TABLE_MARKER
+from context_assembly import STOPWORDS
+from retrieval import TERM_PARTS
+
+NUMBER = re.compile(r"-?\d+(?:,\d{3})*(?:\.\d+)?")
+# "torque above 30", "weight <= 2.5", "at least 1,200 rpm"
+FILTER = re.compile(
+    r"(>=|<=|>|<|=|at least|at most|no more than|no less than|more than|greater than|higher than|above|over|"
+    r"less than|lower than|fewer than|below|under|equal to|exactly)\s*(-?\d+(?:,\d{3})*(?:\.\d+)?)"
+)
+COMPARATORS = {
+    '>=': lambda value, bound: value >= bound,
+    '<=': lambda value, bound: value <= bound,
+    '>': lambda value, bound: value > bound,
+    '<': lambda value, bound: value < bound,
+    '=': lambda value, bound: value == bound,
+}
+COMPARATOR_WORDS = {
+    'at least': '>=', 'no less than': '>=', 'at most': '<=', 'no more than': '<=',
+    'more than': '>', 'greater than': '>', 'higher than': '>', 'above': '>', 'over': '>',
+    'less than': '<', 'lower than': '<', 'fewer than': '<', 'below': '<', 'under': '<',
+    'equal to': '=', 'exactly': '='
+}
+# Longest cell value, in terms, that can be matched against the query
+MAX_CELL_TERMS = 6
+# Questions that want an explanation rather than a value from a table
+OPEN_QUESTION_WORDS = {"how", "why", "should", "could", "would", "can", "when", "if", "whether", "explain"}
+# Words a lookup may use besides row ids, column names, comparisons and units ("what's", "list all")
+LOOKUP_WORDS = {
+    "s", "list", "show", "give", "find", "get", "value", "values", "row", "rows", "table", "entry", "entries",
+    "spec", "specs", "specification", "specifications", "rated", "rating", "all", "any", "have", "has", "one", "ones"
+}
+
+
+def cell_key(text: str) -> Tuple[str, ...]:
+    return tuple(TERM_PARTS.findall(text.lower()))
+
+
+def singular(term: str) -> str:
+    return term[:-1] if len(term) > 3 and term.endswith("s") and not term.endswith("ss") else term
+
+
+def parse_number(text: str) -> Optional[float]:
+    match = NUMBER.search(text)
+    return float(match.group(0).replace(",", "")) if match else None
+
+
+def extract_tables(page_num: int, page_text: str) -> List[Dict[str, Any]]:
+    """Tables of one extracted page, read back from their --- Table Extracted --- sections.
+
+    Each row is one line of " | "-joined cells and the first row is the header. Tables without
+    at least a header, one row and two columns are skipped.
+    """
+    tables = []
+    markers = list(TABLE_MARKER.finditer(page_text))
+    for i, marker in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(page_text)
+        rows = [[cell.strip() for cell in line.split(" | ")]
+                for line in page_text[marker.end():end].split("\n") if line.strip()]
+        if len(rows) < 2 or len(rows[0]) < 2:
+            continue
+        width = len(rows[0])
+        rows = [row[:width] + [""] * (width - len(row)) for row in rows]
+        tables.append({
+            'page': page_num,
+            'columns': [header or f"Column {n + 1}" for n, header in enumerate(rows[0])],
+            # Stored column by column
+            'data': [list(column) for column in zip(*rows[1:])]
+        })
+    return tables
+
+
+def collect_tables(pages: Iterable[Tuple[int, str]], tables: List[Dict[str, Any]]) -> Iterator[Tuple[int, str]]:
+    """Pass (page_num, page_text) pairs through unchanged, appending each page's tables to tables"""
+    for page_num, page_text in pages:
+        tables.extend(extract_tables(page_num, page_text))
+        yield page_num, page_text
+
+
+def passes(text: str, conditions: List[Tuple[str, float]]) -> bool:
+    value = parse_number(text)
+    return value is not None and all(COMPARATORS[operator](value, bound) for operator, bound in conditions)
+
+
+def parse_filters(text: str) -> List[Tuple[str, float, int, int]]:
+    """Numeric comparisons in lowercased text as (operator, bound, start, end)"""
+    return [
+        (COMPARATOR_WORDS.get(match.group(1), match.group(1)), float(match.group(2).replace(",", "")),
+         match.start(), match.end())
+        for match in FILTER.finditer(text)
+    ]
+
+
+class TableIndex:
+    """The tables of one collection stored column by column, with an index on their cells.
+
+    The cell index maps the terms of each non-numeric body cell to its (table, row, column)
+    positions and the header index maps header terms to columns, so a query is matched by
+    looking up its term n-grams instead of scanning the tables.
+    """
+
+    def __init__(self, tables: List[Dict[str, Any]] = None):
+        self.tables: List[Dict[str, Any]] = []
+        self.cells: Dict[Tuple[str, ...], List[Tuple[int, int, int]]] = {}
+        self.headers: Dict[str, List[Tuple[int, int]]] = {}
+        self.add(tables or [])
+
+    def __len__(self):
+        return len(self.tables)
+
+    def add(self, tables: List[Dict[str, Any]]):
+        self.tables.extend(tables)
+        self._reindex()
+
+    def remove(self, source_name: str, pages: List[int] = None):
+        """Drop a document's tables, or only those on the given pages"""
+        self.tables = [
+            table for table in self.tables
+            if table['source_name'] != source_name or (pages is not None and table['page'] not in pages)
+        ]
+        self._reindex()
+
+    def _reindex(self):
+        self.cells, self.headers = {}, {}
+        for t, table in enumerate(self.tables):
+            for c, header in enumerate(table['columns']):
+                for term in set(cell_key(header)) - STOPWORDS:
+                    self.headers.setdefault(term, []).append((t, c))
+                for r, value in enumerate(table['data'][c]):
+                    key = cell_key(value)
+                    if (not key or len(key) > MAX_CELL_TERMS or all(term.isdigit() for term in key)
+                            or set(key) <= STOPWORDS):
+                        continue
+                    self.cells.setdefault(key, []).append((t, r, c))
+
+    def match(self, query: str) -> List[Dict[str, Any]]:
+        """Tables the query refers to, with the rows it names or filters and the columns it asks for"""
+        text = query.lower()
+        filters = parse_filters(text)
+        terms = [(match.group(0), match.start()) for match in TERM_PARTS.finditer(text)]
+        parts = [term for term, _ in terms]
+
+        # Longest cell values first; a shorter value inside a matched span is part of it.
+        # The numbers of comparisons are bounds, not cell values.
+        row_hits: Dict[int, Dict[int, set]] = {}
+        used = [any(start <= offset < end for _, _, start, end in filters) for _, offset in terms]
+        for n in range(min(MAX_CELL_TERMS, len(parts)), 0, -1):
+            for i in range(len(parts) - n + 1):
+                if any(used[i:i + n]):
+                    continue
+                postings = self.cells.get(tuple(parts[i:i + n]))
+                if not postings:
+                    continue
+                used[i:i + n] = [True] * n
+                for t, r, c in postings:
+                    row_hits.setdefault(t, {}).setdefault(r, set()).add(c)
+
+        # Offsets in the query where each column is named
+        column_hits: Dict[int, Dict[int, List[int]]] = {}
+        for term, offset in terms:
+            for t, c in self.headers.get(term, ()):
+                column_hits.setdefault(t, {}).setdefault(c, []).append(offset)
+
+        matches = []
+        for t in sorted(set(row_hits) | set(column_hits)):
+            table = self.tables[t]
+            rows = row_hits.get(t, {})
+            named = column_hits.get(t, {})
+            key_columns = {c for columns in rows.values() for c in columns}
+            asked = [c for c in sorted(named, key=lambda c: -len(named[c])) if c not in key_columns]
+            match = {'table': table, 'rows': sorted(rows), 'key_columns': sorted(key_columns),
+                     'columns': asked, 'filters': self.bind_filters(table, filters, asked, named)}
+            if match['filters']:
+                candidates = match['rows'] or range(len(table['data'][0]))
+                match['rows'] = [
+                    r for r in candidates
+                    if all(passes(table['data'][c][r], conditions) for c, conditions in match['filters'].items())
+                ]
+            elif not rows:
+                # Column names alone don't say which rows are wanted
+                continue
+            matches.append(match)
+        return matches
+
+    def bind_filters(self, table: Dict[str, Any], filters: List[Tuple[str, float, int, int]], asked: List[int],
+                     named: Dict[int, List[int]]) -> Dict[int, List[Tuple[str, float]]]:
+        """Each comparison applies to the numeric column named closest before it ("interval at least
+        1000 and torque below 15"), or to the only numeric column asked for; {} if any is unclear"""
+        numeric = [c for c in asked if self.is_numeric(table, c)]
+        conditions: Dict[int, List[Tuple[str, float]]] = {}
+        for operator, bound, start, _ in filters:
+            before = [(offset, c) for c in numeric for offset in named[c] if offset < start]
+            if before:
+                c = max(before)[1]
+            elif len(numeric) == 1:
+                c = numeric[0]
+            else:
+                return {}
+            conditions.setdefault(c, []).append((operator, bound))
+        return conditions
+
+    @staticmethod
+    def is_numeric(table: Dict[str, Any], c: int) -> bool:
+        values = [value for value in table['data'][c] if value]
+        return bool(values) and sum(parse_number(value) is not None for value in values) * 2 >= len(values)
+
+    @staticmethod
+    def is_identifier(table: Dict[str, Any], c: int) -> bool:
+        """A column whose values name their rows: no value repeats"""
+        values = [value for value in table['data'][c] if value]
+        return len(set(values)) == len(values)
+
+    def to_dict(self) -> Dict:
+        return {'tables': self.tables}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TableIndex":
+        return cls(data['tables'])
+
+    @classmethod
+    def from_chunks(cls, documents: List[str], metadatas: List[Dict[str, Any]]) -> "TableIndex":
+        """Rebuild tables from a collection's table chunks; pieces of a split table repeat its
+        marker and header, so consecutive pieces with the same header are joined again"""
+        tables, previous = [], None
+        chunks = sorted(zip(documents, metadatas), key=lambda item: (item[1].get('source', ''), item[1].get('chunk', 0)))
+        for document, metadata in chunks:
+            for table in extract_tables(metadata.get('page', 0), document):
+                source = metadata.get('source', '')
+                table.update(source=source, source_name=os.path.basename(source))
+                if (previous and previous['source'] == source and previous['page'] == table['page']
+                        and previous['columns'] == table['columns']):
+                    for column, values in zip(previous['data'], table['data']):
+                        column.extend(values)
+                    continue
+                tables.append(table)
+                previous = table
+        return cls(tables)
+
+
+class TableIndexStore:
+    """One TableIndex per collection, kept in memory and persisted next to Chroma's files.
+
+    lookup() answers a query from the tables when it is unambiguous: a single value named by
+    a row and a column ('answer'), or the rows passing a numeric filter ('filter'). Otherwise
+    the rows the query names are returned for the prompt in place of whole table chunks ('rows').
+    """
+
+    def __init__(self, db_path: str = "./chroma_db", max_rows: int = 20):
+        self.index_dir = os.path.join(db_path, "tables")
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.max_rows = max_rows
+        self.indexes: Dict[str, TableIndex] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, collection_name: str) -> str:
+        return os.path.join(self.index_dir, f"{collection_name}.json")
+
+    def get(self, collection_name: str, open_collection: Callable[[], Any] = None) -> TableIndex:
+        """Index for a collection: cached, loaded from disk, or rebuilt from the collection's table chunks"""
+        with self._lock:
+            index = self.indexes.get(collection_name)
+            if index is not None:
+                return index
+            path = self.path_for(collection_name)
+            if os.path.exists(path):
+                with open(path) as f:
+                    index = TableIndex.from_dict(json.load(f))
+            else:
+                index = TableIndex()
+                if open_collection is not None:
+                    # Collections ingested before the table index existed are backfilled once
+                    existing = open_collection().get(where={"kind": "table"}, include=["documents", "metadatas"])
+                    index = TableIndex.from_chunks(existing['documents'], existing['metadatas'])
+                    self._save(collection_name, index)
+            self.indexes[collection_name] = index
+            return index
+
+    def update(self, collection_name: str, source_name: str, source: str, tables: List[Dict[str, Any]],
+               pages: List[int] = None):
+        """Replace a document's tables (only those on pages, when given) with newly extracted ones"""
+        index = self.get(collection_name)
+        with self._lock:
+            index.remove(source_name, pages)
+            index.add([{**table, 'source': source, 'source_name': source_name} for table in tables])
+            self._save(collection_name, index)
+
+    def drop(self, collection_name: str):
+        with self._lock:
+            self.indexes.pop(collection_name, None)
+            path = self.path_for(collection_name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _save(self, collection_name: str, index: TableIndex):
+        path = self.path_for(collection_name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def lookup(self, collection_names: List[str], query: str,
+               open_collection: Callable[[str], Any] = None) -> Dict[str, Any]:
+        """Match a query against the tables of some collections.
+
+        Returns {'kind': 'answer' | 'filter' | 'rows' | None, 'answer', 'sources', 'rows' stats}.
+        """
+        matches = []
+        for name in collection_names:
+            index = self.get(name, (lambda name=name: open_collection(name)) if open_collection else None)
+            with self._lock:
+                matches.extend({**match, 'collection': name} for match in index.match(query))
+        result = {'kind': None, 'answer': "", 'sources': [], 'tables': 0, 'rows': 0}
+        filtered = [match for match in matches if match['filters'] and match['rows']]
+        named = [match for match in matches if not match['filters'] and match['rows']]
+        if filtered and self.is_lookup_query(query, filtered):
+            used = filtered
+            result.update(kind='filter', answer=self.format_filtered(filtered))
+        elif not filtered and self.is_single_value(named) and self.is_lookup_query(query, named[:1]):
+            used = named[:1]
+            result.update(kind='answer', answer=self.format_answer(named[0]))
+        elif filtered or named:
+            # Anything more than a lookup goes to the LLM, with the rows it refers to as context
+            used = filtered or named
+            result['kind'] = 'rows'
+        else:
+            return result
+        result.update(sources=self.row_sources(used), tables=len(used),
+                      rows=sum(min(len(match['rows']), self.max_rows) for match in used))
+        return result
+
+    @staticmethod
+    def is_lookup_query(query: str, matches: List[Dict[str, Any]]) -> bool:
+        """Whether the query only asks for table values: no how/why/should, and no content word
+        besides the row ids, column names, comparisons and units of the matched rows"""
+        text = query.lower()
+        filters = parse_filters(text)
+        covered = STOPWORDS | LOOKUP_WORDS
+        for match in matches:
+            table = match['table']
+            for header in table['columns']:
+                covered = covered.union(cell_key(header))
+            for c in set(match['key_columns']) | set(match['columns']) | set(match['filters']):
+                for r in match['rows']:
+                    covered = covered.union(cell_key(table['data'][c][r]))
+        covered = {singular(term) for term in covered}
+        for term in TERM_PARTS.finditer(text):
+            if term.group(0) in OPEN_QUESTION_WORDS:
+                return False
+            in_filter = any(start <= term.start() < end for _, _, start, end in filters)
+            if not in_filter and singular(term.group(0)) not in covered:
+                return False
+        return True
+
+    @staticmethod
+    def is_single_value(matches: List[Dict[str, Any]]) -> bool:
+        """Whether the matches name one row each, by identifier columns, and ask for one column
+        whose value is the same everywhere (a table repeated on several pages still answers)"""
+        values = set()
+        for match in matches:
+            table = match['table']
+            if (len(match['rows']) != 1 or len(match['columns']) != 1
+                    or not all(TableIndex.is_identifier(table, c) for c in match['key_columns'])):
+                return False
+            values.add(table['data'][match['columns'][0]][match['rows'][0]])
+        return len(values) == 1 and "" not in values
+
+    @staticmethod
+    def format_answer(match: Dict[str, Any]) -> str:
+        table, r, c = match['table'], match['rows'][0], match['columns'][0]
+        label = " ".join(table['data'][k][r] for k in match['key_columns'])
+        return f"The {table['columns'][c]} for {label} is {table['data'][c][r]}."
+
+    def format_filtered(self, matches: List[Dict[str, Any]]) -> str:
+        blocks = []
+        for match in matches:
+            table = match['table']
+            condition = " and ".join(
+                f"{table['columns'][c]} {operator} {bound:g}"
+                for c, conditions in match['filters'].items() for operator, bound in conditions
+            )
+            lines = [f"Rows where {condition} "
+                     f"(table on page {table['page']} of {table['source_name']}):", "",
+                     " | ".join(table['columns'])]
+            lines.extend(self.row_text(table, r) for r in match['rows'][:self.max_rows])
+            if len(match['rows']) > self.max_rows:
+                lines.append(f"... and {len(match['rows']) - self.max_rows} more rows")
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
+
+    @staticmethod
+    def row_text(table: Dict[str, Any], r: int) -> str:
+        return " | ".join(column[r] for column in table['data'])
+
+    def row_sources(self, matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One source per matched table: its header and matching rows, shaped like a retrieved chunk"""
+        sources = []
+        for match in matches:
+            table = match['table']
+            text = "\n".join([f"--- Table Extracted (Page {table['page']}) ---", " | ".join(table['columns'])]
+                             + [self.row_text(table, r) for r in match['rows'][:self.max_rows]])
+            sources.append({
+                'chunk_id': f"table:{table['source_name']}:{table['page']}:{match['rows'][0]}",
+                'collection': match['collection'],
+                'text': text,
+                'metadata': {'source': table['source'], 'page': table['page'], 'kind': 'table'},
+                'scores': {'table_rows': len(match['rows']), 'tokens': count_tokens(text)}
+            })
+        return sources
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agent_level import DocumentAgent
+from benchmarks.offline_embeddings import HashingEmbeddingFunction
+
+
+@pytest.fixture
+def agent(tmp_path):
+    """A DocumentAgent with its Chroma and SQLite files under tmp_path and offline embeddings"""
+    return DocumentAgent(
+        "test-key",
+        db_path=str(tmp_path / "chroma_db"),
+        checkpoint_path=str(tmp_path / "checkpoints.db"),
+        embedding_function=HashingEmbeddingFunction(),
+        ocr_cache_dir=None
+    )
@@ -0,0 +1,42 @@
+import shutil
+
+from benchmarks.documents import make_document
+
+
+def upload(tmp_path, name, variant):
+    """A text PDF saved the way /upload saves it: in its own directory, under the uploaded name"""
+    document = make_document(str(tmp_path), "text", pages=2, variant=variant)
+    upload_dir = tmp_path / "uploads" / f"upload_{variant}"
+    upload_dir.mkdir(parents=True)
+    return shutil.copy(document, str(upload_dir / name))
+
+
+def chunk_count(agent, collection_name):
+    return agent.get_collection(collection_name).count()
+
+
+def test_same_name_upload_gets_its_own_collection(agent, tmp_path):
+    first = agent.process(upload(tmp_path, "report.pdf", 0))
+    chunks = chunk_count(agent, first['collection_name'])
+
+    second = agent.process(upload(tmp_path, "report.pdf", 1))
+
+    assert second['status'] == 'completed'
+    assert second['collection_name'] != first['collection_name']
+    assert chunk_count(agent, first['collection_name']) == chunks
+    assert sorted(document['collection_name'] for document in agent.registry.list_documents()) == sorted(
+        [first['collection_name'], second['collection_name']]
+    )
+
+
+def test_revision_updates_the_collection_in_place(agent, tmp_path):
+    first = agent.process(upload(tmp_path, "report.pdf", 0))
+
+    second = agent.process(upload(tmp_path, "report.pdf", 1), revision=True)
+
+    assert second['collection_name'] == first['collection_name']
+    assert [document['file_hash'] for document in agent.registry.list_documents()] == [second['file_hash']]
+    # Chunks of the replaced pages are gone: the collection holds exactly the registered ones
+    pages = agent.registry.get_pages(first['collection_name'], "report.pdf")
+    chunk_ids = [chunk_id for page in pages.values() for chunk_id in page['chunk_ids']]
+    assert sorted(agent.get_collection(first['collection_name']).get()['ids']) == sorted(chunk_ids)
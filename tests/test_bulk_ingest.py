@@ -0,0 +1,49 @@
+import os
+import zipfile
+
+from benchmarks.documents import make_document
+from bulk_ingest import BulkIngestor
+
+
+def make_archive(path, document):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.write(document, "reports/q1.pdf")
+    return path
+
+
+def test_archives_sharing_a_member_path_keep_both_collections(agent, tmp_path):
+    documents = tmp_path / "documents"
+    documents.mkdir()
+    first = make_archive(str(tmp_path / "first.zip"), make_document(str(documents), "text", pages=2, variant=0))
+    second = make_archive(str(tmp_path / "second.zip"), make_document(str(documents), "text", pages=2, variant=1))
+    ingestor = BulkIngestor(agent, workers=1, manifest_dir=str(tmp_path / "manifests"),
+                            staging_dir=str(tmp_path / "staging"))
+
+    assert ingestor.run(first)['completed'] == 1
+    assert ingestor.run(second)['completed'] == 1
+
+    documents = agent.registry.list_documents()
+    assert sorted(document['source_name'] for document in documents) == [
+        f"{os.path.abspath(first)}!reports/q1.pdf", f"{os.path.abspath(second)}!reports/q1.pdf"
+    ]
+    for document in documents:
+        assert agent.collection_exists(document['collection_name'])
+
+
+def test_rerun_of_a_changed_archive_replaces_its_own_collection(agent, tmp_path):
+    documents = tmp_path / "documents"
+    documents.mkdir()
+    archive = str(tmp_path / "library.zip")
+    ingestor = BulkIngestor(agent, workers=1, manifest_dir=str(tmp_path / "manifests"),
+                            staging_dir=str(tmp_path / "staging"))
+
+    make_archive(archive, make_document(str(documents), "text", pages=2, variant=0))
+    ingestor.run(archive)
+    previous = agent.registry.list_documents()[0]['collection_name']
+    make_archive(archive, make_document(str(documents), "text", pages=2, variant=1))
+    ingestor.run(archive)
+
+    documents = agent.registry.list_documents()
+    assert len(documents) == 1
+    assert documents[0]['collection_name'] != previous
+    assert not agent.collection_exists(previous)
@@ -0,0 +1,40 @@
+import json
+import time
+
+from response_cache import ResponseCache
+
+
+def write_cache(path, entries):
+    with open(path, "w") as f:
+        json.dump(entries, f)
+
+
+def entry(query, created_at):
+    return {'collection': "docs", 'query': query, 'result': {'response': query}, 'embedding': None,
+            'created_at': created_at, 'size': 10}
+
+
+def test_load_drops_expired_entries_and_trims_to_max_entries(tmp_path):
+    path = str(tmp_path / "cache.json")
+    now = time.time()
+    write_cache(path, [entry("expired", now - 7200)] + [entry(f"q{n}", now) for n in range(5)])
+
+    cache = ResponseCache(max_entries=3, ttl_seconds=3600, persist_path=path, save_interval=0)
+
+    assert [key[1] for key in cache.entries] == ["q2", "q3", "q4"]
+    assert cache.total_bytes == 30
+
+
+def test_changes_are_saved_periodically(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = ResponseCache(persist_path=path, save_interval=0.05)
+    try:
+        cache.put("docs", "What is the torque?", {'response': "26 Nm"})
+        deadline = time.time() + 5
+        while time.time() < deadline and not (tmp_path / "cache.json").exists():
+            time.sleep(0.05)
+        assert ResponseCache(persist_path=path, save_interval=0).get("docs", "what is the torque") == {
+            'response': "26 Nm"
+        }
+    finally:
+        cache.stop()
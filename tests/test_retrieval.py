@@ -0,0 +1,40 @@
+import threading
+
+from retrieval import LexicalIndexStore
+
+
+def test_updates_are_invisible_to_searches_until_saved(tmp_path):
+    store = LexicalIndexStore(str(tmp_path))
+    store.update("docs", ["a"], ["torque for unit PX-4410 is 26 Nm"])
+    published = store.get("docs")
+
+    store.update("docs", ["b"], ["the PX-4410 torque interval"], remove_ids=["a"], save=False)
+    assert [chunk_id for chunk_id, _ in store.search("docs", "PX-4410")] == ["a"]
+    assert len(published) == 1
+
+    store.save("docs")
+    assert [chunk_id for chunk_id, _ in store.search("docs", "PX-4410")] == ["b"]
+    assert [chunk_id for chunk_id, _ in LexicalIndexStore(str(tmp_path)).search("docs", "PX-4410")] == ["b"]
+
+
+def test_backfill_does_not_block_other_collections(tmp_path):
+    store = LexicalIndexStore(str(tmp_path))
+    store.update("ready", ["a"], ["operating torque"])
+    backfill_started, release = threading.Event(), threading.Event()
+
+    class SlowCollection:
+        def get(self, include):
+            backfill_started.set()
+            release.wait(5)
+            return {'ids': ["b"], 'documents': ["service interval"]}
+
+    backfill = threading.Thread(target=store.search, args=("legacy", "interval"),
+                                kwargs={'collection': SlowCollection()})
+    backfill.start()
+    assert backfill_started.wait(5)
+    try:
+        assert [chunk_id for chunk_id, _ in store.search("ready", "torque")] == ["a"]
+    finally:
+        release.set()
+        backfill.join()
+    assert [chunk_id for chunk_id, _ in store.search("legacy", "interval")] == ["b"]
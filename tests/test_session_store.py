@@ -0,0 +1,28 @@
+from session_store import SessionStore, SqliteSessionStore
+
+
+def test_recording_a_turn_for_an_evicted_session_stays_within_max_sessions():
+    evicted = []
+    store = SessionStore(max_sessions=2, on_evict=evicted.append)
+    store.get_or_create("a")
+    store.get_or_create("b")
+    store.get_or_create("c")
+
+    store.record_turn("a", "What is the torque?", "26 Nm", "thread-a")
+
+    assert list(store.sessions) == ["c", "a"]
+    assert [session['session_id'] for session in evicted] == ["a", "b"]
+    assert store.stats()['sessions'] == 2
+
+
+def test_sqlite_store_recreates_an_evicted_session_within_max_sessions(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions.db"), max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        store.get_or_create(session_id)
+
+    turn = store.record_turn("a", "What is the torque?", "26 Nm", "thread-a")
+
+    assert turn['index'] == 0
+    assert store.stats()['sessions'] == 2
+    assert store.session_stats("b") is None
+    assert store.session_stats("a")['turns'] == 1
@@ -0,0 +1,17 @@
+import sys
+
+from benchmarks.documents import make_document
+from text_extrtaction import DocumentProcessor
+
+
+def test_docx_ingestion_does_not_need_pymupdf(agent, tmp_path, monkeypatch):
+    path = make_document(str(tmp_path), "docx", pages=3)
+    # Importing a module mapped to None raises ImportError, as if PyMuPDF were not installed
+    for module in ("fitz", "pymupdf", "pymupdf4llm"):
+        monkeypatch.setitem(sys.modules, module, None)
+
+    assert DocumentProcessor(path).page_hashes()
+    result = agent.process(path)
+
+    assert result['status'] == 'completed'
+    assert agent.get_collection(result['collection_name']).count() > 0
@@ -1,111 +1,555 @@
 import os
-import fitz  # PyMuPDF
-import pytesseract
-from pdf2image import convert_from_path
-from langchain_pymupdf4llm import PyMuPDF4LLMLoader
-from docx2pdf import convert  # ✅ Replaced Aspose
-import pdfplumber
+import re
+import time
+import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+# PyMuPDF, pymupdf4llm, pdfplumber and pytesseract are imported where they are used: they take
+# seconds to load, and a chat-only process (which imports this module for split_pages) never needs them.
+
+
+PAGE_MARKER = re.compile(r"^--- Page (\d+) ---$", re.MULTILINE)
+
+OCR_CONFIG = '--psm 6'
+# A page is only OCR'd when its text layer is shorter than this many characters...
+OCR_MIN_TEXT_CHARS = 50
+# ...and images cover at least this share of it (logos and icons don't count)
+OCR_MIN_IMAGE_COVERAGE = 0.3
+OCR_DPI = 200
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# DOCX files have no fixed pages: a pseudo-page ends at a page or section break, or at the
+# first paragraph boundary after this many characters (roughly one printed page)
+DOCX_PAGE_CHARS = 3000
+# Elements that only wrap block content (content controls, custom XML, tracked insertions)
+DOCX_WRAPPERS = {W_NS + "sdt", W_NS + "sdtContent", W_NS + "customXml", W_NS + "ins", W_NS + "smartTag"}
+
+
+def split_pages(text):
+    """
+    Splits extracted text on its --- Page N --- markers into {page_num: page_text}.
+    """
+    pages = {}
+    markers = list(PAGE_MARKER.finditer(text))
+    for i, marker in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        pages[int(marker.group(1))] = text[marker.end():end].strip("\n")
+    return pages
+
+
+def _docx_blocks(element):
+    """
+    Yields the paragraphs and tables directly under an element, looking through wrapper elements.
+    """
+    for child in element:
+        if child.tag in (W_NS + "p", W_NS + "tbl"):
+            yield child
+        elif child.tag in DOCX_WRAPPERS:
+            yield from _docx_blocks(child)
+
+
+def _docx_flag(properties, name):
+    """
+    True when a boolean property such as w:pageBreakBefore is present and not switched off.
+    """
+    flag = properties.find(W_NS + name) if properties is not None else None
+    return flag is not None and flag.get(W_NS + "val", "true") not in ("0", "false", "off")
+
+
+def _docx_runs(paragraph):
+    """
+    Yields the text of a paragraph piece by piece, with None where it has an explicit page break.
+    Deleted text (w:delText) of tracked changes is skipped.
+    """
+    for element in paragraph.iter():
+        if element.tag == W_NS + "t":
+            yield element.text or ""
+        elif element.tag in (W_NS + "tab", W_NS + "ptab"):
+            yield "\t"
+        elif element.tag in (W_NS + "br", W_NS + "cr"):
+            yield None if element.get(W_NS + "type") == "page" else "\n"
+        elif element.tag == W_NS + "noBreakHyphen":
+            yield "-"
+
+
+def _docx_table_rows(table):
+    """
+    Rows of a w:tbl as lists of cell text; nested tables are flattened into their cell.
+    """
+    rows = []
+    for row in _docx_children(table, W_NS + "tr"):
+        cells = []
+        for cell in _docx_children(row, W_NS + "tc"):
+            paragraphs = ("".join(piece or " " for piece in _docx_runs(p)).strip() for p in cell.iter(W_NS + "p"))
+            cells.append(" ".join(text for text in paragraphs if text))
+        rows.append(cells)
+    return rows
+
+
+def _docx_children(element, tag):
+    for child in element:
+        if child.tag == tag:
+            yield child
+        elif child.tag in DOCX_WRAPPERS:
+            yield from _docx_children(child, tag)
+
+
+def _extract_page_range(file_path, page_numbers, use_table_aware, ocr_cache_dir):
+    """
+    Process pool entry point: extracts one group of pages in a worker.
+    Returns the text with the worker's OCR counters and stage timings.
+    """
+    processor = DocumentProcessor(file_path, ocr_cache_dir=ocr_cache_dir)
+    if use_table_aware:
+        text = processor.extract_text_with_pdfplumber(page_numbers)
+    else:
+        text = processor.process_pdf_pagewise(page_numbers)
+    return text, processor.ocr_stats, processor.stage_timings
+
+
+class OcrCache:
+    """
+    On-disk cache of OCR output keyed by the hash of the rasterized page image,
+    so re-ingesting a document never runs Tesseract on an unchanged page again.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def get(self, key):
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def put(self, key, text):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
 
 class DocumentProcessor:
-    def __init__(self, file_path):
+    def __init__(self, file_path, progress_callback=None, ocr_cache_dir=None):
         self.original_path = file_path
         self.file_path = file_path
+        self.progress_callback = progress_callback
+        self.page_cache = {}
+        self.ocr_cache_dir = ocr_cache_dir
+        self.ocr_cache = OcrCache(ocr_cache_dir) if ocr_cache_dir else None
+        self.ocr_stats = {
+            'pages_checked': 0, 'pages_ocr': 0, 'cache_hits': 0,
+            'skipped_text_layer': 0, 'skipped_low_coverage': 0, 'ocr_seconds': 0.0
+        }
+        # Seconds per call of each extraction stage, e.g. {'tables': [0.41, 0.38]}
+        self.stage_timings = {}
 
-    def convert_docx_to_pdf(self):
+    @contextmanager
+    def time_stage(self, stage):
         """
-        Converts DOCX to PDF using docx2pdf.
+        Records how long the enclosed block took under the given stage name.
         """
-        output_pdf = os.path.splitext(self.file_path)[0] + "_converted.pdf"
+        started = time.perf_counter()
         try:
-            convert(self.file_path, output_pdf)
-            print(f"✅ DOCX converted to PDF: {output_pdf}")
-            self.file_path = output_pdf
-        except Exception as e:
-            print(f"❌ docx2pdf conversion failed: {e}")
-            self.file_path = None
+            yield
+        finally:
+            self.stage_timings.setdefault(stage, []).append(time.perf_counter() - started)
+
+    def merge_worker_stats(self, ocr_stats, stage_timings):
+        """
+        Folds the counters and timings returned by a pool worker into this processor.
+        """
+        for key, value in ocr_stats.items():
+            self.ocr_stats[key] += value
+        for stage, seconds in stage_timings.items():
+            self.stage_timings.setdefault(stage, []).extend(seconds)
+
+    def report_progress(self, pages_done, pages_total):
+        """
+        Notifies the optional progress callback after each extracted page.
+        """
+        if self.progress_callback:
+            self.progress_callback(pages_done, pages_total)
+
+    @property
+    def is_docx(self):
+        return self.file_path.lower().endswith(".docx")
+
+    def iter_docx_pages(self, page_numbers=None):
+        """
+        Streams word/document.xml straight out of the DOCX package, yielding (page_num, page_text)
+        in the same layout as the PDF extractors: paragraphs first, then each table under a
+        --- Table Extracted (Page N) --- marker. Pages are pseudo-pages (see DOCX_PAGE_CHARS).
+        Only the block being read is kept in memory, and nothing is written to disk.
+        """
+        wanted = set(page_numbers) if page_numbers is not None else None
+        page = {'num': 1, 'lines': [], 'tables': [], 'chars': 0}
+        ready = []
+        # Parse time of the whole document, excluding time spent by the consumer between pages
+        parse_seconds = 0.0
+
+        def finish_page():
+            text = "\n".join(page['lines']) + "\n"
+            for rows in page['tables']:
+                table_text = "\n".join(" | ".join(cells) for cells in rows)
+                text += f"\n--- Table Extracted (Page {page['num']}) ---\n{table_text}\n"
+            if wanted is None or page['num'] in wanted:
+                ready.append((page['num'], text))
+            page.update(num=page['num'] + 1, lines=[], tables=[], chars=0)
+
+        def read_block(block):
+            if block.tag == W_NS + "tbl":
+                rows = _docx_table_rows(block)
+                if rows:
+                    page['tables'].append(rows)
+                    page['chars'] += sum(len(cell) for cells in rows for cell in cells)
+                return
+            properties = block.find(W_NS + "pPr")
+            if _docx_flag(properties, "pageBreakBefore") and (page['lines'] or page['tables']):
+                finish_page()
+            line = ""
+            for piece in _docx_runs(block):
+                if piece is None:
+                    if line.strip():
+                        page['lines'].append(line)
+                    finish_page()
+                    line = ""
+                else:
+                    line += piece
+            if line.strip():
+                page['lines'].append(line)
+                page['chars'] += len(line)
+            # A paragraph carrying w:sectPr is the last one of its section
+            section_break = properties is not None and properties.find(W_NS + "sectPr") is not None
+            if section_break or page['chars'] >= DOCX_PAGE_CHARS:
+                finish_page()
+
+        started = time.perf_counter()
+        with zipfile.ZipFile(self.file_path) as package, package.open("word/document.xml") as xml:
+            depth = 0
+            body = None
+            for event, element in ET.iterparse(xml, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if depth == 2:
+                        body = element
+                    continue
+                depth -= 1
+                if depth != 2:
+                    continue
+
+                # A direct child of w:body is complete: read it, then free it
+                blocks = _docx_blocks(element) if element.tag in DOCX_WRAPPERS else [element]
+                for block in blocks:
+                    if block.tag in (W_NS + "p", W_NS + "tbl"):
+                        read_block(block)
+                body.clear()
+                if ready:
+                    parse_seconds += time.perf_counter() - started
+                    yield from ready
+                    ready.clear()
+                    started = time.perf_counter()
+
+        if page['lines'] or page['tables'] or page['num'] == 1:
+            finish_page()
+        self.stage_timings.setdefault("docx_parse", []).append(parse_seconds + time.perf_counter() - started)
+        yield from ready
+
+    def iter_pages(self, page_numbers=None, cache_pages=True):
+        """
+        Opens and converts the document once, yielding (page_num, text) in page order.
+        Scanned pages go through OCR; text pages through a single pymupdf4llm pass.
+        Parsed pages are cached on the instance unless cache_pages is False.
+        """
+        import fitz  # PyMuPDF
+        import pymupdf4llm
+
+        doc = fitz.open(self.file_path)
+        try:
+            if page_numbers is None:
+                page_numbers = range(1, doc.page_count + 1)
+            hdr_info = None
+            for page_num in page_numbers:
+                if page_num in self.page_cache:
+                    yield page_num, self.page_cache[page_num]
+                    continue
+
+                page = doc.load_page(page_num - 1)
+                if self.needs_ocr(page):
+                    print(f"🔍 Page {page_num} is scanned. Running OCR...")
+                    text = self.extract_text_from_ocr(page_num, page)
+                else:
+                    if hdr_info is None:
+                        # Header detection scans the whole document, so do it once
+                        with self.time_stage("headers"):
+                            hdr_info = pymupdf4llm.IdentifyHeaders(doc)
+                    with self.time_stage("markdown"):
+                        text = pymupdf4llm.to_markdown(
+                            doc,
+                            pages=[page_num - 1],
+                            hdr_info=hdr_info,
+                            show_progress=False,
+                            graphics_limit=5000
+                        )
+                if cache_pages:
+                    self.page_cache[page_num] = text
+                yield page_num, text
+        finally:
+            doc.close()
+            self.report_ocr_throughput()
 
     def extract_text_from_page(self, page_num):
         """
-        Extracts text from a specific page using LangChain's PyMuPDF4LLMLoader.
+        Extracts text from a specific page, reusing the parsed page cache.
         """
-        loader = PyMuPDF4LLMLoader(self.file_path)
-        documents = loader.load()
-        for doc in documents:
-            if doc.metadata['page'] + 1 == page_num:
-                return doc.page_content
-        return ""
+        if page_num not in self.page_cache:
+            for _ in self.iter_pages([page_num]):
+                pass
+        return self.page_cache.get(page_num, "")
 
-    def extract_text_from_ocr(self, page_num):
+    def image_coverage(self, page):
+        """
+        Share of the page area covered by images (overlaps counted once per image).
+        """
+        import fitz
+
+        page_area = abs(page.rect) or 1.0
+        covered = 0.0
+        for info in page.get_image_info():
+            covered += abs(fitz.Rect(info['bbox']) & page.rect)
+        return min(covered / page_area, 1.0)
+
+    def needs_ocr(self, page):
+        """
+        OCR only pages without a usable text layer whose images cover a real share of the page.
+        """
+        self.ocr_stats['pages_checked'] += 1
+        if not page.get_images(full=True):
+            return False
+        if len(page.get_text("text").strip()) >= OCR_MIN_TEXT_CHARS:
+            self.ocr_stats['skipped_text_layer'] += 1
+            return False
+        if self.image_coverage(page) < OCR_MIN_IMAGE_COVERAGE:
+            self.ocr_stats['skipped_low_coverage'] += 1
+            return False
+        return True
+
+    def extract_text_from_ocr(self, page_num, page=None):
         """
         Enhanced OCR using Tesseract with layout-aware config.
-        Attempts sentence-level structure preservation from tables.
+        Rasterizes the page in-process through PyMuPDF and reuses cached OCR output
+        when the same page image was recognized before.
+        """
+        import fitz
+        import pytesseract
+
+        started = time.perf_counter()
+        if page is None:
+            with fitz.open(self.file_path) as doc:
+                return self.extract_text_from_ocr(page_num, doc.load_page(page_num - 1))
+
+        pixmap = page.get_pixmap(dpi=OCR_DPI)
+        key = hashlib.sha256(pixmap.samples + f"{pixmap.width}x{pixmap.height}|{OCR_CONFIG}".encode()).hexdigest()
+        text = self.ocr_cache.get(key) if self.ocr_cache else None
+        if text is not None:
+            self.ocr_stats['cache_hits'] += 1
+        else:
+            text = pytesseract.image_to_string(pixmap.pil_image(), config=OCR_CONFIG).strip()
+            if self.ocr_cache:
+                self.ocr_cache.put(key, text)
+        elapsed = time.perf_counter() - started
+        self.ocr_stats['pages_ocr'] += 1
+        self.ocr_stats['ocr_seconds'] += elapsed
+        self.stage_timings.setdefault("ocr", []).append(elapsed)
+        return f"--- OCR Extracted Text (Page {page_num}) ---\n{text}\n"
+
+    def report_ocr_throughput(self):
+        """
+        Prints OCR throughput for the pages that went through the OCR stage.
         """
-        images = convert_from_path(self.file_path, first_page=page_num, last_page=page_num)
-        extracted_text = ""
-        for image in images:
-            text = pytesseract.image_to_string(image, config='--psm 6')
-            extracted_text += f"--- OCR Extracted Text (Page {page_num}) ---\n{text.strip()}\n"
-        return extracted_text
+        stats = self.ocr_stats
+        if stats['pages_ocr']:
+            pages_per_sec = stats['pages_ocr'] / stats['ocr_seconds'] if stats['ocr_seconds'] else 0.0
+            print(f"🔍 OCR: {stats['pages_ocr']} pages ({stats['cache_hits']} cached) "
+                  f"in {stats['ocr_seconds']:.2f}s, {pages_per_sec:.2f} pages/sec")
+
+    def get_page_count(self):
+        if self.is_docx:
+            return sum(1 for _ in self.iter_docx_pages())
+        import fitz
+
+        with fitz.open(self.file_path) as doc:
+            return doc.page_count
 
-    def extract_text_with_pdfplumber(self):
+    def page_hashes(self):
+        """
+        Hashes each page's content stream and embedded images, keyed by page number.
+        Used to detect which pages changed between two revisions of a document.
+        DOCX pseudo-pages are hashed by their extracted text, so DOCX files never load PyMuPDF.
+        """
+        hashes = {}
+        if self.is_docx:
+            with self.time_stage("page_hash"):
+                for page_num, text in self.iter_docx_pages():
+                    hashes[page_num] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            return hashes
+
+        import fitz
+
+        with self.time_stage("page_hash"), fitz.open(self.file_path) as doc:
+            for page_num, page in enumerate(doc, start=1):
+                digest = hashlib.sha256(page.read_contents())
+                for image in page.get_images(full=True):
+                    digest.update(doc.xref_stream_raw(image[0]) or b"")
+                hashes[page_num] = digest.hexdigest()
+        return hashes
+
+    def iter_pdfplumber_pages(self, page_numbers=None):
+        """
+        Yields (page_num, page_text) from pdfplumber, with extracted tables appended
+        after each page's text. Pages are released as soon as they are yielded.
+        """
+        import fitz
+        import pdfplumber
+
+        if page_numbers is None:
+            page_numbers = list(range(1, self.get_page_count() + 1))
+        with pdfplumber.open(self.file_path, pages=page_numbers) as pdf, fitz.open(self.file_path) as doc:
+            total_pages = len(page_numbers)
+            for pages_done, (page_num, page) in enumerate(zip(page_numbers, pdf.pages), start=1):
+                fitz_page = doc.load_page(page_num - 1)
+                if self.needs_ocr(fitz_page):
+                    # Scanned pages have no text layer for pdfplumber to read
+                    print(f"🔍 Page {page_num} is scanned. Running OCR...")
+                    page_text = f"{self.extract_text_from_ocr(page_num, fitz_page)}\n"
+                else:
+                    with self.time_stage("text_layer"):
+                        text = page.extract_text()
+                    page_text = f"{text if text else ''}\n"
+                    with self.time_stage("tables"):
+                        tables = page.extract_tables()
+                    for table in tables:
+                        # Line breaks inside a cell are flattened so every table row stays on one line
+                        table_text = "\n".join([" | ".join(" ".join(cell.split()) if cell else "" for cell in row)
+                                                for row in table])
+                        page_text += f"\n--- Table Extracted (Page {page_num}) ---\n{table_text}\n"
+                page.close()
+                yield page_num, page_text
+                self.report_progress(pages_done, total_pages)
+        self.report_ocr_throughput()
+
+    def extract_text_with_pdfplumber(self, page_numbers=None):
         """
         Extracts tables and text from the PDF using pdfplumber.
         Attempts to reconstruct text from tabular data.
         """
-        all_text = ""
-        with pdfplumber.open(self.file_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, start=1):
-                text = page.extract_text()
-                tables = page.extract_tables()
-                all_text += f"--- Page {page_num} ---\n{text if text else ''}\n"
-
-                for table in tables:
-                    table_text = "\n".join([" | ".join(cell if cell else "" for cell in row) for row in table])
-                    all_text += f"\n--- Table Extracted (Page {page_num}) ---\n{table_text}\n"
-        return all_text
+        return "".join(
+            f"--- Page {page_num} ---\n{page_text}" for page_num, page_text in self.iter_pdfplumber_pages(page_numbers)
+        )
 
-    def process_pdf_pagewise(self):
+    def process_pdf_pagewise(self, page_numbers=None):
         """
         Processes PDF page by page: uses OCR for image-heavy pages, else extracts text.
         Returns the entire text from the document.
         """
         all_text = ""
-        doc = fitz.open(self.file_path)
-        for page_num, page in enumerate(doc, start=1):
-            image_list = page.get_images(full=True)
-            if image_list:
-                print(f"🔍 Page {page_num} contains images. Running OCR...")
-                text = self.extract_text_from_ocr(page_num)
-            else:
-                text = self.extract_text_from_page(page_num)
+        if page_numbers is None:
+            page_numbers = list(range(1, self.get_page_count() + 1))
+        total_pages = len(page_numbers)
+        for pages_done, (page_num, text) in enumerate(self.iter_pages(page_numbers), start=1):
             all_text += f"--- Page {page_num} ---\n{text}\n"
+            self.report_progress(pages_done, total_pages)
         return all_text
 
-    def process_file(self, use_table_aware=False):
+    def prepare(self):
         """
-        Unified entry point: convert DOCX to PDF if needed, then process as PDF.
-        Allows optional use of table-aware extraction.
+        Checks the file can be processed: a PDF, or a DOCX package with a main document part.
+        Returns False otherwise.
         """
-        if self.file_path.lower().endswith(".docx"):
-            print("📝 Converting DOCX to PDF...")
-            self.convert_docx_to_pdf()
-            if not self.file_path:
-                print("❌ Conversion failed. Exiting.")
-                return ""
+        if self.is_docx:
+            if not zipfile.is_zipfile(self.file_path):
+                print("❌ Not a valid DOCX package.")
+                return False
+            with zipfile.ZipFile(self.file_path) as package:
+                if "word/document.xml" not in package.namelist():
+                    print("❌ DOCX package has no word/document.xml.")
+                    return False
+            return True
 
-        if self.file_path.lower().endswith(".pdf"):
-            print("📄 Processing PDF file...")
-            if use_table_aware:
-                return self.extract_text_with_pdfplumber()
-            else:
-                return self.process_pdf_pagewise()
-        else:
+        if not self.file_path.lower().endswith(".pdf"):
             print("❌ Unsupported file format.")
-            return ""
+            return False
+        return True
+
+    def stream_pages(self, use_table_aware=False, workers=1, pages=None, groups_in_flight=2):
+        """
+        Yields (page_num, page_text) in page order without ever holding the whole document;
+        page_text matches what split_pages() returns for the same page.
+        With workers > 1, page groups are extracted in a process pool with at most
+        groups_in_flight groups per worker queued or buffered at any time.
+        DOCX files are read natively in a single pass, so they ignore workers and use_table_aware.
+        """
+        if self.is_docx:
+            total_pages = len(pages) if pages is not None else self.get_page_count()
+            for pages_done, (page_num, text) in enumerate(self.iter_docx_pages(pages), start=1):
+                yield page_num, text.strip("\n")
+                self.report_progress(pages_done, total_pages)
+            return
+
+        if workers is None or workers > 1:
+            workers = workers or os.cpu_count() or 1
+            if pages is None:
+                pages = list(range(1, self.get_page_count() + 1))
+            pages_per_task = max(1, min(16, -(-len(pages) // (workers * 4))))
+            groups = [pages[i:i + pages_per_task] for i in range(0, len(pages), pages_per_task)]
+            if len(groups) > 1:
+                yield from self._stream_parallel(groups, use_table_aware, workers, groups_in_flight)
+                return
+
+        if use_table_aware:
+            for page_num, page_text in self.iter_pdfplumber_pages(pages):
+                yield page_num, page_text.strip("\n")
+        else:
+            total_pages = len(pages) if pages is not None else self.get_page_count()
+            for pages_done, (page_num, text) in enumerate(self.iter_pages(pages, cache_pages=False), start=1):
+                yield page_num, text.strip("\n")
+                self.report_progress(pages_done, total_pages)
+
+    def _stream_parallel(self, groups, use_table_aware, workers, groups_in_flight):
+        total_pages = sum(len(group) for group in groups)
+        print(f"⚡ Streaming {total_pages} pages with {workers} workers...")
+        pages_done = 0
+        with ProcessPoolExecutor(max_workers=min(workers, len(groups))) as pool:
+            futures = {}
+            next_group = 0
+            for n in range(len(groups)):
+                # Keep a bounded window of groups submitted ahead of the one being consumed
+                while next_group < len(groups) and next_group < n + workers * groups_in_flight:
+                    futures[next_group] = pool.submit(
+                        _extract_page_range, self.file_path, groups[next_group], use_table_aware, self.ocr_cache_dir
+                    )
+                    next_group += 1
+                text, ocr_stats, stage_timings = futures.pop(n).result()
+                self.merge_worker_stats(ocr_stats, stage_timings)
+                yield from split_pages(text).items()
+                pages_done += len(groups[n])
+                self.report_progress(pages_done, total_pages)
+        self.report_ocr_throughput()
 
 if __name__ == "__main__":
     file_path = r"path/to/pdf/file"
     processor = DocumentProcessor(file_path)
 
-    extracted_text = processor.process_file(use_table_aware=True)
-    print(extracted_text)
+    if processor.prepare():
+        for page_num, page_text in processor.stream_pages(use_table_aware=True):
+            print(f"--- Page {page_num} ---\n{page_text}")